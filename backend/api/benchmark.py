@@ -0,0 +1,41 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks never touch the configured database. They run against a throw-away test database
+which is created before the run and destroyed afterwards.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(name=None):
+    """
+    Creates and migrates a test database, and destroys it on exit.
+    :param name: optional database name, e.g. a file path when several processes need to share the database
+    :return: name of the created database
+    """
+    old_name = connection.settings_dict["NAME"]
+    if name:
+        connection.settings_dict["TEST"]["NAME"] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection.settings_dict["NAME"]
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func, repeat=50) -> float:
+    """
+    Calls func repeatedly and returns the median wall time of a call in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
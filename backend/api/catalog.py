@@ -0,0 +1,116 @@
+"""
+Areas, post codes and services held in memory.
+
+They hardly ever change but are read by most requests, so every process loads all of them at once and serves them
+from memory. Saving or deleting any of them reloads them in the process that did it and bumps CatalogVersion, whose
+version the other processes compare theirs with every CATALOG_REFRESH_INTERVAL seconds. Queryset update(),
+bulk_create() and raw SQL bypass the signals and go unnoticed until another change.
+
+A catalog loaded inside a transaction may hold rows that are rolled back later, so its version is checked on every
+access until it is seen again outside of a transaction.
+
+The rows of the catalog are shared by all requests of the process and must not be changed.
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.db.models import F
+from rest_framework import serializers
+
+from cabins.geo import GridIndex
+from cabins.models import Area, PostCode
+from services.models import Service
+from .models import CatalogVersion
+
+_catalog = None
+_checked_at = 0.0  # time.monotonic() of the last check of the version
+_lock = threading.Lock()
+
+
+class Catalog:
+    """
+    All areas, post codes and services as of a version.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.committed = not connection.in_atomic_block  # Whether the rows read cannot be rolled back anymore
+        self.areas = {area.pk: area for area in Area.objects.order_by("pk")}
+        self.post_codes = {post_code.pk: post_code for post_code in PostCode.objects.order_by("pk")}
+        self.services = {service.pk: service for service in Service.objects.order_by("pk")}
+        self.area_services = defaultdict(list)  # area -> services of the area
+        for service in self.services.values():
+            self.area_services[service.area_id].append(service)
+        self.post_code_grid = GridIndex(
+            (post_code.pk, post_code.latitude, post_code.longitude)
+            for post_code in self.post_codes.values()
+            if post_code.latitude is not None and post_code.longitude is not None
+        )
+
+
+class CatalogRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Foreign key to an area, post code or service that is validated against the catalog instead of a query.
+    """
+
+    def __init__(self, table, **kwargs):
+        """
+        :param table: attribute of Catalog holding the rows by primary key, e.g. "areas"
+        """
+        self.table = table
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = self.queryset.model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        row = getattr(get(), self.table).get(pk)
+        if row is None:
+            self.fail("does_not_exist", pk_value=data)
+        return row
+
+
+def read_version() -> int:
+    return CatalogVersion.objects.values_list("version", flat=True).first() or 0
+
+
+def get() -> Catalog:
+    """
+    Returns the catalog, loading it if it is not current anymore.
+    """
+    global _catalog, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _catalog is None or not _catalog.committed or now - _checked_at >= settings.CATALOG_REFRESH_INTERVAL:
+            version = read_version()
+            if _catalog is None or _catalog.version != version:
+                _catalog = Catalog(version)
+            else:
+                _catalog.committed = not connection.in_atomic_block
+            _checked_at = now
+        return _catalog
+
+
+def invalidate():
+    """
+    Records a change of the catalog, in the transaction of the change.
+    """
+    global _catalog
+    if not CatalogVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    with _lock:
+        _catalog = None
+
+
+def clear():
+    global _catalog
+    with _lock:
+        _catalog = None
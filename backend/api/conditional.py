@@ -0,0 +1,65 @@
+"""
+Conditional GET of listings.
+
+The ETag of a listing is computed from the number of rows it is built from and their latest updated_at, with one
+aggregate query and without serializing anything. Any row that is created, changed or moved into the result set has
+a later updated_at, and a row that is deleted or moved out lowers the count, so the ETag changes whenever the rows
+do. A client that sends the ETag back in If-None-Match gets 304 Not Modified without a body while nothing changed.
+
+Last-Modified is sent as well, but If-Modified-Since is not answered with 304: a deletion does not move it forward.
+Queryset update() does not bump updated_at and goes unnoticed.
+"""
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class Version:
+    """
+    Version of the rows of a listing.
+    """
+
+    def __init__(self, count, updated_at):
+        self.count = count
+        self.updated_at = updated_at
+
+    @classmethod
+    def of(cls, queryset):
+        """
+        Reads the version of the rows of a queryset with one aggregate query.
+        """
+        version = queryset.order_by().aggregate(count=Count("pk"), updated_at=Max("updated_at"))
+        return cls(version["count"], version["updated_at"])
+
+    @classmethod
+    def of_rows(cls, rows):
+        """
+        Returns the version of rows in memory, e.g. of api.catalog.
+        """
+        return cls(len(rows), max((row.updated_at for row in rows), default=None))
+
+    @property
+    def etag(self) -> str:
+        if not self.count:
+            return '"0"'
+        return f'"{self.count}-{int(self.updated_at.timestamp() * 1_000_000)}"'
+
+    def not_modified(self, request):
+        """
+        :return: 304 response if the client sent the current ETag, otherwise None
+        """
+        response = get_conditional_response(request, etag=self.etag)
+        if isinstance(response, HttpResponseNotModified):
+            return self.tag(response)
+        return None
+
+    def tag(self, response):
+        """
+        Adds the ETag and Last-Modified headers to a response built from the rows.
+        """
+        response["ETag"] = self.etag
+        if self.updated_at:
+            response["Last-Modified"] = http_date(self.updated_at.timestamp())
+        return response
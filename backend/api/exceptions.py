@@ -0,0 +1,15 @@
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.views import exception_handler as drf_exception_handler
+
+
+def exception_handler(exc, context):
+    """
+    Answers errors raised before a view runs, e.g. by authentication and permission classes, in the same
+    {"result": "error", "message": ...} format the views use.
+    """
+    response = drf_exception_handler(exc, context)
+    if response is None:
+        return None
+    message = "Unauthenticated!" if isinstance(exc, NotAuthenticated) else exc.detail
+    response.data = {"result": "error", "message": message}
+    return response
@@ -0,0 +1,59 @@
+import datetime
+import random
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import benchmark_database, measure
+from users import tokens
+from users.authentication import TokenAuthentication
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Measures the authentication overhead of a request for tokens with and without claims and the token cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000, help="Number of users with a token")
+        parser.add_argument("--repeat", type=int, default=2000, help="Measured authentications per variant")
+
+    def handle(self, *args, **options):
+        if options["users"] <= options["repeat"]:
+            raise CommandError("--users must be larger than --repeat, every cold authentication needs a new token.")
+        with benchmark_database():
+            users = self.create_users(options["users"])
+            factory = RequestFactory()
+            authentication = TokenAuthentication()
+
+            def requests(user_tokens):
+                return [factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}") for token in user_tokens]
+
+            # Tokens from before access tokens carried claims, their user is read from the database
+            exp = datetime.datetime.utcnow() + datetime.timedelta(minutes=60)
+            legacy = requests(jwt.encode({"id": user.pk, "exp": exp}, settings.JWT_SECRET) for user in users)
+            access = requests(tokens.issue(user)[0] for user in users)
+            uncached = iter(access)
+            cached = access[: options["repeat"]]  # Authenticated by the cold variant
+
+            variants = (
+                ("legacy", lambda: authentication.authenticate(random.choice(legacy))),
+                ("cold", lambda: authentication.authenticate(next(uncached))),
+                ("warm", lambda: authentication.authenticate(random.choice(cached))),
+            )
+            self.stdout.write(f"{'variant':<10} {'us/request':>11} {'queries':>8}")
+            for name, func in variants:
+                func()  # Loads the revocation filter
+                with CaptureQueriesContext(connection) as queries:
+                    func()
+                self.stdout.write(f"{name:<10} {measure(func, options['repeat'] - 2) * 1000:11.1f} {len(queries):8}")
+
+    @staticmethod
+    def create_users(count) -> list:
+        User.objects.bulk_create(
+            User(username=f"benchmark{i}", email=f"benchmark{i}@example.com", password="!") for i in range(count)
+        )
+        return list(User.objects.only("id", "is_staff"))
@@ -0,0 +1,125 @@
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+
+from api.benchmark import benchmark_database
+from cabins.models import Area, Cabin, PostCode
+from reservations.booking import book
+from reservations.models import Reservation
+from reservations.serializer import ReservationSerializer
+from users.models import User
+
+FIRST_NIGHT = date(2030, 1, 1)
+
+
+def set_up_worker(database_name):
+    """
+    Points a worker process at the benchmark database.
+    """
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    django.setup()
+    connections.close_all()
+    connection.settings_dict["NAME"] = database_name
+
+
+def run_worker(cabin_ids, user_id, bookings, days, seed) -> dict:
+    """
+    Books random stays through the booking path and counts how the attempts ended.
+    """
+    rng = random.Random(seed)
+    results = {"booked": 0, "overlapping": 0, "failed": 0}
+    for _ in range(bookings):
+        start_date = FIRST_NIGHT + timedelta(days=rng.randrange(days))
+        serializer = ReservationSerializer(
+            data={
+                "cabin": rng.choice(cabin_ids),
+                "customer": user_id,
+                "owner": user_id,
+                "start_date": start_date,
+                "end_date": start_date + timedelta(days=rng.randint(1, 5)),
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        try:
+            book(serializer)
+            results["booked"] += 1
+        except ValidationError:
+            results["overlapping"] += 1
+        except OperationalError:
+            results["failed"] += 1
+    return results
+
+
+class Command(BaseCommand):
+    help = "Books reservations from many processes at once and checks that no cabin gets double booked."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8, help="Number of booking processes")
+        parser.add_argument("--bookings", type=int, default=200, help="Booking attempts per process")
+        parser.add_argument("--cabins", type=int, default=20, help="Number of cabins to book")
+        parser.add_argument("--days", type=int, default=60, help="Number of days the stays start within")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            # Processes cannot share an in-memory database
+            with benchmark_database(os.path.join(directory, "benchmark.sqlite3")) as database_name:
+                self.run(database_name, options)
+
+    def run(self, database_name, options):
+        area = Area.objects.create(area="Benchmark")
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        cabin_ids = [
+            Cabin.objects.create(
+                name=f"Cabin {i}",
+                description="Benchmark cabin",
+                price_per_night=100,
+                area=area,
+                zip_code=post_code,
+                num_of_beds=4,
+            ).pk
+            for i in range(options["cabins"])
+        ]
+        user = User.objects.create_user(username="benchmark", email="benchmark@example.com", password="benchmark")
+        connections.close_all()
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(
+            options["processes"], initializer=set_up_worker, initargs=(database_name,)
+        ) as executor:
+            futures = [
+                executor.submit(run_worker, cabin_ids, user.pk, options["bookings"], options["days"], seed)
+                for seed in range(options["processes"])
+            ]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+        booked = sum(result["booked"] for result in results)
+        overlapping = sum(result["overlapping"] for result in results)
+        failed = sum(result["failed"] for result in results)
+        attempts = booked + overlapping + failed
+        self.stdout.write(f"{attempts} attempts from {options['processes']} processes in {elapsed:.2f} s")
+        self.stdout.write(f"{booked} booked, {overlapping} rejected as overlapping, {failed} failed")
+        self.stdout.write(f"{booked / elapsed:.1f} bookings/s, {attempts / elapsed:.1f} attempts/s")
+
+        if Reservation.objects.count() != booked:
+            raise CommandError(f"{Reservation.objects.count()} reservations stored but {booked} bookings succeeded.")
+        double_booked = Reservation.objects.filter(
+            Exists(
+                Reservation.objects.filter(
+                    cabin=OuterRef("cabin"), start_date__lt=OuterRef("end_date"), end_date__gt=OuterRef("start_date")
+                ).exclude(pk=OuterRef("pk"))
+            )
+        ).count()
+        if double_booked:
+            raise CommandError(f"{double_booked} reservations overlap another reservation of the same cabin.")
+        self.stdout.write(self.style.SUCCESS("No double bookings."))
@@ -0,0 +1,98 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.benchmark import benchmark_database, measure
+from cabins.models import Area, Cabin, PostCode
+from cabins.views import parse_search
+
+# Searches as query parameters of /api/area/cabins
+SEARCHES = [
+    {"area": "Area 0", "num_of_beds": "8"},
+    {"num_of_beds": "10", "ordering": "price_per_night"},
+    {"min_price": "100", "max_price": "105", "ordering": "-price_per_night"},
+    {"area": "Area 1", "min_price": "400", "ordering": "num_of_beds"},
+]
+
+
+class Command(BaseCommand):
+    help = "Measures cabin search latency with filtering in Python, in SQL without indexes and in SQL with indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cabins", type=int, default=100_000, help="Number of cabins")
+        parser.add_argument("--areas", type=int, default=50, help="Number of areas the cabins are spread on")
+        parser.add_argument("--repeat", type=int, default=20, help="Measured runs per search")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_cabins(options["cabins"], options["areas"])
+            timings = {}
+            with connection.schema_editor() as editor:
+                for index in Cabin._meta.indexes:
+                    editor.remove_index(Cabin, index)
+            for i, params in enumerate(SEARCHES):
+                timings[i] = [
+                    measure(lambda: self.legacy_search(params), options["repeat"]),
+                    measure(lambda: self.search(params), options["repeat"]),
+                ]
+            with connection.schema_editor() as editor:
+                for index in Cabin._meta.indexes:
+                    editor.add_index(Cabin, index)
+            for i, params in enumerate(SEARCHES):
+                timings[i].append(measure(lambda: self.search(params), options["repeat"]))
+
+            self.stdout.write(f"{'search':<60} {'rows':>6} {'python ms':>10} {'sql ms':>8} {'indexed ms':>11}")
+            for i, params in enumerate(SEARCHES):
+                query = "&".join(f"{key}={value}" for key, value in params.items())
+                python_ms, sql_ms, indexed_ms = timings[i]
+                rows = len(self.search(params))
+                self.stdout.write(f"{query:<60} {rows:>6} {python_ms:10.2f} {sql_ms:8.2f} {indexed_ms:11.2f}")
+
+    @staticmethod
+    def create_cabins(count, areas):
+        rng = random.Random(0)
+        Area.objects.bulk_create(Area(area=f"Area {i}") for i in range(areas))
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        for start in range(0, count, 10_000):
+            Cabin.objects.bulk_create(
+                Cabin(
+                    name=f"Cabin {i}",
+                    description="Benchmark cabin",
+                    price_per_night=Decimal(rng.randint(5000, 50000)) / 100,
+                    area_id=f"Area {rng.randrange(areas)}",
+                    zip_code=post_code,
+                    num_of_beds=rng.randint(1, 10),
+                )
+                for i in range(start, min(start + 10_000, count))
+            )
+
+    @staticmethod
+    def search(params) -> list:
+        """
+        Runs the search the way get_cabins does.
+        """
+        cabins = Cabin.objects.all()
+        if params.get("area"):
+            cabins = cabins.filter(area=params["area"])
+        cabins = cabins.filter(**parse_search(params))
+        return list(cabins.order_by(params.get("ordering", "id"), "pk"))
+
+    @staticmethod
+    def legacy_search(params) -> list:
+        """
+        Runs the search the way get_cabins did before, loading every cabin of the area and filtering in Python.
+        """
+        cabins = Cabin.objects.all()
+        if params.get("area"):
+            cabins = cabins.filter(area=params["area"])
+        cabins = list(cabins)
+        if params.get("num_of_beds"):
+            cabins = [cabin for cabin in cabins if cabin.num_of_beds >= int(params["num_of_beds"])]
+        if params.get("min_price"):
+            cabins = [cabin for cabin in cabins if cabin.price_per_night >= Decimal(params["min_price"])]
+        if params.get("max_price"):
+            cabins = [cabin for cabin in cabins if cabin.price_per_night <= Decimal(params["max_price"])]
+        ordering = params.get("ordering", "id")
+        return sorted(cabins, key=lambda cabin: getattr(cabin, ordering.lstrip("-")), reverse=ordering[0] == "-")
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+from api import catalog
+from api.benchmark import benchmark_database, measure
+from cabins.models import Area, PostCode
+from cabins.serializers import AreaSerializer, CabinSerializer
+from services.models import Service
+from services.serializers import ServiceSerializer
+
+CABIN = {"name": "Cabin", "description": "Cabin", "price_per_night": 100, "num_of_beds": 4}
+
+
+class LegacyCabinSerializer(CabinSerializer):
+    """
+    CabinSerializer as it was, resolving the foreign keys with a query each.
+    """
+
+    area = serializers.PrimaryKeyRelatedField(queryset=Area.objects.all())
+    zip_code = serializers.PrimaryKeyRelatedField(queryset=PostCode.objects.all())
+
+
+class Command(BaseCommand):
+    help = "Measures listing areas and services and validating a cabin with queries and with the catalog in memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--areas", type=int, default=200, help="Number of areas")
+        parser.add_argument("--services", type=int, default=10, help="Number of services per area")
+        parser.add_argument("--repeat", type=int, default=500, help="Measured runs per variant")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_data(options["areas"], options["services"])
+            cabin = {**CABIN, "area": "Area 7", "zip_code": "00007"}
+            variants = (
+                ("areas", lambda: AreaSerializer(Area.objects.all(), many=True).data, self.list_areas),
+                (
+                    "services of an area",
+                    lambda: ServiceSerializer(Service.objects.filter(area="Area 7"), many=True).data,
+                    lambda: ServiceSerializer(catalog.get().area_services["Area 7"], many=True).data,
+                ),
+                (
+                    "cabin validation",
+                    lambda: LegacyCabinSerializer(data=cabin).is_valid(raise_exception=True),
+                    lambda: CabinSerializer(data=cabin).is_valid(raise_exception=True),
+                ),
+            )
+            catalog.get()
+            self.stdout.write(f"{'variant':<20} {'queries us':>11} {'queries':>8} {'catalog us':>11} {'queries':>8}")
+            for name, legacy, cached in variants:
+                row = f"{name:<20}"
+                for func in (legacy, cached):
+                    with CaptureQueriesContext(connection) as queries:
+                        func()
+                    row += f" {measure(func, options['repeat']) * 1000:11.1f} {len(queries):8}"
+                self.stdout.write(row)
+
+    @staticmethod
+    def list_areas():
+        return AreaSerializer(list(catalog.get().areas.values()), many=True).data
+
+    @staticmethod
+    def create_data(areas, services):
+        Area.objects.bulk_create(Area(area=f"Area {i}") for i in range(areas))
+        PostCode.objects.bulk_create(PostCode(p_code=f"{i:05}", postal_district=f"District {i}") for i in range(areas))
+        Service.objects.bulk_create(
+            Service(area_id=f"Area {i}", name=f"Service {j}", description="Service", service_price=10, vat_price=2)
+            for i in range(areas)
+            for j in range(services)
+        )
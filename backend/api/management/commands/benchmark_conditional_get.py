@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.benchmark import benchmark_database, measure
+from cabins.models import Area, Cabin, PostCode
+from services.models import Service
+
+
+class Command(BaseCommand):
+    help = "Measures polls of the catalog listings downloading them in full and answered with 304 Not Modified."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cabins", type=int, default=2000, help="Number of cabins listed")
+        parser.add_argument("--repeat", type=int, default=50, help="Measured polls per listing")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_data(options["cabins"])
+            client = Client(HTTP_HOST="localhost")
+            self.stdout.write(f"{'listing':<38} {'bytes':>8} {'full ms':>8} {'304 ms':>7}")
+            for path in ("/api/area/cabins?area=Benchmark", "/api/area/", "/api/area/services/get?area=Benchmark"):
+                response = client.get(path)
+                etag = response["ETag"]
+                full_ms = measure(lambda: client.get(path), options["repeat"])
+                not_modified_ms = measure(lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), options["repeat"])
+                self.stdout.write(f"{path:<38} {len(response.content):>8} {full_ms:8.2f} {not_modified_ms:7.2f}")
+
+    @staticmethod
+    def create_data(cabins):
+        area = Area.objects.create(area="Benchmark")
+        Area.objects.bulk_create(Area(area=f"Area {i}") for i in range(100))
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        Cabin.objects.bulk_create(
+            Cabin(
+                name=f"Cabin {i}",
+                description="Benchmark cabin with a sauna by the lake",
+                price_per_night=100,
+                area=area,
+                zip_code=post_code,
+                num_of_beds=4,
+            )
+            for i in range(cabins)
+        )
+        Service.objects.bulk_create(
+            Service(area=area, name=f"Service {i}", description="Benchmark service", service_price=10, vat_price=2)
+            for i in range(50)
+        )
@@ -0,0 +1,70 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import benchmark_database, measure
+from cabins.facets import BEDS, PRICES, bucket, count_facets
+from cabins.models import Area, Cabin, PostCode
+
+
+class Command(BaseCommand):
+    help = "Measures counting the facets of a cabin search with a query per bucket and with one aggregated query."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cabins", type=int, default=100_000, help="Number of cabins")
+        parser.add_argument("--areas", type=int, default=50, help="Number of areas the cabins are spread on")
+        parser.add_argument("--repeat", type=int, default=5, help="Measured runs per variant")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_cabins(options["cabins"], options["areas"])
+            areas = list(Area.objects.values_list("pk", flat=True))
+            beds = Q(num_of_beds__gte=3)
+            price = Q(price_per_night__lte=300)
+
+            def per_bucket():
+                """
+                Counts every bucket with a query of its own, like running the search once per facet value.
+                """
+                cabins = Cabin.objects.all()
+                facets = {"area": {}, "num_of_beds": {}, "price_per_night": {}}
+                for area in areas:
+                    facets["area"][area] = cabins.filter(beds & price, area=area).count()
+                for label, low, high in BEDS:
+                    facets["num_of_beds"][label] = cabins.filter(bucket("num_of_beds", low, high) & price).count()
+                for label, low, high in PRICES:
+                    facets["price_per_night"][label] = cabins.filter(
+                        bucket("price_per_night", low, high) & beds
+                    ).count()
+                return facets
+
+            def aggregated():
+                return count_facets(Cabin.objects.all(), beds=beds, price=price)
+
+            self.stdout.write(f"{'variant':<12} {'ms':>8} {'queries':>8}")
+            for name, func in (("per bucket", per_bucket), ("aggregated", aggregated)):
+                with CaptureQueriesContext(connection) as queries:
+                    func()
+                self.stdout.write(f"{name:<12} {measure(func, options['repeat']):8.1f} {len(queries):8}")
+
+    @staticmethod
+    def create_cabins(count, areas):
+        rng = random.Random(0)
+        Area.objects.bulk_create(Area(area=f"Area {i}") for i in range(areas))
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        for start in range(0, count, 10_000):
+            Cabin.objects.bulk_create(
+                Cabin(
+                    name=f"Cabin {i}",
+                    description="Benchmark cabin",
+                    price_per_night=Decimal(rng.randint(5000, 50000)) / 100,
+                    area_id=f"Area {rng.randrange(areas)}",
+                    zip_code=post_code,
+                    num_of_beds=rng.randint(1, 10),
+                )
+                for i in range(start, min(start + 10_000, count))
+            )
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.benchmark import benchmark_database
+from cabins.models import Area, Cabin, PostCode
+from conf.asgi import Handler
+from users.models import User
+
+EMAIL = "benchmark@example.com"
+PASSWORD = "benchmark"
+
+
+async def call(application, method, path, data=None) -> int:
+    """
+    Sends one request to an ASGI application in this process.
+    :return: status code of the response
+    """
+    body = json.dumps(data).encode() if data is not None else b""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    finished = asyncio.Event()
+    status = None
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    await application(scope, receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = "Measures the latency of another endpoint during a storm of logins, with the sync and the async login view."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=32, help="Clients logging in over and over at once")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds every storm lasts")
+        parser.add_argument("--path", default="/api/area/cabins", help="Endpoint whose latency is measured")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_data()
+            self.stdout.write(
+                f"{'login view':<11} {'median ms':>10} {'p95 ms':>8} {'requests':>9} {'logins/s':>9} {'rejected':>9}"
+            )
+            for name, urlconf, logins in (
+                ("no logins", "conf.asgi_urls", 0),
+                ("sync", "conf.urls", options["logins"]),
+                ("async", "conf.asgi_urls", options["logins"]),
+            ):
+                result = asyncio.run(self.storm(Handler(urlconf), logins, options["duration"], options["path"]))
+                latencies = sorted(result["latencies"])
+                self.stdout.write(
+                    f"{name:<11} {statistics.median(latencies):10.1f} "
+                    f"{latencies[int(len(latencies) * 0.95)]:8.1f} {len(latencies):9} "
+                    f"{result['logins'] / options['duration']:9.1f} {result['rejected']:9}"
+                )
+
+    @staticmethod
+    def create_data():
+        User.objects.create_user(username="benchmark", email=EMAIL, password=PASSWORD)
+        area = Area.objects.create(area="Benchmark")
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        Cabin.objects.bulk_create(
+            Cabin(
+                name=f"Cabin {i}",
+                description="Benchmark cabin",
+                price_per_night=100,
+                area=area,
+                zip_code=post_code,
+                num_of_beds=4,
+            )
+            for i in range(20)
+        )
+
+    @staticmethod
+    async def storm(application, logins, duration, path) -> dict:
+        """
+        Keeps the given number of clients logging in while one client requests the measured endpoint in a loop.
+        """
+        result = {"latencies": [], "logins": 0, "rejected": 0}
+        stop_at = time.monotonic() + duration
+
+        async def log_in():
+            while time.monotonic() < stop_at:
+                status = await call(application, "POST", "/api/user/login", {"email": EMAIL, "password": PASSWORD})
+                if status == 200:
+                    result["logins"] += 1
+                elif status == 503:
+                    result["rejected"] += 1
+                    await asyncio.sleep(0.1)
+
+        async def measure():
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                await call(application, "GET", path)
+                result["latencies"].append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(measure(), *(log_in() for _ in range(logins)))
+        return result
@@ -0,0 +1,82 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import catalog
+from api.benchmark import benchmark_database, measure
+from cabins.geo import distance
+from cabins.models import Area, Cabin, PostCode
+from cabins.views import parse_near
+
+
+class Command(BaseCommand):
+    help = "Measures finding the cabins near a post code by computing every distance and with the grid of post codes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cabins", type=int, default=100_000, help="Number of cabins")
+        parser.add_argument("--post-codes", type=int, default=3000, help="Number of post codes the cabins are in")
+        parser.add_argument("--radius", type=float, default=30, help="Radius of the search in km")
+        parser.add_argument("--repeat", type=int, default=5, help="Measured runs per variant")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_cabins(options["cabins"], options["post_codes"])
+            radius = options["radius"]
+            near = PostCode.objects.get(p_code="00000")
+
+            def every_distance():
+                """
+                Computes the distance of every cabin, like a search without a spatial index.
+                """
+                found = []
+                for cabin in Cabin.objects.select_related("zip_code"):
+                    km = distance(near.latitude, near.longitude, cabin.zip_code.latitude, cabin.zip_code.longitude)
+                    if km <= radius:
+                        found.append((km, cabin.pk))
+                found.sort()
+                return [pk for _, pk in found]
+
+            def grid():
+                distances = parse_near(near.p_code, radius)
+                cabins = Cabin.objects.filter(zip_code__in=distances).values_list("pk", "zip_code")
+                return [pk for _, pk in sorted((distances[p_code], pk) for pk, p_code in cabins)]
+
+            catalog.get()
+            if every_distance() != grid():
+                raise AssertionError("The variants found different cabins.")
+            self.stdout.write(f"{len(grid())} cabins within {radius:g} km")
+            self.stdout.write(f"{'variant':<16} {'ms':>8} {'queries':>8}")
+            for name, func in (("every distance", every_distance), ("grid", grid)):
+                with CaptureQueriesContext(connection) as queries:
+                    func()
+                self.stdout.write(f"{name:<16} {measure(func, options['repeat']):8.1f} {len(queries):8}")
+
+    @staticmethod
+    def create_cabins(count, post_codes):
+        rng = random.Random(0)
+        Area.objects.create(area="Benchmark")
+        # Post codes spread over Finland, the first one in Kuopio is searched from
+        PostCode.objects.bulk_create(
+            PostCode(
+                p_code=f"{i:05}",
+                postal_district=f"District {i}",
+                latitude=62.8924 if i == 0 else rng.uniform(60, 70),
+                longitude=27.6770 if i == 0 else rng.uniform(20, 31),
+            )
+            for i in range(post_codes)
+        )
+        for start in range(0, count, 10_000):
+            Cabin.objects.bulk_create(
+                Cabin(
+                    name=f"Cabin {i}",
+                    description="Benchmark cabin",
+                    price_per_night=Decimal(rng.randint(5000, 50000)) / 100,
+                    area_id="Benchmark",
+                    zip_code_id=f"{rng.randrange(post_codes):05}",
+                    num_of_beds=rng.randint(1, 10),
+                )
+                for i in range(start, min(start + 10_000, count))
+            )
@@ -0,0 +1,115 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.benchmark import benchmark_database, measure
+from cabins.models import Area, Cabin, PostCode
+from reservations.models import Reservation
+from users.models import User
+
+FIRST_NIGHT = date(2000, 1, 1)
+NIGHTS = 3  # Every generated stay is three nights long
+SLOT = NIGHTS + 1  # and followed by one free night
+CANCELED_AT = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = "Measures overlap check latency of a booking while the reservations table grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000, 10_000_000],
+            help="Reservation table sizes to measure at",
+        )
+        parser.add_argument("--cabins", type=int, default=1000, help="Number of cabins the reservations are spread on")
+        parser.add_argument("--repeat", type=int, default=200, help="Measured bookings per table size")
+        parser.add_argument("--legacy", action="store_true", help="Also measure the old unscoped overlap query")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            cabin_ids = self.create_cabins(options["cabins"])
+            self.stdout.write(f"{'reservations':>12} {'clean() ms':>12} {'available ms':>13} {'legacy ms':>10}")
+
+            inserted = 0
+            for size in sorted(options["sizes"]):
+                self.insert_reservations(cabin_ids, inserted, size)
+                inserted = size
+
+                # Book around the newest stays, where a scan without a lower bound would cover the whole history
+                last_night = FIRST_NIGHT + timedelta(days=(size // len(cabin_ids)) * SLOT)
+
+                def random_booking():
+                    start = last_night - timedelta(days=random.randint(0, 60))
+                    return random.choice(cabin_ids), start, start + timedelta(days=random.randint(1, 7))
+
+                clean_ms = measure(lambda: self.clean(*random_booking()), options["repeat"])
+                available_ms = measure(lambda: Reservation.is_cabin_available(*random_booking()), options["repeat"])
+                legacy = "-"
+                if options["legacy"]:
+                    legacy = f"{measure(lambda: self.legacy_overlap(*random_booking()), 5):10.3f}"
+                self.stdout.write(f"{size:>12} {clean_ms:12.3f} {available_ms:13.3f} {legacy:>10}")
+
+    @staticmethod
+    def create_cabins(count) -> list:
+        area = Area.objects.create(area="Benchmark")
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        Cabin.objects.bulk_create(
+            Cabin(
+                name=f"Cabin {i}",
+                description="Benchmark cabin",
+                price_per_night=100,
+                area=area,
+                zip_code=post_code,
+                num_of_beds=4,
+            )
+            for i in range(count)
+        )
+        return list(Cabin.objects.values_list("id", flat=True))
+
+    @staticmethod
+    def insert_reservations(cabin_ids, start, stop, batch_size=10_000):
+        """
+        Inserts reservations number start..stop. Each cabin gets consecutive stays and every tenth one is canceled.
+        """
+        user = User.objects.first() or User.objects.create_user(
+            username="benchmark", email="benchmark@example.com", password="benchmark"
+        )
+        for batch_start in range(start, stop, batch_size):
+            batch = []
+            for n in range(batch_start, min(batch_start + batch_size, stop)):
+                first_night = FIRST_NIGHT + timedelta(days=(n // len(cabin_ids)) * SLOT)
+                batch.append(
+                    Reservation(
+                        cabin_id=cabin_ids[n % len(cabin_ids)],
+                        customer=user,
+                        owner=user,
+                        start_date=first_night,
+                        end_date=first_night + timedelta(days=NIGHTS),
+                        canceled_at=CANCELED_AT if n % 10 == 0 else None,
+                    )
+                )
+            Reservation.objects.bulk_create(batch)
+
+    @staticmethod
+    def clean(cabin_id, start_date, end_date):
+        try:
+            Reservation(cabin_id=cabin_id, start_date=start_date, end_date=end_date).clean()
+        except ValidationError:
+            pass
+
+    @staticmethod
+    def legacy_overlap(cabin_id, start_date, end_date):
+        """
+        The overlap query Reservation.clean() used before it was scoped to the cabin.
+        """
+        return Reservation.objects.filter(
+            Q(start_date__range=(start_date, end_date))
+            | Q(end_date__range=(start_date, end_date))
+            | Q(start_date__lte=start_date, end_date__gte=end_date)
+        ).exists()
@@ -0,0 +1,70 @@
+import random
+from functools import reduce
+from operator import and_
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.benchmark import benchmark_database, measure
+from cabins.models import Area, Cabin, PostCode
+from cabins.search import search
+
+# Words of the descriptions, from the most to the least common, used about as often as their rank is inverse
+WORDS = (
+    "cabin with view lake forest sauna family wifi quiet modern cozy fireplace beach river hiking fishing boat "
+    "rustic lakeside mountain ski dock remote cottage lodge timber garden terrace jacuzzi fjord"
+).split() + [f"word{i}" for i in range(5000)]
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+# Searches as the q parameter of /api/area/cabins
+SEARCHES = ["sauna", "sauna lakeside", "fjord jacuzzi", "word100", "fish"]
+
+
+class Command(BaseCommand):
+    help = "Measures the latency of searching cabin names and descriptions with LIKE scans and the full-text index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cabins", type=int, default=100_000, help="Number of cabins")
+        parser.add_argument("--repeat", type=int, default=20, help="Measured runs per search")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.create_cabins(options["cabins"])
+            # LIKE matches words inside longer ones too, so it finds more rows
+            self.stdout.write(f"{'q':<24} {'like rows':>9} {'like ms':>8} {'fts rows':>9} {'fts ms':>7}")
+            for q in SEARCHES:
+                like_ms = measure(lambda: self.like_search(q), options["repeat"])
+                fts_ms = measure(lambda: self.search(q), options["repeat"])
+                self.stdout.write(
+                    f"{q:<24} {len(self.like_search(q)):>9} {like_ms:8.2f} {len(self.search(q)):>9} {fts_ms:7.2f}"
+                )
+
+    @staticmethod
+    def create_cabins(count):
+        rng = random.Random(0)
+        area = Area.objects.create(area="Benchmark")
+        post_code = PostCode.objects.create(p_code="00000", postal_district="Benchmark")
+        for start in range(0, count, 10_000):
+            Cabin.objects.bulk_create(
+                Cabin(
+                    name=f"{rng.choice(WORDS[:30]).title()} {i}",
+                    description=" ".join(rng.choices(WORDS, WEIGHTS, k=rng.randint(5, 30))),
+                    price_per_night=100,
+                    area=area,
+                    zip_code=post_code,
+                    num_of_beds=4,
+                )
+                for i in range(start, min(start + 10_000, count))
+            )
+
+    @staticmethod
+    def search(q) -> list:
+        return list(search(Cabin.objects.all(), q).order_by("rank", "pk"))
+
+    @staticmethod
+    def like_search(q) -> list:
+        """
+        Matches every word anywhere in the name or description, unranked.
+        """
+        words = [Q(name__icontains=word) | Q(description__icontains=word) for word in q.split()]
+        return list(Cabin.objects.filter(reduce(and_, words)))
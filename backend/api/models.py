@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class CatalogVersion(models.Model):
+    """
+    Single row counting the changes of the areas, post codes and services, see api.catalog.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"v{self.version}"
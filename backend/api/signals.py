@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cabins.models import Area, PostCode
+from services.models import Service
+from . import catalog
+
+
+@receiver(post_save, sender=Area)
+@receiver(post_save, sender=PostCode)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Area)
+@receiver(post_delete, sender=PostCode)
+@receiver(post_delete, sender=Service)
+def invalidate_catalog(sender, raw=False, **kwargs):
+    """
+    Reloads the catalog in this process and makes the other processes reload theirs at their next check.
+    """
+    if raw:
+        return
+    catalog.invalidate()
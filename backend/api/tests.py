@@ -1,12 +1,22 @@
 import datetime
+import io
 import json
 
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
+from api.models import CatalogVersion
 from cabins.models import Area, PostCode, Cabin
+from jobs.queue import run_due
+from reservations import pdf
 from reservations.models import Reservation, Invoice
+from reservations.testing import use_temporary_pdf_dir
 from services.models import Service
+from users import tokens
 from users.models import User
 
 
@@ -118,6 +128,209 @@ class TestCabinApi(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data["data"]), 2)
 
+    def test_cabin_search_by_beds_and_price(self):
+        """
+        Tests that cabins are filtered by at least a number of beds and a price range, and sorted.
+        """
+        area = Area.objects.create(area="Area 1")
+        post_code = PostCode.objects.create(p_code="0001", postal_district="District 1")
+        for i in range(1, 6):
+            Cabin.objects.create(
+                name=f"Cabin {i}", price_per_night=i * 100, area=area, zip_code=post_code, num_of_beds=i * 2
+            )
+
+        response = self.client.get("/api/area/cabins", {"num_of_beds": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Cabin 3", "Cabin 4", "Cabin 5"])
+
+        response = self.client.get(
+            "/api/area/cabins", {"min_price": "200", "max_price": "400.50", "ordering": "-price_per_night"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Cabin 4", "Cabin 3", "Cabin 2"])
+
+        response = self.client.get("/api/area/cabins", {"num_of_beds": 20})
+        self.assertEqual(response.status_code, 404)
+
+        for params in ({"num_of_beds": "many"}, {"min_price": "cheap"}, {"ordering": "description"}):
+            response = self.client.get("/api/area/cabins", params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_cabin_full_text_search(self):
+        """
+        Tests that cabins are searched by the words of their name and description, best matches first.
+        """
+        area = Area.objects.create(area="Area 1")
+        post_code = PostCode.objects.create(p_code="0001", postal_district="District 1")
+        for name, description, beds in (
+            ("Forest hut", "Small hut with a sauna, a walk from the lake", 2),
+            ("Lakeside", "Sauna and hot tub by the lake", 6),
+            ("Mountain lodge", "Ski in, ski out", 8),
+        ):
+            Cabin.objects.create(
+                name=name, description=description, price_per_night=100, area=area, zip_code=post_code, num_of_beds=beds
+            )
+
+        response = self.client.get("/api/area/cabins", {"q": "Sauna lake"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Lakeside", "Forest hut"])
+
+        # Combined with the other filters, the last word also matches the start of a word
+        response = self.client.get("/api/area/cabins", {"q": "sau", "num_of_beds": 4, "area": area.area})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Lakeside"])
+
+        response = self.client.get("/api/area/cabins", {"q": "sauna", "ordering": "name"})
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Forest hut", "Lakeside"])
+
+        response = self.client.get("/api/area/cabins", {"q": "sauna ski"})
+        self.assertEqual(response.status_code, 404)
+
+        for params in ({"q": '"*'}, {"ordering": "rank"}):
+            response = self.client.get("/api/area/cabins", params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_cabin_facets(self):
+        """
+        Tests that the cabins a search finds are counted by area, beds and price in one query.
+        """
+        area = Area.objects.create(area="Espoo")
+        for i, (cabin_area, beds, price) in enumerate(
+            [(self.area, 2, 80), (self.area, 4, 150), (self.area, 8, 400), (area, 4, 120), (area, 6, 250)]
+        ):
+            Cabin.objects.create(
+                name=f"Cabin {i}",
+                description="Sauna" if i % 2 else "Lake",
+                price_per_night=price,
+                area=cabin_area,
+                zip_code=self.post,
+                num_of_beds=beds,
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/area/cabins/facets", {"area": "Helsinki", "num_of_beds": 3})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["data"],
+            {
+                "total": 2,
+                # The other filters, not the area
+                "area": {"Helsinki": 2, "Espoo": 2},
+                # The other filters, not the beds
+                "num_of_beds": {"1-2": 1, "3-4": 1, "7+": 1},
+                "price_per_night": {"100-200": 1, "300+": 1},
+            },
+        )
+
+        # The cabins found by the text, free for the stay
+        Reservation.objects.create(
+            cabin=Cabin.objects.get(name="Cabin 1"),
+            customer=self.customer,
+            owner=self.owner,
+            start_date=datetime.date(2030, 1, 1),
+            end_date=datetime.date(2030, 1, 5),
+        )
+        response = self.client.get(
+            "/api/area/cabins/facets", {"q": "sauna", "check_in": "2030-01-02", "check_out": "2030-01-03"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["total"], 1)
+        self.assertEqual(response.data["data"]["area"], {"Espoo": 1})
+
+        response = self.client.get("/api/area/cabins/facets", {"min_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cabin_search_near_post_code(self):
+        """
+        Tests that cabins can be searched within a radius of a post code, nearest first.
+        """
+        call_command("load_post_codes", stdout=io.StringIO())
+        self.assertEqual(PostCode.objects.get(p_code="70100").postal_district, "Kuopio")
+        # Kuopio 0 km, Siilinjärvi 20 km, Karttula 36 km, Helsinki 350 km away from 70100
+        for name, p_code, beds in [
+            ("Karttula", "72100", 4),
+            ("Kuopio", "70100", 2),
+            ("Siilinjärvi", "71800", 6),
+            ("Helsinki", "00100", 4),
+        ]:
+            Cabin.objects.create(
+                name=name,
+                description=name,
+                price_per_night=100,
+                area=self.area,
+                zip_code_id=p_code,
+                num_of_beds=beds,
+            )
+
+        response = self.client.get("/api/area/cabins", {"near": "70100"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Kuopio", "Siilinjärvi"])
+        self.assertEqual([cabin["distance"] for cabin in response.data["data"]], [0.0, 20.3])
+
+        response = self.client.get("/api/area/cabins", {"near": "70100", "radius": 50, "num_of_beds": 3})
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Siilinjärvi", "Karttula"])
+        response = self.client.get("/api/area/cabins", {"near": "70100", "radius": 50, "ordering": "-num_of_beds"})
+        self.assertEqual([cabin["name"] for cabin in response.data["data"]], ["Siilinjärvi", "Karttula", "Kuopio"])
+        response = self.client.get("/api/area/cabins/facets", {"near": "70100", "radius": 50})
+        self.assertEqual(response.data["data"]["num_of_beds"], {"1-2": 1, "3-4": 1, "5-6": 1})
+
+        self.assertEqual(self.client.get("/api/area/cabins", {"near": "70100", "radius": "far"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/area/cabins", {"near": "70100", "radius": 0}).status_code, 400)
+        self.assertEqual(self.client.get("/api/area/cabins", {"near": "70100", "radius": 10_000}).status_code, 400)
+        # Unknown and without coordinates
+        self.assertEqual(self.client.get("/api/area/cabins", {"near": "99999"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/area/cabins", {"near": self.post.p_code}).status_code, 400)
+
+    def test_cabin_search_by_availability(self):
+        """
+        Tests that booked cabins are left out when searching with check-in and check-out dates.
+        """
+        cabins, services, areas, post_codes = self.create_dummy_data()
+        check_in = datetime.date.today() + datetime.timedelta(days=7)
+        check_out = check_in + datetime.timedelta(days=3)
+
+        # Cabins 2 and 3 are in the same area, book cabin 2 for the searched stay:
+        Reservation.objects.create(
+            cabin_id=cabins[1],
+            customer=self.customer,
+            owner=self.owner,
+            start_date=check_in + datetime.timedelta(days=1),
+            end_date=check_out + datetime.timedelta(days=1),
+        )
+        # and cabin 3 for the stay right before it
+        Reservation.objects.create(
+            cabin_id=cabins[2],
+            customer=self.customer,
+            owner=self.owner,
+            start_date=check_in - datetime.timedelta(days=2),
+            end_date=check_in,
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/area/cabins", {"area": areas[0].area, "check_in": check_in, "check_out": check_out}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cabin["id"] for cabin in response.data["data"]], [cabins[2]])
+
+        response = self.client.get("/api/area/cabins", {"check_in": check_in, "check_out": check_out})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), 9)
+
+    def test_cabin_search_with_invalid_dates(self):
+        """
+        Tests that invalid stay dates are rejected.
+        """
+        today = datetime.date.today()
+        response = self.client.get("/api/area/cabins", {"check_in": today})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/area/cabins", {"check_in": today, "check_out": today})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/area/cabins", {"check_in": "tomorrow", "check_out": today})
+        self.assertEqual(response.status_code, 400)
+
     def test_search_by_id(self):
         """
         Tests that a cabin can be searched by id.
@@ -129,6 +342,49 @@ class TestCabinApi(APITestCase):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(response.data["data"]["name"], f"Cabin {cabin}")
 
+    def test_cabin_conditional_get(self):
+        """
+        Tests that cabins are answered with 304 and one query while they have not changed.
+        """
+        cabins, services, areas, post_codes = self.create_dummy_data()
+        params = {"area": areas[0].area}
+
+        response = self.client.get("/api/area/cabins", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/area/cabins", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(len(queries), 1)
+
+        # Changes of the cabins of the area, but not of others, change the ETag
+        Cabin.objects.exclude(area=areas[0]).first().save()
+        response = self.client.get("/api/area/cabins", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        cabin = Cabin.objects.filter(area=areas[0]).first()
+        cabin.save()
+        response = self.client.get("/api/area/cabins", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        cabin.delete()
+        response = self.client.get("/api/area/cabins", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), 1)
+
+        response = self.client.get("/api/area/cabins", {"id": cabins[-1]})
+        response = self.client.get("/api/area/cabins", {"id": cabins[-1]}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get("/api/area/")
+        response = self.client.get("/api/area/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        Area.objects.create(area="Area 6")
+        response = self.client.get("/api/area/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
     def test_update_cabin_info(self):
         """
         Tests that a cabin's info can be updated.
@@ -240,9 +496,48 @@ class TestAreaApi(APITestCase):
         response = self.client.get(f"/api/area/?area={data['area']}")
         self.assertEqual(response.status_code, 404)
 
+    def test_catalog(self):
+        """
+        Tests that areas, post codes and services are read from memory and reloaded when they change.
+        """
+        area = Area.objects.create(area="Helsinki")
+        PostCode.objects.create(p_code="00100", postal_district="Helsinki")
+        Service.objects.create(area=area, name="Sauna", description="Sauna", service_price=10, vat_price=2)
+        self.client.get("/api/area/")
+
+        def catalog_queries(queries):
+            tables = ["cabins_area", "cabins_postcode", "services_service"]
+            return [query["sql"] for query in queries if any(table in query["sql"] for table in tables)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/area/")
+            self.assertEqual([area["area"] for area in response.data["data"]], ["Helsinki"])
+            response = self.client.get("/api/area/services/get", {"area": "Helsinki"})
+            self.assertEqual([service["name"] for service in response.data["data"]], ["Sauna"])
+            cabin = {"name": "Cabin", "description": "Cabin", "price_per_night": 100, "num_of_beds": 4}
+            response = self.client.post("/api/area/cabins/create", {**cabin, "area": "Helsinki", "zip_code": "00100"})
+            self.assertEqual(response.status_code, 201)
+        # Only the cabin is inserted
+        self.assertEqual(len(catalog_queries(queries)), 0)
+
+        response = self.client.post("/api/area/cabins/create", {**cabin, "area": "Espoo", "zip_code": "00100"})
+        self.assertEqual(response.status_code, 400)
+
+        # Changed in this process
+        Area.objects.create(area="Espoo")
+        response = self.client.post("/api/area/cabins/create", {**cabin, "area": "Espoo", "zip_code": "00100"})
+        self.assertEqual(response.status_code, 201)
+
+        # Changed by another process, which bumped the version
+        Area.objects.bulk_create([Area(area="Vantaa")])
+        CatalogVersion.objects.update(version=F("version") + 1)
+        response = self.client.get("/api/area/")
+        self.assertEqual([area["area"] for area in response.data["data"]], ["Espoo", "Helsinki", "Vantaa"])
+
 
 class TestInvoiceApi(APITestCase):
     def setUp(self):
+        use_temporary_pdf_dir(self)
         self.client = APIClient()
 
         self.owner = User.objects.create_user(username="owner", password="owner", email="owner@email.com")
@@ -303,6 +598,16 @@ class TestInvoiceApi(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response_data[0]["reservation"], self.reservation.id)
 
+        # Nothing changed, then the invoice was paid
+        url = f"/api/reservation/invoice?invoice={invoice.id}"
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        invoice.paid_at = datetime.datetime.now(datetime.timezone.utc)
+        invoice.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["data"][0]["paid_at"])
+
     def test_get_invoice_when_not_owner(self):
         """
         Tests that an invoice can be retrieved.
@@ -338,6 +643,54 @@ class TestInvoiceApi(APITestCase):
         self.assertEqual(response_data[0]["reservation"], self.reservation.id)
         self.assertEqual(len(response_data), 4)
 
+    def test_get_invoice_pdf(self):
+        """
+        Tests that the PDF of an invoice is generated in the background and downloaded with an ETag.
+        """
+        invoice = Invoice.objects.create(reservation=self.reservation)
+        response = self.client.get(f"/api/reservation/invoice?invoice={invoice.id}")
+        self.assertEqual(response.data["data"][0]["pdf"], f"/api/reservation/invoice/pdf?invoice={invoice.id}")
+
+        response = self.client.get(f"/api/reservation/invoice/pdf?invoice={invoice.id}")
+        self.assertEqual(response.status_code, 202)
+        text = Invoice.render_invoices([invoice])[invoice.id]
+        future = pdf.generate(invoice.id, text)
+        if future:
+            future.result(timeout=60)
+
+        response = self.client.get(f"/api/reservation/invoice/pdf?invoice={invoice.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+        response = self.client.get(
+            f"/api/reservation/invoice/pdf?invoice={invoice.id}", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_export_invoices(self):
+        """
+        Tests that invoices are streamed as NDJSON and CSV.
+        """
+        invoice = Invoice.objects.create(reservation=self.reservation)
+        response = self.client.get("/api/reservation/invoice/export")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], invoice.id)
+        self.assertEqual(rows[0]["customer"], "customer")
+        self.assertEqual(rows[0]["total_price"], "210.00")
+
+        response = self.client.get("/api/reservation/invoice/export", {"output": "csv"})
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "reservation", "customer"])
+        self.assertEqual(lines[1].split(",")[:3], [str(invoice.id), str(self.reservation.id), "customer"])
+
+        response = self.client.get("/api/reservation/invoice/export", {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
     def test_update_invoice(self):
         """
         Tests that an invoice can be updated.
@@ -364,6 +717,7 @@ class TestInvoiceApi(APITestCase):
 
 class TestReservationApi(APITestCase):
     def setUp(self):
+        use_temporary_pdf_dir(self)
         self.owner = User.objects.create_user(username="owner", password="owner", email="owner@email.com")
         self.customer = User.objects.create_user(username="customer", password="customer", email="customer@email.com")
 
@@ -450,6 +804,37 @@ class TestReservationApi(APITestCase):
 
         self.assertEqual(response.status_code, 401)
 
+    def test_authentication(self):
+        """
+        Tests that requests are authenticated from the claims of their token and errors keep the API's format.
+        """
+        Reservation.objects.create(
+            cabin=self.cabin,
+            customer=self.customer,
+            owner=self.owner,
+            start_date=datetime.date.today(),
+            end_date=datetime.date.today() + datetime.timedelta(days=2),
+        )
+        tokens.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/reservation/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum('"users_user"' in query["sql"] for query in queries), 0)
+
+        response = self.client.get("/api/reservation/revenue")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data, {"result": "error", "message": "Unauthenticated!"})
+
+        self.client.credentials()
+        response = self.client.get("/api/reservation/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data, {"result": "error", "message": "Unauthenticated!"})
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        response = self.client.get("/api/area/cabins")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data, {"result": "error", "message": "Unauthenticated: token invalid!"})
+
     def test_reservation_get(self):
         """
         Tests that a reservation can be retrieved.
@@ -569,3 +954,282 @@ class TestReservationApi(APITestCase):
         """
         response = self.client.delete(f"/api/reservation/delete")
         self.assertEqual(response.status_code, 400)
+
+    def test_reservation_availability(self):
+        """
+        Tests that check-in dates for consecutive free nights are returned per cabin.
+        """
+        Reservation.objects.create(
+            cabin=self.cabin,
+            customer=self.customer,
+            owner=self.owner,
+            start_date=datetime.date(2024, 7, 3),
+            end_date=datetime.date(2024, 7, 6),
+        )
+
+        response = self.client.get(
+            "/api/reservation/availability",
+            {"area": self.area.area, "start": "2024-07-01", "end": "2024-07-10", "nights": 3},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["data"],
+            [{"cabin": self.cabin.id, "check_in": [datetime.date(2024, 7, 6), datetime.date(2024, 7, 7)]}],
+        )
+
+        response = self.client.get(
+            "/api/reservation/availability", {"start": "2024-07-01", "end": "2024-07-10", "nights": 5}
+        )
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get("/api/reservation/availability", {"start": "2024-07-01"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reservation_get_query_count(self):
+        """
+        Tests that listing reservations and invoices takes the same number of queries for any number of rows.
+        """
+        self.customer.is_staff = True
+        self.customer.save()
+
+        def create_reservations(count):
+            for _ in range(count):
+                reservation = Reservation.objects.create(
+                    cabin=self.cabin,
+                    customer=self.customer,
+                    owner=self.owner,
+                    start_date=datetime.date.today(),
+                    end_date=datetime.date.today() + datetime.timedelta(days=2),
+                )
+                reservation.services.add(self.service)
+                Invoice.objects.create(reservation=reservation)
+
+        query_counts = []
+        for count in (1, 20):
+            create_reservations(count)
+            tokens.clear()  # Every round authenticates from the database
+            with CaptureQueriesContext(connection) as reservation_queries:
+                response = self.client.get("/api/reservation/")
+            self.assertEqual(response.status_code, 200)
+            with CaptureQueriesContext(connection) as invoice_queries:
+                response = self.client.get("/api/reservation/invoice")
+            self.assertEqual(response.status_code, 200)
+            query_counts.append((len(reservation_queries), len(invoice_queries)))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_reservation_get_pages(self):
+        """
+        Tests that reservations are listed page by page with continuation cursors.
+        """
+        reservations = []
+        for i in range(5):
+            reservation = Reservation.objects.create(
+                cabin=self.cabin,
+                customer=self.customer,
+                owner=self.owner,
+                start_date=datetime.date.today() + datetime.timedelta(days=i * 3),
+                end_date=datetime.date.today() + datetime.timedelta(days=i * 3 + 2),
+            )
+            reservations.append(reservation)
+        # Rows created at the same moment are ordered by id
+        Reservation.objects.filter(pk__in=[reservation.id for reservation in reservations[:4]]).update(
+            created_at=reservations[0].created_at
+        )
+
+        listed = []
+        pages = 0
+        params = {"page_size": 2}
+        while True:
+            response = self.client.get("/api/reservation/", params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["data"]), 2)
+            listed += [reservation["start_date"] for reservation in response.data["data"]]
+            pages += 1
+            if not response.data["next"]:
+                break
+            params["cursor"] = response.data["next"]
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(listed, [str(reservation.start_date) for reservation in reservations])
+
+        response = self.client.get("/api/reservation/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reservation_create_overlapping(self):
+        """
+        Tests that a booking overlapping an existing booking of the cabin is rejected.
+        """
+        data = {
+            "cabin": self.cabin.id,
+            "customer": self.customer.id,
+            "owner": self.owner.id,
+            "start_date": datetime.date.today(),
+            "end_date": datetime.date.today() + datetime.timedelta(days=2),
+        }
+        response = self.client.post("/api/reservation/create", data)
+        self.assertEqual(response.status_code, 201)
+        run_due()
+        self.assertEqual(Invoice.objects.filter(reservation__cabin=self.cabin).count(), 1)
+
+        data["start_date"] = datetime.date.today() + datetime.timedelta(days=1)
+        data["end_date"] = datetime.date.today() + datetime.timedelta(days=3)
+        response = self.client.post("/api/reservation/create", data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], ["Reservation overlaps with an existing booking."])
+
+        data["start_date"] = datetime.date.today() + datetime.timedelta(days=2)
+        response = self.client.post("/api/reservation/create", data)
+        self.assertEqual(response.status_code, 201)
+
+        data["start_date"] = datetime.date.today() + datetime.timedelta(days=5)
+        response = self.client.post("/api/reservation/create", data)
+        self.assertEqual(response.status_code, 400)
+        run_due()
+        self.assertEqual(Reservation.objects.count(), 2)
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_reservation_create_batch(self):
+        """
+        Tests that a batch of reservations is booked at once, with the same number of queries for any size.
+        """
+        today = datetime.date.today()
+
+        def batch(count, first_day=0):
+            return [
+                {
+                    "cabin": self.cabin.id,
+                    "customer": self.customer.id,
+                    "owner": self.owner.id,
+                    "services": [self.service.id],
+                    "start_date": str(today + datetime.timedelta(days=first_day + i * 2)),
+                    "end_date": str(today + datetime.timedelta(days=first_day + i * 2 + 2)),
+                }
+                for i in range(count)
+            ]
+
+        query_counts = []
+        for count, first_day in ((2, 0), (30, 10)):
+            tokens.clear()  # Every round authenticates from the database
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/api/reservation/create/batch", batch(count, first_day), format="json")
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["data"]), count)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+        self.assertEqual(Reservation.objects.count(), 32)
+        self.assertEqual(Invoice.objects.count(), 32)
+        reservation = Reservation.objects.get(start_date=today)
+        self.assertEqual(reservation.total_price, 210)
+        self.assertEqual(list(reservation.services.all()), [self.service])
+        response = self.client.get(
+            "/api/reservation/availability", {"start": str(today), "end": str(today + datetime.timedelta(days=4))}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_reservation_create_batch_overlapping(self):
+        """
+        Tests that nothing is booked when any reservation of a batch overlaps another booking.
+        """
+        today = datetime.date.today()
+        Reservation.objects.create(
+            cabin=self.cabin,
+            customer=self.customer,
+            owner=self.owner,
+            start_date=today,
+            end_date=today + datetime.timedelta(days=2),
+        )
+        data = [
+            {
+                "cabin": self.cabin.id,
+                "customer": self.customer.id,
+                "owner": self.owner.id,
+                "start_date": str(today + datetime.timedelta(days=start)),
+                "end_date": str(today + datetime.timedelta(days=start + 2)),
+            }
+            for start in (2, 1, 5, 6)
+        ]
+        response = self.client.post("/api/reservation/create/batch", data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"]["1"], ["Reservation overlaps with an existing booking."])
+        self.assertEqual(response.data["message"]["3"], ["Reservation overlaps with item 2 of the batch."])
+        self.assertNotIn("0", response.data["message"])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+        response = self.client.post("/api/reservation/create/batch", [], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_revenue(self):
+        """
+        Tests that staff get the revenue per area and month, including reservations booked in a batch.
+        """
+        data = [
+            {
+                "cabin": self.cabin.id,
+                "customer": self.customer.id,
+                "owner": self.owner.id,
+                "services": [self.service.id],
+                "start_date": "2024-07-01",
+                "end_date": "2024-07-03",
+            }
+        ]
+        response = self.client.post("/api/reservation/create/batch", data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get("/api/reservation/revenue")
+        self.assertEqual(response.status_code, 401)
+
+        self.customer.is_staff = True
+        self.customer.save()
+        response = self.client.get("/api/reservation/revenue", {"start": "2024-07", "end": "2024-07"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), 1)
+        row = response.data["data"][0]
+        self.assertEqual((row["area"], row["month"]), ("Helsinki", "2024-07"))
+        self.assertEqual((row["cabin_unpaid"], row["services_unpaid"], row["total"]), ("200.00", "10.00", 210))
+
+        response = self.client.get("/api/reservation/revenue", {"start": "July"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_quotes(self):
+        """
+        Tests that many stays are priced at once with the same number of queries for any number of stays.
+        """
+        self.client.credentials()
+
+        def stays(count):
+            return [
+                {
+                    "cabin": self.cabin.id,
+                    "check_in": "2024-07-01",
+                    "check_out": f"2024-07-{2 + i % 20:02d}",
+                    "services": [self.service.id],
+                }
+                for i in range(count)
+            ]
+
+        query_counts = []
+        for count in (1, 200):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/api/reservation/quote", stays(count), format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["data"]), count)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+        quote = response.data["data"][2]
+        self.assertEqual(quote["nights"], 3)
+        self.assertEqual(
+            (quote["cabin_price"], quote["services_price"], quote["total_price"]), ("300.00", "10.00", "310.00")
+        )
+
+        data = [
+            {"cabin": self.cabin.id, "check_in": "2024-07-02", "check_out": "2024-07-01"},
+            {"cabin": 0, "check_in": "2024-07-01", "check_out": "2024-07-02"},
+        ]
+        response = self.client.post("/api/reservation/quote", data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"][0]["error"], "Check-out must be after check-in.")
+        self.assertEqual(response.data["data"][1]["error"], "Cabin 0 does not exist.")
+        self.assertNotIn("total_price", response.data["data"][0])
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import Cabin, Area, PostCode
+from .models import Cabin, Area, PostCode, RatePlan, Season
 
 admin.site.register(Cabin)
 admin.site.register(Area)
 admin.site.register(PostCode)
+admin.site.register(RatePlan)
+admin.site.register(Season)
@@ -0,0 +1,49 @@
+"""
+Facet counts of a cabin search: the number of cabins per area, per bucket of beds and per bucket of nightly price.
+
+The counts of a facet leave out the search's own filter of that facet and keep the others, so they tell how many
+cabins the search would find with another area, number of beds or price instead. All of them are counted in one
+query grouping the cabins by area, with a conditional count per bucket.
+"""
+
+from django.db.models import Count, Q
+
+# Buckets as (label, lowest value, value the bucket ends before or None)
+BEDS = [("1-2", 1, 3), ("3-4", 3, 5), ("5-6", 5, 7), ("7+", 7, None)]
+PRICES = [("0-100", 0, 100), ("100-200", 100, 200), ("200-300", 200, 300), ("300+", 300, None)]
+
+
+def bucket(field, low, high) -> Q:
+    if high is None:
+        return Q(**{f"{field}__gte": low})
+    return Q(**{f"{field}__gte": low, f"{field}__lt": high})
+
+
+def count_facets(cabins, area=None, beds=Q(), price=Q()) -> dict:
+    """
+    Counts the cabins found by a search by area, beds and price.
+    :param cabins: queryset of the cabins found by the filters other than area, beds and price
+    :param area: area the search is filtered by, if any
+    :param beds: filter of the search by number of beds
+    :param price: filter of the search by nightly price
+    :return: dict of the total and of the counts by facet and bucket, buckets without cabins are left out
+    """
+    counts = {"found": Count("pk", filter=beds & price)}
+    for i, (_, low, high) in enumerate(BEDS):
+        counts[f"beds_{i}"] = Count("pk", filter=bucket("num_of_beds", low, high) & price)
+    for i, (_, low, high) in enumerate(PRICES):
+        counts[f"price_{i}"] = Count("pk", filter=bucket("price_per_night", low, high) & beds)
+    rows = cabins.order_by().values("area").annotate(**counts)
+
+    facets = {"total": 0, "area": {}, "num_of_beds": {}, "price_per_night": {}}
+    for row in rows:
+        if row["found"]:
+            facets["area"][row["area"]] = row["found"]
+        if area is not None and row["area"] != area:
+            continue
+        facets["total"] += row["found"]
+        for facet, prefix, buckets in (("num_of_beds", "beds", BEDS), ("price_per_night", "price", PRICES)):
+            for i, (label, _, _) in enumerate(buckets):
+                if row[f"{prefix}_{i}"]:
+                    facets[facet][label] = facets[facet].get(label, 0) + row[f"{prefix}_{i}"]
+    return facets
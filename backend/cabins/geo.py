@@ -0,0 +1,70 @@
+"""
+Distances between post codes.
+
+A cabin is located at the centroid of its post code, see PostCode.latitude and longitude, so the cabins near a post
+code are those of the post codes near it. The post codes with coordinates are put into a grid of square cells of
+GRID_CELL_KM; a search computes the distance only to the post codes in the cells the radius overlaps, and the
+cabins of those post codes are looked up by the index of Cabin.zip_code.
+"""
+
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180  # Along a meridian
+GRID_CELL_KM = 25
+
+
+def distance(lat1, lon1, lat2, lon2) -> float:
+    """
+    Returns the great-circle distance between two points in km.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class GridIndex:
+    """
+    Points in a grid of cells of the same size in degrees of latitude and longitude.
+    """
+
+    def __init__(self, points, cell_km=GRID_CELL_KM):
+        """
+        :param points: iterable of (key, latitude, longitude)
+        """
+        self.cell = cell_km / KM_PER_DEGREE
+        self.cells = defaultdict(list)  # (row, column) -> points in the cell
+        for key, lat, lon in points:
+            self.cells[self._cell(lat, lon)].append((key, lat, lon))
+
+    def _cell(self, lat, lon) -> tuple:
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def within(self, lat, lon, radius_km) -> list:
+        """
+        Returns the points within a radius of a point.
+        :return: list of (distance in km, key), nearest first
+        """
+        # A degree of longitude gets shorter towards the poles
+        lat_span = radius_km / KM_PER_DEGREE
+        lon_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        low_row, low_column = self._cell(lat - lat_span, lon - lon_span)
+        high_row, high_column = self._cell(lat + lat_span, lon + lon_span)
+        if (high_row - low_row + 1) * (high_column - low_column + 1) > len(self.cells):
+            cells = self.cells.values()
+        else:
+            cells = (
+                self.cells.get((row, column), ())
+                for row in range(low_row, high_row + 1)
+                for column in range(low_column, high_column + 1)
+            )
+
+        found = []
+        for points in cells:
+            for key, point_lat, point_lon in points:
+                point_distance = distance(lat, lon, point_lat, point_lon)
+                if point_distance <= radius_km:
+                    found.append((point_distance, key))
+        found.sort()
+        return found
@@ -0,0 +1,75 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api import catalog
+from cabins.models import PostCode
+
+DEFAULT_FILE = Path(__file__).resolve().parents[2] / "data" / "post_codes.csv"
+
+
+class Command(BaseCommand):
+    help = "Creates or updates post codes and the coordinates of their centroids from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file",
+            nargs="?",
+            default=DEFAULT_FILE,
+            help="CSV file with p_code, postal_district, latitude and longitude columns, by default the approximate "
+            "centroids in cabins/data/post_codes.csv",
+        )
+
+    def handle(self, *args, **options):
+        rows = self.read(options["file"])
+        now = timezone.now()
+        with transaction.atomic():
+            post_codes = PostCode.objects.in_bulk([row.pk for row in rows])
+            created = [row for row in rows if row.pk not in post_codes]
+            updated = []
+            for row in rows:
+                post_code = post_codes.get(row.pk)
+                if post_code is None:
+                    continue
+                values = (row.postal_district, row.latitude, row.longitude)
+                if (post_code.postal_district, post_code.latitude, post_code.longitude) != values:
+                    post_code.postal_district, post_code.latitude, post_code.longitude = values
+                    post_code.updated_at = now
+                    updated.append(post_code)
+            PostCode.objects.bulk_create(created, batch_size=1000)
+            PostCode.objects.bulk_update(
+                updated, ["postal_district", "latitude", "longitude", "updated_at"], batch_size=1000
+            )
+            # The bulk queries send no signals
+            catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} and updated {len(updated)} post codes."))
+
+    @staticmethod
+    def read(path) -> list:
+        """
+        :return: list of unsaved post codes
+        """
+        rows = []
+        try:
+            with open(path, newline="", encoding="utf-8") as file:
+                for line, row in enumerate(csv.DictReader(file), start=2):
+                    try:
+                        post_code = PostCode(
+                            p_code=row["p_code"].strip(),
+                            postal_district=row["postal_district"].strip(),
+                            latitude=float(row["latitude"]),
+                            longitude=float(row["longitude"]),
+                        )
+                    except (KeyError, AttributeError, TypeError, ValueError):
+                        raise CommandError(
+                            f"{path}:{line}: expected p_code, postal_district and latitude and longitude as numbers."
+                        )
+                    if not (-90 <= post_code.latitude <= 90 and -180 <= post_code.longitude <= 180):
+                        raise CommandError(f"{path}:{line}: coordinates out of range.")
+                    rows.append(post_code)
+        except OSError as e:
+            raise CommandError(str(e))
+        return rows
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from cabins.models import Cabin
+from cabins.search import TABLE, TRIGGERS
+
+
+class Command(BaseCommand):
+    help = "Recreates missing full-text search triggers and reindexes the names and descriptions of all cabins."
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for trigger in TRIGGERS:
+                cursor.execute(trigger)
+            cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {Cabin.objects.count()} cabins."))
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0002_cabin_address"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RatePlan",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("weekend_multiplier", models.DecimalField(decimal_places=2, default=1, max_digits=4)),
+                ("min_nights", models.PositiveSmallIntegerField(default=1)),
+                ("version", models.PositiveIntegerField(default=1)),
+                (
+                    "area",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rate_plan",
+                        to="cabins.area",
+                    ),
+                ),
+                (
+                    "cabin",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rate_plan",
+                        to="cabins.cabin",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Season",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+                ("price_per_night", models.DecimalField(decimal_places=2, max_digits=8)),
+                ("min_nights", models.PositiveSmallIntegerField(blank=True, null=True)),
+                (
+                    "rate_plan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="seasons", to="cabins.rateplan"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["start_date"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="rateplan",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("cabin__isnull", True), ("area__isnull", True), _connector="XOR"),
+                name="rate_plan_cabin_or_area",
+            ),
+        ),
+    ]
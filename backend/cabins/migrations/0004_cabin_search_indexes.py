@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0003_rate_plans"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cabin",
+            index=models.Index(fields=["area", "num_of_beds"], name="cabin_area_beds_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="cabin",
+            index=models.Index(fields=["price_per_night"], name="cabin_price_idx"),
+        ),
+    ]
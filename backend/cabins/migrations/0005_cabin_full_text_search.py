@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+import cabins.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The triggers as of this migration, later ones recreating them keep their own copy of cabins.search.TRIGGERS
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS cabins_cabin_fts_insert AFTER INSERT ON cabins_cabin BEGIN
+        INSERT INTO cabins_cabin_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cabins_cabin_fts_delete AFTER DELETE ON cabins_cabin BEGIN
+        INSERT INTO cabins_cabin_fts(cabins_cabin_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cabins_cabin_fts_update AFTER UPDATE OF id, name, description ON cabins_cabin BEGIN
+        INSERT INTO cabins_cabin_fts(cabins_cabin_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO cabins_cabin_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0004_cabin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CabinText",
+            fields=[
+                (
+                    "cabin",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="text",
+                        serialize=False,
+                        to="cabins.cabin",
+                    ),
+                ),
+                ("name", models.TextField()),
+                ("description", models.TextField()),
+                ("document", cabins.search.DocumentField(db_column="cabins_cabin_fts")),
+            ],
+            options={
+                "db_table": "cabins_cabin_fts",
+                "managed": False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE cabins_cabin_fts USING fts5(name, description, "
+                "content='cabins_cabin', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+                *TRIGGERS,
+                "INSERT INTO cabins_cabin_fts(cabins_cabin_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS cabins_cabin_fts_insert",
+                "DROP TRIGGER IF EXISTS cabins_cabin_fts_delete",
+                "DROP TRIGGER IF EXISTS cabins_cabin_fts_update",
+                "DROP TABLE cabins_cabin_fts",
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+# The full-text search triggers as of this migration, see cabins.search
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS cabins_cabin_fts_insert AFTER INSERT ON cabins_cabin BEGIN
+        INSERT INTO cabins_cabin_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cabins_cabin_fts_delete AFTER DELETE ON cabins_cabin BEGIN
+        INSERT INTO cabins_cabin_fts(cabins_cabin_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cabins_cabin_fts_update AFTER UPDATE OF id, name, description ON cabins_cabin BEGIN
+        INSERT INTO cabins_cabin_fts(cabins_cabin_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO cabins_cabin_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0005_cabin_full_text_search"),
+    ]
+
+    operations = [
+        # Removing the column when unapplied remakes cabins_cabin as well
+        migrations.RunSQL(sql=migrations.RunSQL.noop, reverse_sql=TRIGGERS),
+        migrations.AddField(
+            model_name="area",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="cabin",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="postcode",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        # Adding the column remade cabins_cabin and dropped the full-text search triggers
+        migrations.RunSQL(sql=TRIGGERS, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0007_cabin_facets_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="postcode",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="postcode",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -1,13 +1,19 @@
 from django.db import models
 
+from cabins.search import DocumentField, TABLE
+
 
 class Area(models.Model):
     area = models.CharField(max_length=100, primary_key=True)
+    updated_at = models.DateTimeField(auto_now=True)  # When the area was last saved, see api.conditional
 
 
 class PostCode(models.Model):
     p_code = models.CharField(max_length=5, primary_key=True)
     postal_district = models.CharField(max_length=45)
+    latitude = models.FloatField(null=True, blank=True)  # Of the centroid, in degrees, see cabins.geo
+    longitude = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # When the post code was last saved, see api.conditional
 
 
 class Cabin(models.Model):
@@ -18,6 +24,102 @@ class Cabin(models.Model):
     zip_code = models.ForeignKey(PostCode, on_delete=models.CASCADE)
     num_of_beds = models.IntegerField()
     address = models.CharField(max_length=100, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # When the cabin was last saved, see api.conditional
+
+    class Meta:
+        indexes = [
+            # Searches of an area by number of beds, see cabins.views.get_cabins. zip_code is indexed as a foreign key.
+            # Holds the price too, so the facets of a search are counted from the index alone, see cabins.facets.
+            models.Index(fields=["area", "num_of_beds", "price_per_night"], name="cabin_area_beds_price_idx"),
+            models.Index(fields=["price_per_night"], name="cabin_price_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class CabinText(models.Model):
+    """
+    Row of a cabin in the full-text index, read-only. The table is created and kept in sync by the database,
+    see cabins.search.
+    """
+
+    cabin = models.OneToOneField(
+        Cabin, on_delete=models.DO_NOTHING, primary_key=True, db_column="rowid", related_name="text"
+    )
+    name = models.TextField()
+    description = models.TextField()
+    document = DocumentField(db_column=TABLE)
+
+    class Meta:
+        managed = False
+        db_table = TABLE
+
+
+class RatePlan(models.Model):
+    """
+    Dynamic pricing of a cabin, or of all the cabins of an area that have no plan of their own.
+    Nights outside the seasons cost the cabin's price_per_night. See reservations.pricing.
+    """
+
+    cabin = models.OneToOneField(Cabin, on_delete=models.CASCADE, null=True, blank=True, related_name="rate_plan")
+    area = models.OneToOneField(Area, on_delete=models.CASCADE, null=True, blank=True, related_name="rate_plan")
+    weekend_multiplier = models.DecimalField(
+        max_digits=4, decimal_places=2, default=1
+    )  # For Friday and Saturday nights
+    min_nights = models.PositiveSmallIntegerField(default=1)  # Shortest stay outside the seasons
+    version = models.PositiveIntegerField(default=1)  # Incremented on every change of the plan or its seasons
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(cabin__isnull=True) ^ models.Q(area__isnull=True), name="rate_plan_cabin_or_area"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cabin or self.area_id} v{self.version}"
+
+    def save(self, *args, **kwargs):
+        # Incremented in the database, so two concurrent edits of the plan never store the same version
+        changed = not self._state.adding
+        if changed:
+            self.version = models.F("version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        super().save(*args, **kwargs)
+        if changed:
+            self.refresh_from_db(fields=["version"])
+
+
+class Season(models.Model):
+    """
+    Nightly price of a rate plan for the nights start_date..end_date (exclusive).
+    """
+
+    rate_plan = models.ForeignKey(RatePlan, on_delete=models.CASCADE, related_name="seasons")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    price_per_night = models.DecimalField(max_digits=8, decimal_places=2)
+    min_nights = models.PositiveSmallIntegerField(null=True, blank=True)  # Shortest stay checking in in the season
+
+    class Meta:
+        ordering = ["start_date"]
+
+    def __str__(self):
+        return f"{self.rate_plan} {self.start_date} {self.end_date}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.touch_rate_plan()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.touch_rate_plan()
+        return result
+
+    def touch_rate_plan(self):
+        """
+        Increments the version of the rate plan, so prices memoized for the old seasons are not used anymore.
+        """
+        RatePlan.objects.filter(pk=self.rate_plan_id).update(version=models.F("version") + 1)
@@ -0,0 +1,90 @@
+"""
+Full-text search of the cabins.
+
+The name and description of every cabin are indexed in cabins_cabin_fts, an SQLite FTS5 table that reads its rows
+from cabins_cabin (external content) and is kept in sync by triggers on cabins_cabin, so bulk creates and queryset
+updates are indexed as well. Cabin.text joins a cabin to its row, see CabinText.
+
+The triggers are dropped along with cabins_cabin whenever a migration remakes the table, which SQLite needs for
+most changes of its columns. Such a migration has to create them again from a copy of TRIGGERS, and
+`rebuild_search_index` creates them if they are missing and reindexes all cabins.
+"""
+
+import re
+
+from django.db import models
+
+TABLE = "cabins_cabin_fts"
+
+# Weights of name and description in the rank, a word in the name counts as much as ten in the description
+WEIGHTS = (10.0, 1.0)
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON cabins_cabin BEGIN
+        INSERT INTO {TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON cabins_cabin BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_update AFTER UPDATE OF id, name, description ON cabins_cabin BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+
+class DocumentField(models.TextField):
+    """
+    The hidden column of an FTS5 table named like the table, which stands for the whole row in MATCH and bm25.
+    """
+
+
+@DocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class Rank(models.Func):
+    """
+    BM25 rank of a matched row, lower is better.
+    """
+
+    function = "bm25"
+    template = f"%(function)s(%(expressions)s, {', '.join(map(str, WEIGHTS))})"
+    output_field = models.FloatField()
+
+
+def parse_query(q) -> str:
+    """
+    Turns what a guest typed into an FTS5 query matching the cabins that have all of its words, the last one also
+    as the start of a longer word. Operators and quotes are ignored.
+    :return: FTS5 query, or an empty string if q has no words
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def search(cabins, q, rank=True):
+    """
+    Narrows a queryset of cabins down to those matching q and annotates them with their rank.
+    :param rank: False to leave out the rank, e.g. when the cabins are only counted
+    :return: queryset, or None if q has no words
+    """
+    query = parse_query(q)
+    if not query:
+        return None
+    cabins = cabins.filter(text__document__match=query)
+    return cabins.annotate(rank=Rank("text__document")) if rank else cabins
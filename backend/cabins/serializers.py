@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from api.catalog import CatalogRelatedField
 from .models import Cabin, PostCode, Area
 
 
@@ -8,6 +9,9 @@ class CabinSerializer(serializers.ModelSerializer):
     Serializer for the Cabin model.
     """
 
+    area = CatalogRelatedField("areas", queryset=Area.objects.all())
+    zip_code = CatalogRelatedField("post_codes", queryset=PostCode.objects.all())
+
     class Meta:
         model = Cabin
         fields = [
@@ -39,7 +43,7 @@ class PostCodeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PostCode
-        fields = ["p_code", "postal_district"]
+        fields = ["p_code", "postal_district", "latitude", "longitude"]
         read_only_fields = ["created_at", "updated_at"]
 
     def create(self, validated_data):
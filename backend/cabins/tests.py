@@ -1,6 +1,12 @@
+import io
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
+from .geo import GridIndex, distance
 from .models import Cabin, Area, PostCode
+from .search import TABLE, search
 
 
 class CabinModelTest(TestCase):
@@ -66,3 +72,69 @@ class CabinModelTest(TestCase):
     def test_str_method(self):
         cabin = Cabin.objects.get(id=1)
         self.assertEqual(str(cabin), "Test Cabin in the woods")
+
+    # Test that the full-text index follows every change of the cabins, and can be rebuilt
+    def test_search_index(self):
+        def found(q):
+            return sorted(search(Cabin.objects.all(), q).values_list("name", flat=True))
+
+        self.assertEqual(found("woods"), ["Test Cabin in the woods"])
+        cabin = Cabin.objects.get(id=1)
+        cabin.description = "Sauna by the lake"
+        cabin.save()
+        self.assertEqual(found("sauna"), ["Test Cabin in the woods"])
+        self.assertEqual(found("description"), [])
+
+        Cabin.objects.bulk_create(
+            [
+                Cabin(
+                    name="Lake house",
+                    description="",
+                    price_per_night=100,
+                    area=cabin.area,
+                    zip_code=cabin.zip_code,
+                    num_of_beds=2,
+                )
+            ]
+        )
+        Cabin.objects.filter(name="Lake house").update(description="Sauna")
+        self.assertEqual(found("sauna"), ["Lake house", "Test Cabin in the woods"])
+        cabin.delete()
+        self.assertEqual(found("sauna"), ["Lake house"])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {TABLE}_insert")
+            cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('delete-all')")
+        Cabin.objects.create(
+            name="Hut",
+            description="Sauna",
+            price_per_night=100,
+            area=cabin.area,
+            zip_code=cabin.zip_code,
+            num_of_beds=2,
+        )
+        self.assertEqual(found("sauna"), [])
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        self.assertEqual(found("sauna"), ["Hut", "Lake house"])
+        Cabin.objects.create(
+            name="Shed",
+            description="Sauna",
+            price_per_night=100,
+            area=cabin.area,
+            zip_code=cabin.zip_code,
+            num_of_beds=2,
+        )
+        self.assertEqual(found("sauna"), ["Hut", "Lake house", "Shed"])
+
+    def test_grid_index(self):
+        # Points 0.1 degrees apart across Finland, the grid finds the same as computing every distance
+        points = [(i, 60 + i // 100 * 0.1, 20 + i % 100 * 0.1) for i in range(10_000)]
+        grid = GridIndex(points)
+        for lat, lon, radius in [(62.89, 27.68, 30), (60.17, 24.94, 5), (69.9, 20.1, 80), (65, 25, 2000)]:
+            expected = sorted(
+                (distance(lat, lon, point_lat, point_lon), key)
+                for key, point_lat, point_lon in points
+                if distance(lat, lon, point_lat, point_lon) <= radius
+            )
+            self.assertEqual(grid.within(lat, lon, radius), expected)
+        self.assertEqual(grid.within(0, 0, 100), [])
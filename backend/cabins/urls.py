@@ -1,7 +1,7 @@
 from django.urls import path, include
 
 from .views import create_area, get_areas, update_area, delete_area
-from .views import create_cabin, get_cabins, update_cabin, delete_cabin
+from .views import create_cabin, get_cabins, get_cabin_facets, update_cabin, delete_cabin
 
 urlpatterns = [
     path("create", create_area),
@@ -12,5 +12,6 @@ urlpatterns = [
     path("cabins/update", update_cabin),
     path("cabins/delete", delete_cabin),
     path("cabins", get_cabins),
+    path("cabins/facets", get_cabin_facets),
     path("services/", include("services.urls")),
 ]
@@ -1,3 +1,8 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Case, Exists, FloatField, OuterRef, Q, Value, When
 from django.http import Http404
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -5,8 +10,20 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from api import catalog
+from api.conditional import Version
 from cabins.models import Cabin, Area
+from cabins.facets import count_facets
+from cabins.search import search
 from cabins.serializers import CabinSerializer, AreaSerializer
+from reservations.models import Reservation
+
+# Radius of searches near a post code in km by default and at most
+DEFAULT_RADIUS_KM = 30
+MAX_RADIUS_KM = 500
+
+# Orders cabin searches can be sorted by, the first is the default. Full-text searches are sorted by rank by default.
+ORDERINGS = ["id", "name", "price_per_night", "-price_per_night", "num_of_beds", "-num_of_beds"]
 
 
 @api_view(["POST"])
@@ -28,33 +45,81 @@ def create_cabin(request):
 @api_view(["GET"])
 def get_cabins(request):
     """
-    Returns a list of cabins filtered by area, post code and id.
-    :param request: GET request with optional area, post code and id
-    :return: JSON response with list of cabins or error message
+    Returns a list of cabins filtered by area, post code, id, number of beds and price, in the requested order.
+    When check_in and check_out are given, only cabins that are free for the whole stay are returned.
+    When q is given, only cabins whose name or description has all of its words are returned, best matches first
+    unless another order is requested.
+    When near is given, only cabins within radius km of that post code are returned with their distance, nearest
+    first unless another order is requested. The post codes in range are found in memory, see cabins.geo.
+    All filters and the order are applied in the database. Without q, near, check_in and check_out, whose results
+    change along with other rows, the response has an ETag and is 304 if the client has the current list.
+    :param request: GET request with optional area, post code, id, q, near and radius (km, default
+        DEFAULT_RADIUS_KM), num_of_beds (at least), min_price and max_price (per night), ordering (one of ORDERINGS,
+        or rank with q, distance with near), check_in and check_out
+    :return: JSON response with list of cabins, 304 or error message
     """
     try:
         area = request.GET.get("area")
         post_code = request.GET.get("zip_code")
         cabin_id = request.GET.get("id")
-        beds = request.GET.get("num_of_beds")
+        q = request.GET.get("q")
+        near = request.GET.get("near")
+        check_in = request.GET.get("check_in")
+        check_out = request.GET.get("check_out")
 
         # Get all cabins
         cabins = Cabin.objects.all()
 
         # Filter by cabin id
         if cabin_id:
+            version = Version.of(cabins.filter(pk=cabin_id))
+            not_modified = version.not_modified(request)
+            if not_modified:
+                return not_modified
             cabin = get_object_or_404(Cabin, pk=cabin_id)
             serializer = CabinSerializer(cabin)
-            return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+            return version.tag(Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK))
 
         # Filter by other parameters
         if area:
             cabins = cabins.filter(area=area)
         if post_code:
             cabins = cabins.filter(zip_code=post_code)
-        if beds:
-            # loop through all cabins and check if the number of beds is greater than or equal to the number of beds
-            cabins = [cabin for cabin in cabins if cabin.num_of_beds >= int(beds)]
+        cabins = cabins.filter(**parse_search(request.GET))
+        if check_in or check_out:
+            check_in, check_out = parse_stay(check_in, check_out)
+            # Drop booked cabins in the same query instead of checking every cabin separately
+            booked = Reservation.objects.overlapping(OuterRef("pk"), check_in, check_out)
+            cabins = cabins.filter(~Exists(booked))
+        if q is not None:
+            cabins = search(cabins, q)
+            if cabins is None:
+                raise ValidationError("q must contain at least one word.")
+            orderings = ["rank", *ORDERINGS]
+        else:
+            orderings = ORDERINGS
+        distances = {}
+        if near:
+            distances = parse_near(near, request.GET.get("radius"))
+            cabins = cabins.filter(zip_code__in=distances).annotate(
+                distance=Case(
+                    *(When(zip_code=p_code, then=Value(km)) for p_code, km in distances.items()),
+                    output_field=FloatField(),
+                )
+            )
+            orderings = ["distance", *orderings]
+
+        ordering = request.GET.get("ordering", orderings[0])
+        if ordering not in orderings:
+            raise ValidationError(f"ordering must be one of: {', '.join(orderings)}.")
+
+        version = None
+        if not (q is not None or near or check_in or check_out):
+            version = Version.of(cabins)
+            not_modified = version.not_modified(request)
+            if not_modified:
+                return not_modified
+        cabins = list(cabins.order_by(ordering, "pk"))
 
         # If no cabin is found, return a 404 response
         if not cabins:
@@ -62,7 +127,12 @@ def get_cabins(request):
 
         # Serialize and return the data
         serializer = CabinSerializer(cabins, many=True)
-        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        data = serializer.data
+        if near:
+            for cabin in data:
+                cabin["distance"] = round(distances[cabin["zip_code"]], 1)
+        response = Response({"result": "success", "data": data}, status=status.HTTP_200_OK)
+        return version.tag(response) if version else response
 
     except Http404:
         return Response({"result": "error", "message": "No cabins found"}, status=status.HTTP_404_NOT_FOUND)
@@ -72,6 +142,106 @@ def get_cabins(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["GET"])
+def get_cabin_facets(request):
+    """
+    Returns the number of cabins a search finds, in total and by area, number of beds and nightly price.
+    The counts of each facet leave out the search's filter of that facet, see cabins.facets.
+    :param request: GET request with the optional filters of get_cabins except id and ordering
+    :return: JSON response with the counts or error message
+    """
+    try:
+        area = request.GET.get("area") or None
+        post_code = request.GET.get("zip_code")
+        q = request.GET.get("q")
+        near = request.GET.get("near")
+        check_in = request.GET.get("check_in")
+        check_out = request.GET.get("check_out")
+
+        cabins = Cabin.objects.all()
+        if post_code:
+            cabins = cabins.filter(zip_code=post_code)
+        if near:
+            cabins = cabins.filter(zip_code__in=parse_near(near, request.GET.get("radius")))
+        if check_in or check_out:
+            check_in, check_out = parse_stay(check_in, check_out)
+            booked = Reservation.objects.overlapping(OuterRef("pk"), check_in, check_out)
+            cabins = cabins.filter(~Exists(booked))
+        if q is not None:
+            cabins = search(cabins, q, rank=False)
+            if cabins is None:
+                raise ValidationError("q must contain at least one word.")
+
+        lookups = parse_search(request.GET)
+        beds = Q(**{lookup: value for lookup, value in lookups.items() if lookup.startswith("num_of_beds")})
+        price = Q(**{lookup: value for lookup, value in lookups.items() if lookup.startswith("price_per_night")})
+        facets = count_facets(cabins, area=area, beds=beds, price=price)
+        return Response({"result": "success", "data": facets}, status=status.HTTP_200_OK)
+
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def parse_search(params) -> dict:
+    """
+    Parses the number of beds and price range of a cabin search.
+    :return: dict of field lookups to filter the cabins with
+    """
+    lookups = {}
+    try:
+        if params.get("num_of_beds"):
+            lookups["num_of_beds__gte"] = int(params["num_of_beds"])
+        if params.get("min_price"):
+            lookups["price_per_night__gte"] = Decimal(params["min_price"])
+        if params.get("max_price"):
+            lookups["price_per_night__lte"] = Decimal(params["max_price"])
+    except (ValueError, InvalidOperation):
+        raise ValidationError("num_of_beds must be a whole number and min_price and max_price numbers.")
+    return lookups
+
+
+def parse_near(near, radius) -> dict:
+    """
+    Finds the post codes within a radius of a post code.
+    :param near: post code with coordinates
+    :param radius: radius in km, DEFAULT_RADIUS_KM if None
+    :return: dict of the post codes in range and their distance in km
+    """
+    try:
+        radius = float(radius) if radius is not None else DEFAULT_RADIUS_KM
+    except ValueError:
+        raise ValidationError("radius must be a number.")
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise ValidationError(f"radius must be more than 0 and at most {MAX_RADIUS_KM} km.")
+    post_codes = catalog.get()
+    post_code = post_codes.post_codes.get(near)
+    if post_code is None or post_code.latitude is None or post_code.longitude is None:
+        raise ValidationError("near must be a post code with coordinates.")
+    found = post_codes.post_code_grid.within(post_code.latitude, post_code.longitude, radius)
+    return {p_code: km for km, p_code in found}
+
+
+def parse_stay(check_in, check_out) -> tuple:
+    """
+    Parses check-in and check-out dates given in ISO format.
+    :return: tuple of check-in and check-out date
+    """
+    if not check_in or not check_out:
+        raise ValidationError("Both check_in and check_out are required.")
+    try:
+        check_in = date.fromisoformat(check_in)
+        check_out = date.fromisoformat(check_out)
+    except ValueError:
+        raise ValidationError("Dates must be in YYYY-MM-DD format.")
+    if check_in >= check_out:
+        raise ValidationError("check_out must be after check_in.")
+    if (check_out - check_in).days > settings.RESERVATION_MAX_NIGHTS:
+        raise ValidationError(f"Stay cannot be longer than {settings.RESERVATION_MAX_NIGHTS} nights.")
+    return check_in, check_out
+
+
 @api_view(["PATCH"])
 def update_cabin(request):
     """
@@ -131,29 +301,35 @@ def create_area(request):
 @api_view(["GET"])
 def get_areas(request):
     """
-    Returns a list of areas optionally filtered by area name
+    Returns a list of areas optionally filtered by area name, 304 if the client has the current list (ETag).
+    The areas are read from api.catalog.
     :param request: GET request with optional area name
-    :return: JSON response with list of areas or error message
+    :return: JSON response with list of areas, 304 or error message
     """
     try:
         area_name = request.query_params.get("area")
 
         # Get all areas
-        areas = Area.objects.all()
+        areas = list(catalog.get().areas.values())
 
         # Filter by area id
         if area_name:
-            area = get_object_or_404(Area, pk=area_name)
-            serializer = AreaSerializer(area)
-            return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+            areas = [area for area in areas if area.pk == area_name]
+        version = Version.of_rows(areas)
+        not_modified = version.not_modified(request)
+        if not_modified:
+            return not_modified
 
         # If no area is found, return a 404 response
         if not areas:
             raise Http404
 
         # Serialize and return the data
-        serializer = AreaSerializer(areas, many=True)
-        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        if area_name:
+            serializer = AreaSerializer(areas[0])
+        else:
+            serializer = AreaSerializer(areas, many=True)
+        return version.tag(Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK))
 
     except Http404:
         return Response({"result": "error", "message": "No areas found"}, status=status.HTTP_404_NOT_FOUND)
@@ -2,6 +2,7 @@
 ASGI config for conf project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed with conf.asgi_urls, which serves login with an async view.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +10,27 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
 
-application = get_asgi_application()
+
+class Handler(ASGIHandler):
+    """
+    ASGI handler that routes requests with its own URL configuration.
+    """
+
+    def __init__(self, urlconf="conf.asgi_urls"):
+        super().__init__()
+        self.urlconf = urlconf
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = Handler()
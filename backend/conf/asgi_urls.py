@@ -0,0 +1,15 @@
+"""
+URL configuration of the ASGI application, see conf.asgi.
+
+Routes login to its async view and everything else as conf.urls does.
+"""
+
+from django.urls import path
+
+from conf.urls import urlpatterns as sync_urlpatterns
+from users import async_views
+
+urlpatterns = [
+    path("api/user/login", async_views.login),
+    *sync_urlpatterns,
+]
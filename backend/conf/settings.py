@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "cabins",
     "reservations",
     "services",
+    "jobs",
 ]
 
 MIDDLEWARE = [
@@ -86,6 +87,12 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # SQLite ignores row locks, so take the write lock when a transaction starts to serialize bookings,
+            # and wait for it instead of failing right away
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
@@ -123,6 +130,65 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "serene-stays",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    }
+}
+
+# REST framework
+# Every request is authenticated by its JWT, views that need a user say so with the classes in users.permissions
+
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": ["users.authentication.TokenAuthentication"],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+    "EXCEPTION_HANDLER": "api.exceptions.exception_handler",
+}
+
+# Tokens, see users.tokens. Lifetimes are in seconds, access tokens keep their claims until they expire.
+ACCESS_TOKEN_LIFETIME = 15 * 60
+REFRESH_TOKEN_LIFETIME = 7 * 24 * 60 * 60
+# Verified access tokens cached per process
+AUTH_TOKEN_CACHE_SIZE = 10_000
+# Filter of revoked tokens, see users.revocation. Other processes' revocations are read every refresh interval.
+REVOCATION_FILTER_CAPACITY = 100_000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+REVOCATION_REFRESH_INTERVAL = 5
+
+# Login under ASGI, see users.async_views. Threads hashing passwords and logins served at a time.
+LOGIN_HASH_WORKERS = 2
+LOGIN_MAX_CONCURRENCY = 64
+
+# Seconds after which a process checks whether another one changed the areas, post codes or services, see api.catalog
+CATALOG_REFRESH_INTERVAL = 5
+
+# Seconds a rendered invoice is kept in the cache
+INVOICE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Directory the invoice PDFs are stored in and number of processes generating them
+INVOICE_PDF_DIR = BASE_DIR / "invoices"
+INVOICE_PDF_WORKERS = 2
+
+# Email
+# Confirmations are sent to a local SMTP server, e.g. `python -m aiosmtpd -n -l localhost:1025` in development
+
+EMAIL_HOST = "localhost"
+EMAIL_PORT = 1025
+DEFAULT_FROM_EMAIL = "bookings@serene-stays.local"
+
+# Job queue, see jobs.queue
+
+JOB_WORKERS = 4  # Worker threads of the run_jobs command
+JOB_POLL_INTERVAL = 1  # Seconds an idle worker waits before looking for due jobs again
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10  # Seconds before the first retry, doubled for every further attempt
+JOB_TIMEOUT = 300  # Seconds after which a running job is considered abandoned and run again
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -132,3 +198,24 @@ AUTH_USER_MODEL = "users.User"
 
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
+
+# Reservations
+
+# Longest stay that can be booked. Overlap checks rely on it to only scan a bounded window of a cabin's bookings.
+RESERVATION_MAX_NIGHTS = 90
+
+# Largest number of reservations that can be booked with one batch request
+RESERVATION_BATCH_MAX_SIZE = 500
+
+# Number of stay prices memoized per process, see reservations.pricing
+PRICE_CACHE_SIZE = 100_000
+
+# Largest number of stays that can be priced with one quote request
+QUOTE_MAX_SIZE = 1000
+
+# Default and largest number of rows on a page of the reservation and invoice listings
+PAGINATION_PAGE_SIZE = 100
+PAGINATION_MAX_PAGE_SIZE = 1000
+
+# Number of rows read from the database at a time by the streaming exports
+EXPORT_CHUNK_SIZE = 2000
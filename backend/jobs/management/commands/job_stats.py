@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Q
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = "Shows the number of jobs by status and their latencies by job name."
+
+    def handle(self, *args, **options):
+        rows = (
+            Job.objects.values("name")
+            .annotate(
+                pending=Count("pk", filter=Q(status=Job.PENDING)),
+                running=Count("pk", filter=Q(status=Job.RUNNING)),
+                done=Count("pk", filter=Q(status=Job.DONE)),
+                failed=Count("pk", filter=Q(status=Job.FAILED)),
+                avg_wait_ms=Avg("wait_ms"),
+                max_wait_ms=Max("wait_ms"),
+                avg_run_ms=Avg("run_ms"),
+                max_run_ms=Max("run_ms"),
+            )
+            .order_by("name")
+        )
+        self.stdout.write(
+            f"{'job':<24}{'pending':>9}{'running':>9}{'done':>9}{'failed':>9}"
+            f"{'avg wait ms':>14}{'max wait ms':>14}{'avg run ms':>13}{'max run ms':>13}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<24}{row['pending']:>9}{row['running']:>9}{row['done']:>9}{row['failed']:>9}"
+                f"{row['avg_wait_ms'] or 0:>14.1f}{row['max_wait_ms'] or 0:>14.1f}"
+                f"{row['avg_run_ms'] or 0:>13.1f}{row['max_run_ms'] or 0:>13.1f}"
+            )
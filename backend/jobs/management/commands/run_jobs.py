@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from jobs.queue import claim, run
+
+
+class Command(BaseCommand):
+    help = "Runs the jobs of the job queue with a pool of workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due instead of waiting for more")
+
+    @staticmethod
+    def work(once) -> int:
+        count = 0
+        while True:
+            job = claim()
+            if job:
+                run(job)
+                count += 1
+            elif once:
+                return count
+            else:
+                time.sleep(settings.JOB_POLL_INTERVAL)
+
+    def work_in_thread(self, once) -> int:
+        try:
+            return self.work(once)
+        finally:
+            # Every worker thread has a database connection of its own
+            connection.close()
+
+    def handle(self, *args, **options):
+        if options["workers"] == 1:
+            count = self.work(options["once"])
+        else:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                count = sum(executor.map(self.work_in_thread, [options["once"]] * options["workers"]))
+        self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
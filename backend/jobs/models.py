@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Model for a unit of background work, run by the run_jobs command. See jobs.queue.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=100)  # Name the handler was registered with
+    payload = models.JSONField(default=dict)  # Keyword arguments of the handler
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)  # When the job is due, pushed back after a failed attempt
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # When the last attempt started
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wait_ms = models.FloatField(null=True, blank=True)  # Time from creation to the start of the last attempt
+    run_ms = models.FloatField(null=True, blank=True)  # Time the last attempt took
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"], name="job_due_idx")]
+
+    def __str__(self):
+        return f"{self.name} {self.status}"
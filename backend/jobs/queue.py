@@ -0,0 +1,120 @@
+"""
+Durable job queue stored in the database.
+
+Work that does not have to be done before a request is answered is enqueued as a Job row, in the same transaction
+as the change it follows from, and run by the workers of the run_jobs command. A failing job is retried with
+exponential backoff until it has been attempted JOB_MAX_ATTEMPTS times. Every attempt records how long the job
+waited in the queue and how long it ran.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}  # Job name -> function run with the payload as keyword arguments
+
+
+def job(name):
+    """
+    Registers the decorated function as the handler of the jobs with the given name.
+    Handlers are found in the jobs modules of the installed apps and must be safe to run more than once.
+    """
+
+    def register(handler):
+        HANDLERS[name] = handler
+        return handler
+
+    return register
+
+
+def enqueue(name, **payload) -> Job:
+    """
+    Adds a job to the queue. Inside a transaction the job only becomes visible to the workers once it commits.
+    """
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown job {name}.")
+    return Job.objects.create(name=name, payload=payload)
+
+
+def enqueue_many(name, payloads) -> list:
+    """
+    Adds a job with every one of the payloads to the queue with one insert.
+    """
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown job {name}.")
+    return Job.objects.bulk_create([Job(name=name, payload=payload) for payload in payloads], batch_size=500)
+
+
+def claim():
+    """
+    Claims the next due job, or a running job whose worker has not finished it within JOB_TIMEOUT.
+    Jobs are claimed with a conditional update, so two workers never get the same job.
+    :return: the claimed job, or None if no job is due
+    """
+    now = timezone.now()
+    due = Job.objects.filter(
+        Q(status=Job.PENDING, run_at__lte=now)
+        | Q(status=Job.RUNNING, started_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT))
+    ).order_by("run_at")
+    for pk, status, started_at in due.values_list("pk", "status", "started_at")[:10]:
+        claimed = Job.objects.filter(pk=pk, status=status, started_at=started_at).update(
+            status=Job.RUNNING, started_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """
+    Runs a claimed job in a transaction and records the outcome of the attempt.
+    """
+    started = time.perf_counter()
+    try:
+        with transaction.atomic():
+            HANDLERS[job.name](**job.payload)
+        job.status = Job.DONE
+        job.last_error = ""
+    except Exception as e:
+        job.last_error = f"{type(e).__name__}: {e}"
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+    job.finished_at = timezone.now()
+    job.wait_ms = (job.started_at - job.created_at).total_seconds() * 1000
+    job.run_ms = (time.perf_counter() - started) * 1000
+    job.save()
+    logger.info(
+        "Job %s %s #%s %s after %s attempts, waited %.1f ms, ran %.1f ms",
+        job.pk,
+        job.name,
+        job.payload,
+        job.status,
+        job.attempts,
+        job.wait_ms,
+        job.run_ms,
+    )
+    return job
+
+
+def run_due() -> int:
+    """
+    Runs jobs until none is due.
+    :return: number of attempts made
+    """
+    count = 0
+    while job := claim():
+        run(job)
+        count += 1
+    return count
@@ -0,0 +1,104 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from cabins.models import Area, Cabin, PostCode
+from reservations import pdf
+from reservations.models import Invoice, Reservation
+from users.models import User
+from .models import Job
+from .queue import HANDLERS, claim, enqueue, job, run, run_due
+
+calls = []
+
+
+@job("test_flaky")
+def flaky(fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError("Temporary failure")
+
+
+class TestJobQueue(TestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_job_runs_once(self):
+        queued = enqueue("test_flaky", fail_times=0)
+        self.assertEqual(run_due(), 1)
+        self.assertEqual(run_due(), 0)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.DONE)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIsNotNone(queued.wait_ms)
+        self.assertIsNotNone(queued.run_ms)
+        self.assertEqual(calls, [0])
+
+    @override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_DELAY=10)
+    def test_retry_with_backoff(self):
+        queued = enqueue("test_flaky", fail_times=5)
+        delays = []
+        for attempt in range(3):
+            claimed = claim()
+            self.assertEqual(claimed.pk, queued.pk)
+            run(claimed)
+            claimed.refresh_from_db()
+            delays.append(round((claimed.run_at - claimed.finished_at).total_seconds()))
+            # Make the retry due right away
+            Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.FAILED)
+        self.assertEqual(queued.attempts, 3)
+        self.assertIn("Temporary failure", queued.last_error)
+        self.assertEqual(delays[:2], [10, 20])
+        self.assertIsNone(claim())
+
+    def test_abandoned_job_is_claimed_again(self):
+        queued = enqueue("test_flaky", fail_times=0)
+        self.assertEqual(claim().pk, queued.pk)
+        self.assertIsNone(claim())
+
+        Job.objects.filter(pk=queued.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim().pk, queued.pk)
+
+    def test_unknown_job(self):
+        self.assertNotIn("test_missing", HANDLERS)
+        with self.assertRaises(ValueError):
+            enqueue("test_missing")
+
+    def test_booking_jobs(self):
+        area = Area.objects.create(area="Helsinki")
+        post_code = PostCode.objects.create(p_code="00100", postal_district="Helsinki")
+        cabin = Cabin.objects.create(
+            name="Cabin 1", description="", price_per_night=100, area=area, zip_code=post_code, num_of_beds=4
+        )
+        customer = User.objects.create_user(username="customer", password="customer", email="customer@email.com")
+        reservation = Reservation.objects.create(
+            cabin=cabin, customer=customer, owner=customer, start_date="2024-07-01", end_date="2024-07-03"
+        )
+        enqueue("create_invoice", reservation_id=reservation.pk)
+        enqueue("send_confirmation", reservation_id=reservation.pk)
+
+        with tempfile.TemporaryDirectory() as pdf_dir, self.settings(INVOICE_PDF_DIR=pdf_dir):
+            call_command("run_jobs", "--once", "--workers", "1", stdout=StringIO())
+
+            # The PDF the web processes serve is on disk
+            invoice = Invoice.objects.select_related("reservation").get(reservation=reservation)
+            self.assertTrue(pdf.pdf_path(invoice.pk, Invoice.render_invoices([invoice])[invoice.pk]).exists())
+
+        self.assertEqual(Invoice.objects.filter(reservation=reservation).count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["customer@email.com"])
+        self.assertEqual(set(Job.objects.values_list("status", flat=True)), {Job.DONE})
+        self.assertEqual(Job.objects.count(), 3)
+
+        output = StringIO()
+        call_command("job_stats", stdout=output)
+        self.assertIn("send_confirmation", output.getvalue())
@@ -0,0 +1,200 @@
+"""
+Availability calendar of the cabins.
+
+Every cabin has one bitset per year where bit n tells whether night n of the year (0 = night after
+January 1st) is booked. The bitsets are kept up to date whenever a reservation changes, so availability
+over many cabins and date ranges is answered with bitwise operations in memory instead of date-range SQL.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .models import CabinCalendar, Reservation, to_date
+
+YEAR_BYTES = 46  # 366 nights fit in 46 bytes
+
+
+def year_spans(start_date, end_date):
+    """
+    Splits the nights of a stay by year.
+    :return: iterator of (year, first night bit, stop bit) tuples
+    """
+    while start_date < end_date:
+        next_year = date(start_date.year + 1, 1, 1)
+        stop_date = min(end_date, next_year)
+        first_bit = start_date.timetuple().tm_yday - 1
+        yield start_date.year, first_bit, first_bit + (stop_date - start_date).days
+        start_date = stop_date
+
+
+def nights_mask(first_bit, stop_bit) -> int:
+    """
+    Returns a bitset with the nights first_bit..stop_bit set.
+    """
+    return ((1 << (stop_bit - first_bit)) - 1) << first_bit
+
+
+def to_bytes(bits) -> bytes:
+    return bits.to_bytes(YEAR_BYTES, "little")
+
+
+def from_bytes(nights) -> int:
+    return int.from_bytes(nights, "little")
+
+
+def build_calendars(reservations) -> dict:
+    """
+    Builds the bitsets of the given reservations from scratch.
+    :param reservations: queryset of reservations, canceled ones are skipped
+    :return: dict of (cabin id, year) -> bitset
+    """
+    calendars = defaultdict(int)
+    stays = reservations.active().values_list("cabin_id", "start_date", "end_date")
+    for cabin_id, start_date, end_date in stays.iterator(chunk_size=10_000):
+        for year, first_bit, stop_bit in year_spans(start_date, end_date):
+            calendars[cabin_id, year] |= nights_mask(first_bit, stop_bit)
+    return calendars
+
+
+def refresh(cabin_id, start_date, end_date):
+    """
+    Brings the calendar of a cabin up to date for the given period after its reservations changed.
+
+    The period is first cleared and then marked again from the active reservations that overlap it,
+    so a change of one reservation never frees nights that another reservation still holds.
+    """
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    if start_date >= end_date:
+        return
+
+    with transaction.atomic():
+        spans = list(year_spans(start_date, end_date))
+        rows = {
+            row.year: row
+            for row in CabinCalendar.objects.select_for_update().filter(
+                cabin_id=cabin_id, year__in=[year for year, _, _ in spans]
+            )
+        }
+        bits = {year: from_bytes(rows[year].nights) if year in rows else 0 for year, _, _ in spans}
+        for year, first_bit, stop_bit in spans:
+            bits[year] &= ~nights_mask(first_bit, stop_bit)
+
+        for other_start, other_end in Reservation.objects.overlapping(cabin_id, start_date, end_date).values_list(
+            "start_date", "end_date"
+        ):
+            for year, first_bit, stop_bit in year_spans(max(other_start, start_date), min(other_end, end_date)):
+                bits[year] |= nights_mask(first_bit, stop_bit)
+
+        for year, nights in bits.items():
+            if year in rows:
+                rows[year].nights = to_bytes(nights)
+                rows[year].save(update_fields=["nights"])
+            elif nights:
+                CabinCalendar.objects.create(cabin_id=cabin_id, year=year, nights=to_bytes(nights))
+
+
+def add_stays(stays):
+    """
+    Marks the nights of newly booked stays, e.g. of reservations created with bulk_create which sends no signals.
+    :param stays: iterable of (cabin id, check-in date, check-out date) tuples
+    """
+    added = defaultdict(int)
+    for cabin_id, start_date, end_date in stays:
+        for year, first_bit, stop_bit in year_spans(to_date(start_date), to_date(end_date)):
+            added[cabin_id, year] |= nights_mask(first_bit, stop_bit)
+    if not added:
+        return
+
+    with transaction.atomic():
+        rows = CabinCalendar.objects.select_for_update().filter(
+            cabin_id__in={cabin_id for cabin_id, _ in added}, year__in={year for _, year in added}
+        )
+        updated = []
+        for row in rows:
+            if (row.cabin_id, row.year) in added:
+                row.nights = to_bytes(from_bytes(row.nights) | added.pop((row.cabin_id, row.year)))
+                updated.append(row)
+        CabinCalendar.objects.bulk_update(updated, ["nights"], batch_size=1000)
+        CabinCalendar.objects.bulk_create(
+            [
+                CabinCalendar(cabin_id=cabin_id, year=year, nights=to_bytes(nights))
+                for (cabin_id, year), nights in added.items()
+            ],
+            batch_size=1000,
+        )
+
+
+class AvailabilityCalendar:
+    """
+    In-memory view of the calendars of some cabins over a period, loaded with one query.
+    """
+
+    def __init__(self, cabin_ids, start_date, end_date):
+        self.start_date = to_date(start_date)
+        self.end_date = to_date(end_date)
+        self.nights = (self.end_date - self.start_date).days
+        self.cabin_ids = list(cabin_ids)
+
+        spans = list(year_spans(self.start_date, self.end_date))
+        rows = CabinCalendar.objects.filter(
+            cabin_id__in=self.cabin_ids, year__in=[year for year, _, _ in spans]
+        ).values_list("cabin_id", "year", "nights")
+        years = {(cabin_id, year): from_bytes(nights) for cabin_id, year, nights in rows}
+
+        # Shift every cabin's years into one bitset where bit 0 is the first night of the period
+        self.booked = {}
+        for cabin_id in self.cabin_ids:
+            booked, offset = 0, 0
+            for year, first_bit, stop_bit in spans:
+                year_bits = years.get((cabin_id, year), 0)
+                booked |= ((year_bits & nights_mask(first_bit, stop_bit)) >> first_bit) << offset
+                offset += stop_bit - first_bit
+            self.booked[cabin_id] = booked
+
+    def _bits(self, start_date, end_date) -> tuple:
+        first_bit = (to_date(start_date) - self.start_date).days
+        stop_bit = (to_date(end_date) - self.start_date).days
+        if first_bit < 0 or stop_bit > self.nights or first_bit >= stop_bit:
+            raise ValueError("Dates must be inside the loaded period.")
+        return first_bit, stop_bit
+
+    def is_free(self, cabin_id, start_date, end_date) -> bool:
+        """
+        Checks if the cabin is free for every night of the stay.
+        """
+        return not self.booked[cabin_id] & nights_mask(*self._bits(start_date, end_date))
+
+    def free_cabins(self, start_date, end_date) -> list:
+        """
+        Returns the ids of the cabins that are free for the whole stay.
+        """
+        mask = nights_mask(*self._bits(start_date, end_date))
+        return [cabin_id for cabin_id in self.cabin_ids if not self.booked[cabin_id] & mask]
+
+    def common_free_nights(self) -> list:
+        """
+        Returns the nights of the period when every loaded cabin is free.
+        """
+        booked = 0
+        for bits in self.booked.values():
+            booked |= bits
+        free = ~booked & nights_mask(0, self.nights)
+        return [self.start_date + timedelta(days=n) for n in range(self.nights) if free >> n & 1]
+
+    def check_in_dates(self, cabin_id, nights) -> list:
+        """
+        Returns the dates a stay of the given number of consecutive free nights can start on within the period.
+        """
+        if nights < 1 or nights > self.nights:
+            return []
+        # Bit n of runs stays set while nights n..n+length-1 are all free, doubling the length each round
+        runs = ~self.booked[cabin_id] & nights_mask(0, self.nights)
+        length = 1
+        while length * 2 <= nights:
+            runs &= runs >> length
+            length *= 2
+        if length < nights:
+            runs &= runs >> (nights - length)
+        return [self.start_date + timedelta(days=n) for n in range(self.nights - nights + 1) if runs >> n & 1]
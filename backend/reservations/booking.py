@@ -0,0 +1,192 @@
+"""
+Booking path of reservations.
+
+The overlap check and the insert of a reservation run in one transaction that holds a row lock on the
+cabin, so two requests can never both pass the check for the same nights. Only bookings of the same
+cabin wait for each other, bookings of different cabins proceed in parallel.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as ModelValidationError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from cabins.models import Cabin
+from jobs.queue import enqueue, enqueue_many
+from services.models import Service
+from users.models import User
+from . import availability, pricing, revenue
+from .models import Invoice, Reservation
+
+
+def lock_cabins(*cabin_ids):
+    """
+    Locks the cabins until the end of the transaction. Locks are taken in id order to avoid deadlocks.
+    """
+    list(Cabin.objects.select_for_update().filter(pk__in=set(cabin_ids)).order_by("pk").values_list("pk"))
+
+
+def save_reservation(serializer) -> Reservation:
+    """
+    Saves a new or updated reservation from a validated ReservationSerializer once no other booking overlaps it.
+    Must be called inside a transaction.
+    :raises ValidationError: if the stay is invalid or overlaps an existing booking
+    """
+    instance = serializer.instance
+    data = serializer.validated_data
+    reservation = Reservation(
+        pk=instance.pk if instance else None,
+        cabin=data.get("cabin", instance.cabin if instance else None),
+        start_date=data.get("start_date", instance.start_date if instance else None),
+        end_date=data.get("end_date", instance.end_date if instance else None),
+        canceled_at=data.get("canceled_at", instance.canceled_at if instance else None),
+    )
+    if reservation.stay is None or (instance and reservation.stay == instance.stay):
+        # Canceling a reservation or changing anything but its stay cannot cause an overlap
+        return serializer.save()
+
+    lock_cabins(reservation.cabin_id, *([instance.cabin_id] if instance else []))
+    try:
+        reservation.clean()
+    except ModelValidationError as e:
+        raise ValidationError(e.messages)
+    return serializer.save()
+
+
+def book(serializer) -> Reservation:
+    """
+    Books a reservation from a validated ReservationSerializer. Its invoice and confirmation are left to
+    the job queue, the jobs commit together with the reservation. See reservations.jobs.
+    :raises ValidationError: if the stay is invalid or overlaps an existing booking
+    """
+    with transaction.atomic():
+        reservation = save_reservation(serializer)
+        enqueue("create_invoice", reservation_id=reservation.pk)
+        enqueue("send_confirmation", reservation_id=reservation.pk)
+    return reservation
+
+
+def book_many(items) -> list:
+    """
+    Books many reservations at once and creates their invoices. Either every reservation is booked or none.
+
+    The cabins, users and services are loaded with one query each and all the stays are checked against the
+    existing bookings with one query, then the reservations, their services and invoices are bulk inserted.
+    :param items: validated data of a BatchReservationSerializer(many=True)
+    :return: the booked reservations
+    :raises ValidationError: with the errors of every invalid item by its index
+    """
+    errors = defaultdict(list)
+    with transaction.atomic():
+        cabins = {
+            cabin.pk: cabin
+            for cabin in Cabin.objects.select_for_update()
+            .filter(pk__in={item["cabin"] for item in items})
+            .order_by("pk")
+            .only("pk", "name", "area_id", "price_per_night")
+        }
+        rates = pricing.load_rates(cabins.values())
+        users = {
+            pk: f"{first_name} {last_name}"
+            for pk, first_name, last_name in User.objects.filter(
+                pk__in={item["customer"] for item in items} | {item["owner"] for item in items}
+            ).values_list("pk", "first_name", "last_name")
+        }
+        services = Service.objects.only("pk", "name", "service_price").in_bulk(
+            {service for item in items for service in item["services"]}
+        )
+
+        for index, item in enumerate(items):
+            if item["cabin"] not in cabins:
+                errors[index].append(f"Cabin {item['cabin']} does not exist.")
+            for user in (item["customer"], item["owner"]):
+                if user not in users:
+                    errors[index].append(f"User {user} does not exist.")
+            for service in item["services"]:
+                if service not in services:
+                    errors[index].append(f"Service {service} does not exist.")
+            if item["cabin"] in rates:
+                error = pricing.check_stay(rates[item["cabin"]], item["start_date"], item["end_date"])
+                if error:
+                    errors[index].append(error)
+
+        stays = [item for index, item in enumerate(items) if index not in errors]
+        if stays:
+            # One window over the booked cabins covers the existing bookings any of the stays could overlap
+            first_start = min(item["start_date"] for item in stays)
+            existing = Reservation.objects.active().filter(
+                cabin_id__in={item["cabin"] for item in stays},
+                start_date__gt=first_start - timedelta(days=settings.RESERVATION_MAX_NIGHTS),
+                start_date__lt=max(item["end_date"] for item in stays),
+                end_date__gt=first_start,
+            )
+            booked = defaultdict(list)
+            for cabin_id, start_date, end_date in existing.values_list("cabin_id", "start_date", "end_date"):
+                booked[cabin_id].append((start_date, end_date, None))
+            for index, item in enumerate(items):
+                if index in errors:
+                    continue
+                for start_date, end_date, other in booked[item["cabin"]]:
+                    if start_date < item["end_date"] and end_date > item["start_date"]:
+                        if other is None:
+                            errors[index].append("Reservation overlaps with an existing booking.")
+                        else:
+                            errors[index].append(f"Reservation overlaps with item {other} of the batch.")
+                        break
+                else:
+                    booked[item["cabin"]].append((item["start_date"], item["end_date"], index))
+
+        if errors:
+            raise ValidationError({str(index): messages for index, messages in sorted(errors.items())})
+
+        reservations = []
+        for item in items:
+            cabin_price = pricing.stay_price(rates[item["cabin"]], item["start_date"], item["end_date"])
+            service_lines = [
+                [services[service].name, str(services[service].service_price)]
+                for service in sorted(set(item["services"]))
+            ]
+            services_price = pricing.services_price(price for _, price in service_lines)
+            reservations.append(
+                Reservation(
+                    cabin_id=item["cabin"],
+                    customer_id=item["customer"],
+                    owner_id=item["owner"],
+                    start_date=item["start_date"],
+                    end_date=item["end_date"],
+                    cabin_price=cabin_price,
+                    services_price=services_price,
+                    total_price=cabin_price + services_price,
+                    service_lines=service_lines,
+                    cabin_name=cabins[item["cabin"]].name,
+                    customer_name=users[item["customer"]],
+                    price_version=1,
+                )
+            )
+        Reservation.objects.bulk_create(reservations, batch_size=500)
+        Reservation.services.through.objects.bulk_create(
+            [
+                Reservation.services.through(reservation_id=reservation.pk, service_id=service)
+                for reservation, item in zip(reservations, items)
+                for service in set(item["services"])
+            ],
+            batch_size=500,
+        )
+        Invoice.objects.bulk_create([Invoice(reservation=reservation) for reservation in reservations], batch_size=500)
+        # bulk_create sends no signals, the availability calendars and revenue rollup are updated here instead
+        availability.add_stays(reservation.stay for reservation in reservations)
+        changes = revenue.Changes()
+        for reservation in reservations:
+            changes.add(
+                cabins[reservation.cabin_id].area_id,
+                reservation.start_date,
+                reservation.cabin_price,
+                reservation.services_price,
+                paid=False,
+            )
+        changes.apply()
+        enqueue_many("send_confirmation", [{"reservation_id": reservation.pk} for reservation in reservations])
+    return reservations
@@ -0,0 +1,86 @@
+"""
+Streaming exports of reservations and invoices.
+
+Rows are read from the database in chunks and written out one by one, so an export holds only one chunk
+in memory however many rows there are, and the first rows are sent before the last ones are read.
+"""
+
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+RESERVATION_FIELDS = {
+    "id": "id",
+    "cabin": "cabin_id",
+    "customer": "customer_id",
+    "owner": "owner_id",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "created_at": "created_at",
+    "accepted_at": "accepted_at",
+    "canceled_at": "canceled_at",
+    "cabin_price": "cabin_price",
+    "services_price": "services_price",
+    "total_price": "total_price",
+}
+
+INVOICE_FIELDS = {
+    "id": "id",
+    "reservation": "reservation_id",
+    "customer": "reservation__customer__username",
+    "area": "reservation__cabin__area__area",
+    "cabin": "reservation__cabin__name",
+    "start_date": "reservation__start_date",
+    "end_date": "reservation__end_date",
+    "cabin_price": "reservation__cabin_price",
+    "services_price": "reservation__services_price",
+    "total_price": "reservation__total_price",
+    "created_at": "created_at",
+    "paid_at": "paid_at",
+    "canceled_at": "canceled_at",
+}
+
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class Echo:
+    """
+    File-like object that returns what is written to it, lets csv.writer format single rows.
+    """
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(names, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + "\n"
+
+
+def csv_lines(names, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export(queryset, fields, output, filename) -> StreamingHttpResponse:
+    """
+    Streams the rows of the queryset as NDJSON or CSV.
+    :param queryset: rows to export, in the order they are written
+    :param fields: dict of column name -> field lookup
+    :param output: "ndjson" or "csv"
+    :param filename: file name of the download without extension
+    :raises ValidationError: if the output format is unknown
+    """
+    if output not in CONTENT_TYPES:
+        raise ValidationError(f"Unknown output format, expected one of: {', '.join(CONTENT_TYPES)}.")
+    rows = queryset.values_list(*fields.values()).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    lines = ndjson_lines(list(fields), rows) if output == "ndjson" else csv_lines(list(fields), rows)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[output])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{output}"'
+    return response
@@ -0,0 +1,51 @@
+"""
+Background jobs that follow a booking, run by the job queue (jobs.queue).
+"""
+
+from django.core.mail import send_mail
+
+from jobs.queue import enqueue, job
+from . import pdf
+from .models import Invoice, Reservation
+
+
+@job("create_invoice")
+def create_invoice(reservation_id):
+    """
+    Creates the invoice of a booked reservation and has its PDF generated.
+    """
+    invoice, created = Invoice.objects.get_or_create(reservation_id=reservation_id)
+    if created:
+        enqueue("warm_invoice", invoice_id=invoice.pk)
+
+
+@job("warm_invoice")
+def warm_invoice(invoice_id):
+    """
+    Generates the PDF of an invoice into INVOICE_PDF_DIR, which the web processes serve it from, so the first
+    download does not have to wait. The rendered text is not cached here: the cache of the worker process is not
+    the one the web processes read.
+    """
+    invoice = Invoice.objects.select_related("reservation").get(pk=invoice_id)
+    text = invoice.get_invoice_text()
+    path = pdf.pdf_path(invoice.pk, text)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pdf.write_pdf(invoice.pk, text, str(path))
+
+
+@job("send_confirmation")
+def send_confirmation(reservation_id):
+    """
+    Emails the customer a confirmation of a booked reservation.
+    """
+    reservation = Reservation.objects.select_related("cabin", "customer").get(pk=reservation_id)
+    send_mail(
+        f"Your booking of {reservation.cabin.name}",
+        f"Hello {reservation.customer.first_name},\n\n"
+        f"your booking of {reservation.cabin.name} from {reservation.start_date} to {reservation.end_date} "
+        f"is confirmed. The total price is {reservation.total_price}.\n\n"
+        f"Thank you for booking with Serene Stays!",
+        None,
+        [reservation.customer.email],
+    )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations.availability import build_calendars, from_bytes
+from reservations.models import CabinCalendar, Reservation
+
+
+class Command(BaseCommand):
+    help = "Checks that the availability calendars match the reservations."
+
+    def handle(self, *args, **options):
+        expected = build_calendars(Reservation.objects.all())
+        stored = {
+            (cabin_id, year): from_bytes(nights)
+            for cabin_id, year, nights in CabinCalendar.objects.values_list("cabin_id", "year", "nights").iterator()
+        }
+
+        mismatches = 0
+        for cabin_id, year in sorted(expected.keys() | stored.keys()):
+            difference = expected.get((cabin_id, year), 0) ^ stored.get((cabin_id, year), 0)
+            if difference:
+                mismatches += 1
+                nights = bin(difference).count("1")
+                self.stdout.write(f"Cabin {cabin_id}, year {year}: {nights} nights differ from the reservations")
+
+        if mismatches:
+            raise CommandError(f"{mismatches} calendars are inconsistent, run rebuild_availability to fix them.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(expected)} cabin calendars match the reservations."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservations.availability import build_calendars, to_bytes
+from reservations.models import CabinCalendar, Reservation
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the availability calendars of all cabins from the reservations."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            calendars = build_calendars(Reservation.objects.all())
+            CabinCalendar.objects.all().delete()
+            CabinCalendar.objects.bulk_create(
+                (
+                    CabinCalendar(cabin_id=cabin_id, year=year, nights=to_bytes(nights))
+                    for (cabin_id, year), nights in calendars.items()
+                ),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(calendars)} cabin calendars."))
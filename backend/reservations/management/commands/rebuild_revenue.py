@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservations.models import Invoice, Revenue
+from reservations.revenue import aggregate
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the revenue rollup of all areas and months from the invoices."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = aggregate(Invoice.objects.all())
+            Revenue.objects.all().delete()
+            Revenue.objects.bulk_create(
+                (Revenue(area_id=row.pop("area"), **row) for row in rows),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} revenue rows."))
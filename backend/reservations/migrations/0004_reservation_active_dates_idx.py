@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0002_cabin_address"),
+        ("reservations", "0003_alter_invoice_canceled_at_alter_invoice_paid_at_and_more"),
+        ("services", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("canceled_at__isnull", True)),
+                fields=["cabin", "start_date", "end_date"],
+                name="reservation_active_dates_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import date
+
+from django.db import migrations, models
+
+# The calendar layout as of this migration, see reservations.availability. Copied so that later changes of that
+# module do not change what this migration does.
+YEAR_BYTES = 46
+
+
+def year_spans(start_date, end_date):
+    while start_date < end_date:
+        next_year = date(start_date.year + 1, 1, 1)
+        stop_date = min(end_date, next_year)
+        first_bit = start_date.timetuple().tm_yday - 1
+        yield start_date.year, first_bit, first_bit + (stop_date - start_date).days
+        start_date = stop_date
+
+
+def nights_mask(first_bit, stop_bit) -> int:
+    return ((1 << (stop_bit - first_bit)) - 1) << first_bit
+
+
+def build_calendars(apps, schema_editor):
+    Reservation = apps.get_model("reservations", "Reservation")
+    CabinCalendar = apps.get_model("reservations", "CabinCalendar")
+
+    calendars = defaultdict(int)
+    stays = Reservation.objects.filter(canceled_at__isnull=True).values_list("cabin_id", "start_date", "end_date")
+    for cabin_id, start_date, end_date in stays.iterator():
+        for year, first_bit, stop_bit in year_spans(start_date, end_date):
+            calendars[cabin_id, year] |= nights_mask(first_bit, stop_bit)
+
+    CabinCalendar.objects.bulk_create(
+        CabinCalendar(cabin_id=cabin_id, year=year, nights=nights.to_bytes(YEAR_BYTES, "little"))
+        for (cabin_id, year), nights in calendars.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0002_cabin_address"),
+        ("reservations", "0004_reservation_active_dates_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CabinCalendar",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("year", models.PositiveSmallIntegerField()),
+                ("nights", models.BinaryField()),
+                ("cabin", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="cabins.cabin")),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("cabin", "year"), name="cabin_calendar_year_unique")],
+            },
+        ),
+        migrations.RunPython(build_calendars, migrations.RunPython.noop),
+    ]
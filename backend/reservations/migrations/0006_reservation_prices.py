@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def calculate_prices(apps, schema_editor):
+    Reservation = apps.get_model("reservations", "Reservation")
+
+    reservations = Reservation.objects.select_related("cabin").annotate(services_sum=Sum("services__service_price"))
+    priced = []
+    for reservation in reservations.iterator(chunk_size=2000):
+        nights = (reservation.end_date - reservation.start_date).days
+        reservation.cabin_price = reservation.cabin.price_per_night * nights
+        reservation.services_price = reservation.services_sum or Decimal("0.00")
+        reservation.total_price = reservation.cabin_price + reservation.services_price
+        reservation.price_version = 1
+        priced.append(reservation)
+    Reservation.objects.bulk_update(priced, ["cabin_price", "services_price", "total_price", "price_version"], 1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0005_cabincalendar"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="cabin_price",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="price_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="services_price",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="total_price",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(calculate_prices, migrations.RunPython.noop),
+    ]
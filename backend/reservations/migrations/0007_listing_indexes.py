@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0002_cabin_address"),
+        ("reservations", "0006_reservation_prices"),
+        ("services", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="invoice",
+            index=models.Index(fields=["created_at", "id"], name="invoice_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["created_at", "id"], name="reservation_created_idx"),
+        ),
+    ]
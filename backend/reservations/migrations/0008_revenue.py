@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_revenue(apps, schema_editor):
+    """
+    Sums the revenue of the invoices per area and month, as reservations.revenue.aggregate did at this migration.
+    """
+    Invoice = apps.get_model("reservations", "Invoice")
+    Revenue = apps.get_model("reservations", "Revenue")
+
+    paid = Q(paid_at__isnull=False)
+    rows = (
+        Invoice.objects.filter(canceled_at__isnull=True, reservation__canceled_at__isnull=True)
+        .values(area=F("reservation__cabin__area_id"), month=TruncMonth("reservation__start_date"))
+        .annotate(
+            cabin_paid=Sum("reservation__cabin_price", filter=paid, default=0),
+            services_paid=Sum("reservation__services_price", filter=paid, default=0),
+            cabin_unpaid=Sum("reservation__cabin_price", filter=~paid, default=0),
+            services_unpaid=Sum("reservation__services_price", filter=~paid, default=0),
+        )
+        .order_by()
+    )
+    Revenue.objects.bulk_create(Revenue(area_id=row.pop("area"), **row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0002_cabin_address"),
+        ("reservations", "0007_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Revenue",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField()),
+                ("cabin_paid", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("services_paid", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("cabin_unpaid", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("services_unpaid", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("area", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="cabins.area")),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("area", "month"), name="revenue_area_month_unique")],
+            },
+        ),
+        migrations.RunPython(build_revenue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_service_lines(apps, schema_editor):
+    """
+    The prices the services were booked at are not known, the lines of the existing reservations get the current ones.
+    """
+    Reservation = apps.get_model("reservations", "Reservation")
+    ReservationServices = Reservation.services.through
+
+    lines = defaultdict(list)
+    links = ReservationServices.objects.order_by("reservation_id", "service_id")
+    for reservation_id, name, price in links.values_list("reservation_id", "service__name", "service__service_price"):
+        lines[reservation_id].append([name, str(price)])
+    reservations = Reservation.objects.filter(pk__in=lines).only("pk")
+    for reservation in reservations:
+        reservation.service_lines = lines[reservation.pk]
+    Reservation.objects.bulk_update(reservations, ["service_lines"], 1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0008_revenue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="service_lines",
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(fill_service_lines, migrations.RunPython.noop),
+    ]
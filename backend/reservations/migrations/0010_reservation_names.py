@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:11
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+
+def fill_names(apps, schema_editor):
+    Cabin = apps.get_model("cabins", "Cabin")
+    Reservation = apps.get_model("reservations", "Reservation")
+    User = apps.get_model("users", "User")
+
+    cabins = Cabin.objects.filter(pk=OuterRef("cabin_id"))
+    customers = User.objects.filter(pk=OuterRef("customer_id"))
+    Reservation.objects.update(
+        cabin_name=Subquery(cabins.values("name")[:1]),
+        customer_name=Subquery(customers.values(name=Concat("first_name", Value(" "), "last_name"))[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cabins", "0008_post_code_coordinates"),
+        ("reservations", "0009_reservation_service_lines"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="cabin_name",
+            field=models.CharField(blank=True, default="", max_length=150),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="customer_name",
+            field=models.CharField(blank=True, default="", max_length=301),
+        ),
+        migrations.RunPython(fill_names, migrations.RunPython.noop),
+    ]
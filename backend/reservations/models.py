@@ -1,12 +1,47 @@
-from datetime import datetime
+from datetime import date, timedelta
+from decimal import Decimal
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Q
 
-from cabins.models import Cabin
+from cabins.models import Area, Cabin
 from services.models import Service
 from users.models import User
+from . import pricing
+
+
+def to_date(value) -> date:
+    """
+    Returns the value as a date. Dates of unsaved or just created model instances may still be ISO strings.
+    """
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+class ReservationQuerySet(models.QuerySet):
+    def active(self):
+        """
+        Returns reservations that have not been canceled.
+        """
+        return self.filter(canceled_at__isnull=True)
+
+    def overlapping(self, cabin, start_date, end_date):
+        """
+        Returns active reservations of the cabin that share at least one night with the given period.
+        The check-out day is not a booked night, so back-to-back stays do not overlap.
+
+        No stay is longer than RESERVATION_MAX_NIGHTS, which bounds the scan over the
+        (cabin, start_date, end_date) index to a fixed window however long the booking history grows.
+        """
+        start_date, end_date = to_date(start_date), to_date(end_date)
+        earliest_start = start_date - timedelta(days=settings.RESERVATION_MAX_NIGHTS)
+        return self.active().filter(
+            cabin=cabin, start_date__gt=earliest_start, start_date__lt=end_date, end_date__gt=start_date
+        )
 
 
 class Reservation(models.Model):
@@ -26,59 +61,173 @@ class Reservation(models.Model):
         null=True, blank=True
     )  # When the reservation was canceled by the customer or staff
 
+    # Prices are fixed when the reservation is booked, and only recomputed when its cabin, dates or services change.
+    # The names its invoices show are fixed along with them.
+    cabin_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Price of all the nights
+    services_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Price of all the services
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    service_lines = models.JSONField(default=list)  # [name, price] of every service as priced in services_price
+    cabin_name = models.CharField(max_length=150, blank=True, default="")
+    customer_name = models.CharField(max_length=301, blank=True, default="")  # First and last name
+    price_version = models.PositiveIntegerField(default=0)  # Incremented every time the prices are recomputed
+    PRICE_FIELDS = [
+        "cabin_price",
+        "services_price",
+        "total_price",
+        "service_lines",
+        "cabin_name",
+        "customer_name",
+        "price_version",
+    ]
+
+    objects = ReservationQuerySet.as_manager()
+
+    saved_stay = None  # The stay as it was last stored, see stay
+    priced_stay = None  # The cabin and dates the prices were last computed for
+    saved_revenue = None  # The revenue_state as it was last stored
+
+    class Meta:
+        indexes = [
+            # Overlap checks only look at active reservations of one cabin
+            models.Index(
+                fields=["cabin", "start_date", "end_date"],
+                name="reservation_active_dates_idx",
+                condition=Q(canceled_at__isnull=True),
+            ),
+            # Keyset pagination of the listings, see reservations.pagination
+            models.Index(fields=["created_at", "id"], name="reservation_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.cabin} {self.customer} {self.start_date} {self.end_date}"
 
-    # Q object to query the database for any reservations that overlap the new reservation.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {"cabin_id", "start_date", "end_date"}.issubset(field_names):
+            instance.priced_stay = instance.cabin_id, instance.start_date, instance.end_date
+            if "canceled_at" in field_names:
+                instance.saved_stay = instance.stay
+        if {"cabin_id", "start_date", "canceled_at", "cabin_price", "services_price"}.issubset(field_names):
+            instance.saved_revenue = instance.revenue_state
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.stay_changed(kwargs.get("update_fields")):
+            self.calculate_prices()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], *self.PRICE_FIELDS}
+        super().save(*args, **kwargs)
+        self.saved_stay = self.stay
+        self.saved_revenue = self.revenue_state
+
+    def stay_changed(self, update_fields=None) -> bool:
+        """
+        Returns whether the cabin or dates to be saved differ from the ones the prices were computed for.
+        A stay that is deferred or left out of update_fields is not saved, so it has not changed.
+        """
+        stay_fields = {"cabin", "cabin_id", "start_date", "end_date"}
+        if update_fields is not None and not stay_fields.intersection(update_fields):
+            return False
+        if stay_fields.intersection(self.get_deferred_fields()):
+            return False
+        return self.priced_stay != (self.cabin_id, to_date(self.start_date), to_date(self.end_date))
+
+    def calculate_prices(self):
+        """
+        Computes the prices of the reservation from the current rates of its cabin and prices of its services,
+        see reservations.pricing, and the names of its cabin and customer. Does not save the reservation.
+        """
+        self.cabin_name = self.cabin.name
+        self.customer_name = f"{self.customer.first_name} {self.customer.last_name}"
+        rates = pricing.load_rates([self.cabin])[self.cabin_id]
+        self.cabin_price = pricing.stay_price(rates, to_date(self.start_date), to_date(self.end_date))
+        self.price_services()
+        self.total_price = self.cabin_price + self.services_price
+        self.price_version += 1
+        self.priced_stay = self.cabin_id, to_date(self.start_date), to_date(self.end_date)
+
+    def update_services_price(self):
+        """
+        Recomputes and saves the price of the services after they have been added or removed.
+        """
+        self.price_services()
+        self.total_price = self.cabin_price + self.services_price
+        self.price_version += 1
+        self.save(update_fields=["services_price", "total_price", "service_lines", "price_version"])
+
+    def price_services(self):
+        """
+        Prices the services of the reservation at their current prices. Their names and prices are kept in
+        service_lines, so an invoice lists the lines its services price adds up from. Does not save the reservation.
+        """
+        services = self.services.order_by("pk").values_list("name", "service_price") if self.pk else []
+        self.service_lines = [[name, str(price)] for name, price in services]
+        self.services_price = pricing.services_price(price for _, price in self.service_lines)
+
+    @property
+    def stay(self) -> tuple:
+        """
+        Returns the cabin, check-in and check-out date of an active reservation, or None if it is canceled.
+        Receivers of the save signals compare it with saved_stay, the stay as it was last stored.
+        """
+        if self.canceled_at or self.cabin_id is None:
+            return None
+        return self.cabin_id, to_date(self.start_date), to_date(self.end_date)
+
+    @property
+    def revenue_state(self) -> tuple:
+        """
+        Returns what the reservation adds to the revenue rollup through its invoices: the cabin, check-in date,
+        cabin price and services price, or None if it is canceled. See reservations.revenue.
+        """
+        if self.canceled_at or self.cabin_id is None:
+            return None
+        return self.cabin_id, to_date(self.start_date), Decimal(self.cabin_price), Decimal(self.services_price)
+
+    # Query the cabin's active reservations for any that overlap the new reservation.
     def clean(self):
         super().clean()
-        overlapping_reservations = Reservation.objects.filter(
-            Q(start_date__range=(self.start_date, self.end_date))
-            | Q(end_date__range=(self.start_date, self.end_date))
-            | Q(start_date__lte=self.start_date, end_date__gte=self.end_date)
+        rates = pricing.load_rates([self.cabin])[self.cabin_id]
+        error = pricing.check_stay(rates, to_date(self.start_date), to_date(self.end_date))
+        if error:
+            raise ValidationError({"__all__": [error]})
+        overlapping_reservations = Reservation.objects.overlapping(
+            self.cabin_id, self.start_date, self.end_date
         ).exclude(pk=self.pk)
         if overlapping_reservations.exists():
             raise ValidationError({"__all__": ["Reservation overlaps with an existing booking."]})
 
     @property
     def length_of_stay(self) -> int:
-        start = datetime.strptime(self.start_date.__str__(), "%Y-%m-%d")
-        end = datetime.strptime(self.end_date.__str__(), "%Y-%m-%d")
-        return (end - start).days
+        return (to_date(self.end_date) - to_date(self.start_date)).days
 
-    def get_total_cabin_price(self) -> float:
+    def get_total_cabin_price(self) -> Decimal:
         """
         Returns the total price of the cabin for the reservation period.
         """
-        price = self.cabin.price_per_night * self.length_of_stay
-        return price
+        return self.cabin_price
 
-    def get_total_services_price(self) -> float:
+    def get_total_services_price(self) -> Decimal:
         """
         Returns the total price of the services for the reservation period.
         """
-        price = 0
-        for service in self.services.all():
-            price += service.service_price
-        return price
+        return self.services_price
 
-    def get_total_price(self) -> float:
+    def get_total_price(self) -> Decimal:
         """
         Returns the total price of the reservation.
         """
-        price = self.get_total_cabin_price() + self.get_total_services_price()
-        return price
+        return self.total_price
 
     def get_services(self) -> list:
         """
-        Returns all the services that are included in the reservation.
+        Returns the name and price of every service included in the reservation, as they were priced.
         """
-        services = []
-        for service in self.services.all():
-            services.append((service.name, service.service_price))
-        return services
+        return [(name, Decimal(price)) for name, price in self.service_lines]
 
-    def is_cabin_available(self, check_in_date, check_out_date):
+    @classmethod
+    def is_cabin_available(cls, cabin, check_in_date, check_out_date):
         """
         Checks if given cabin is available for the specified
         check-in and check-out dates.
@@ -89,10 +238,25 @@ class Reservation(models.Model):
         """
         if check_in_date >= check_out_date:
             return False
-        overlapping_reservations = Reservation.objects.filter(
-            cabin=self, start_date__lt=check_out_date, end_date__gt=check_in_date
-        )
-        return not overlapping_reservations.exists()
+        if (check_out_date - check_in_date).days > settings.RESERVATION_MAX_NIGHTS:
+            return False
+        return not cls.objects.overlapping(cabin, check_in_date, check_out_date).exists()
+
+
+class CabinCalendar(models.Model):
+    """
+    Booked nights of a cabin in one year as a bitset, see reservations.availability.
+    """
+
+    cabin = models.ForeignKey(Cabin, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    nights = models.BinaryField()  # Bit n is set when night n of the year is booked
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["cabin", "year"], name="cabin_calendar_year_unique")]
+
+    def __str__(self):
+        return f"{self.cabin} {self.year}"
 
 
 class Invoice(models.Model):
@@ -106,37 +270,86 @@ class Invoice(models.Model):
     canceled_at = models.DateTimeField(null=True, blank=True)  # When the invoice was canceled
     updated_at = models.DateTimeField(auto_now=True, blank=True)  # When the invoice was last updated
 
+    saved_revenue = None  # The revenue_state as it was last stored
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the listings, see reservations.pagination
+            models.Index(fields=["created_at", "id"], name="invoice_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.reservation}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {"reservation_id", "paid_at", "canceled_at"}.issubset(field_names):
+            instance.saved_revenue = instance.revenue_state
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.saved_revenue = self.revenue_state
+
     @property
-    def total_price(self) -> tuple:
+    def revenue_state(self) -> tuple:
+        """
+        Returns the reservation the invoice counts in the revenue rollup and whether it is paid,
+        or None if it is canceled. See reservations.revenue.
+        """
+        if self.canceled_at:
+            return None
+        return self.reservation_id, self.paid_at is not None
+
+    @property
+    def total_price(self) -> Decimal:
         """
         Returns the total price of the reservation.
         """
-        total_price = self.reservation.get_total_cabin_price() + self.reservation.get_total_services_price()
-        return total_price
+        return self.reservation.total_price
 
-    def get_invoice(self) -> str:
-        reservation: Reservation = self.reservation
+    @property
+    def cache_key(self) -> str:
+        """
+        Cache key of the rendered invoice. updated_at is bumped whenever the invoice or anything it shows changes,
+        see reservations.signals, so a stale rendering is never read back.
+        """
+        return f"invoice:{self.pk}:{self.updated_at.isoformat()}"
 
-        cabin = reservation.cabin
-        customer = reservation.customer
-        services = reservation.services.all()
+    @classmethod
+    def render_invoices(cls, invoices) -> dict:
+        """
+        Returns the rendered text of the invoices by id. Only the invoices that changed since they were last
+        rendered are rendered again.
+        :param invoices: invoices with their reservation loaded
+        """
+        keys = {invoice.cache_key: invoice for invoice in invoices}
+        rendered = cache.get_many(keys)
+        missing = [invoice for key, invoice in keys.items() if key not in rendered]
+        if missing:
+            missing = {invoice.cache_key: invoice.get_invoice_text() for invoice in missing}
+            cache.set_many(missing, settings.INVOICE_CACHE_TIMEOUT)
+            rendered.update(missing)
+        return {invoice.pk: rendered[key] for key, invoice in keys.items()}
+
+    def get_invoice_text(self) -> str:
+        reservation: Reservation = self.reservation
+        services = reservation.get_services()
 
         # format nicely
-        invoice = f"Reservation for {customer.first_name} {customer.last_name}:\n\n"
+        invoice = f"Reservation for {reservation.customer_name}:\n\n"
         invoice += f"Check-in: {reservation.start_date}\n"
         invoice += f"Check-out: {reservation.end_date}\n"
 
-        invoice += f"\nCabin: {cabin.name}\n"
-        invoice += f"Price per night: {cabin.price_per_night}\n"
+        invoice += f"\nCabin: {reservation.cabin_name}\n"
+        invoice += f"Average price per night: {(reservation.cabin_price / max(reservation.length_of_stay, 1)):.2f}\n"
         invoice += f"Total price for {reservation.length_of_stay} nights: {reservation.get_total_cabin_price()}\n"
 
         if services:
             invoice += f"\nServices:\n"
-            for service in services:
-                invoice += f"{service.name}: {service.service_price}\n"
+            for name, price in services:
+                invoice += f"{name}: {price}\n"
             invoice += f"Total price for services: {reservation.get_total_services_price()}\n"
 
         invoice += f"\nTotal price: {reservation.get_total_price()}"
@@ -144,3 +357,26 @@ class Invoice(models.Model):
         invoice += f"\n\nThank you for your visiting!"
 
         return invoice
+
+
+class Revenue(models.Model):
+    """
+    Rollup of the revenue of an area in a month, kept up to date by reservations.revenue.
+    """
+
+    area = models.ForeignKey(Area, on_delete=models.CASCADE)
+    month = models.DateField()  # First day of the month the stays start in
+    cabin_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    services_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cabin_unpaid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    services_unpaid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["area", "month"], name="revenue_area_month_unique")]
+
+    def __str__(self):
+        return f"{self.area_id} {self.month:%Y-%m}"
+
+    @property
+    def total(self) -> Decimal:
+        return self.cabin_paid + self.services_paid + self.cabin_unpaid + self.services_unpaid
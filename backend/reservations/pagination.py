@@ -0,0 +1,68 @@
+"""
+Keyset pagination of the reservation and invoice listings on (created_at, id).
+
+A page starts with an index seek past the last row of the previous page instead of an OFFSET,
+so every page costs the same however deep the client scrolls.
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+CURSOR_SALT = "reservations.pagination"
+
+
+def get_page_size(request) -> int:
+    """
+    Returns the page size requested with the page_size parameter, limited to PAGINATION_MAX_PAGE_SIZE.
+    """
+    page_size = request.GET.get("page_size")
+    if page_size is None:
+        return settings.PAGINATION_PAGE_SIZE
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        raise ValidationError("page_size must be a number.")
+    if page_size < 1:
+        raise ValidationError("page_size must be positive.")
+    return min(page_size, settings.PAGINATION_MAX_PAGE_SIZE)
+
+
+def encode_cursor(row) -> str:
+    """
+    Returns an opaque, signed continuation token pointing right after the row.
+    """
+    return signing.dumps([row.created_at.isoformat(), row.pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor) -> tuple:
+    try:
+        created_at, pk = signing.loads(cursor, salt=CURSOR_SALT)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise ValidationError("Invalid cursor.")
+
+
+def paginate(request, queryset) -> tuple:
+    """
+    Returns the page of rows requested with the cursor and page_size parameters.
+    :param request: request with optional cursor and page_size parameters
+    :param queryset: queryset of a model with created_at and id columns
+    :return: tuple of the rows of the page and the cursor of the next page, or None on the last page
+    """
+    page_size = get_page_size(request)
+    queryset = queryset.order_by("created_at", "pk")
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # The created_at__gte bound lets the database seek the (created_at, id) index to the cursor
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(pk__gt=pk), created_at__gte=created_at)
+
+    rows = list(queryset[: page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
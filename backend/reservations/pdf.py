@@ -0,0 +1,103 @@
+"""
+PDF documents of the invoices.
+
+PDFs are generated from the rendered invoice text in a pool of worker processes, so a request never waits for
+one. Every PDF is stored under the id of its invoice and the hash of its text: an invoice whose text has not changed
+is never generated again, and the hash doubles as the ETag of the download. Writing a new version of an invoice
+deletes the older ones, and the PDFs of a deleted invoice are deleted with it, see reservations.signals.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+_executor = None
+_pending = {}  # PDF file name -> future of its generation
+_lock = threading.Lock()
+
+
+def content_hash(text) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def pdf_path(invoice_id, text) -> Path:
+    """
+    Returns the path the PDF of the invoice with the given text is stored at.
+    """
+    return Path(settings.INVOICE_PDF_DIR) / f"{invoice_id}-{content_hash(text)}.pdf"
+
+
+def delete_pdfs(directory, invoice_id, keep=None):
+    """
+    Deletes the stored PDFs of an invoice.
+    :param keep: file name of a PDF of the invoice that is not deleted
+    """
+    for path in Path(directory).glob(f"{invoice_id}-*.pdf"):
+        if path.name != keep:
+            path.unlink(missing_ok=True)
+
+
+def render_pdf(text) -> bytes:
+    """
+    Lays out the invoice text on A4 pages.
+    """
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=True)
+    _, height = A4
+    y = height - 72
+    for line in text.split("\n"):
+        if y < 72:
+            pdf.showPage()
+            y = height - 72
+        pdf.drawString(72, y, line)
+        y -= 16
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def write_pdf(invoice_id, text, path):
+    """
+    Renders the PDF in a worker process. The file is written under a temporary name and moved in place,
+    so a half written PDF is never served. The earlier versions of the invoice are deleted after it.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(render_pdf(text))
+    os.replace(temp_path, path)
+    delete_pdfs(Path(path).parent, invoice_id, keep=Path(path).name)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.INVOICE_PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def generate(invoice_id, text):
+    """
+    Starts generating the PDF of the invoice text in the background unless it exists or is already being generated.
+    :return: future of the generation, or None if the PDF exists
+    """
+    path = pdf_path(invoice_id, text)
+    if path.exists():
+        return None
+    with _lock:
+        future = _pending.get(path.name)
+        if future is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            future = get_executor().submit(write_pdf, invoice_id, text, str(path))
+            _pending[path.name] = future
+            future.add_done_callback(lambda _: _pending.pop(path.name, None))
+        return future
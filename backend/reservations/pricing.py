@@ -0,0 +1,181 @@
+"""
+Prices of stays.
+
+The same engine prices booked reservations and quotes. A cabin's nights cost its price_per_night, or the price
+of the season of its rate plan (cabins.models.RatePlan) they fall in, with Friday and Saturday nights multiplied
+by the plan's weekend multiplier. A stay is priced per run of nights at the same rate, counting the weekend nights
+of a run arithmetically, so the cost does not grow with the length of the stay. Prices are memoized per cabin,
+rate plan version and dates.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Q
+
+from cabins.models import Cabin, RatePlan
+from services.models import Service
+
+CENT = Decimal("0.01")
+WEEKEND = {4, 5}  # Nights starting on Friday and Saturday
+
+
+def to_decimal(value) -> Decimal:
+    # Prices assigned in code may still be floats until the row is loaded again
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+@dataclass(frozen=True)
+class Rates:
+    """
+    Everything needed to price the stays of a cabin. Rates compare equal while the cabin's price and the version
+    of its rate plan are the same, which makes them the memoization key of stay_price.
+    """
+
+    cabin_id: int
+    price_per_night: Decimal
+    plan_id: int = None
+    plan_version: int = None
+    weekend_multiplier: Decimal = field(default=Decimal(1), compare=False)
+    min_nights: int = field(default=1, compare=False)
+    seasons: tuple = field(default=(), compare=False)  # (start date, end date, price per night, min nights)
+
+    def min_stay(self, start_date) -> int:
+        """
+        Returns the shortest stay that can check in on the given date.
+        """
+        for season_start, season_end, _, min_nights in self.seasons:
+            if season_start <= start_date < season_end and min_nights:
+                return min_nights
+        return self.min_nights
+
+
+def load_rates(cabins) -> dict:
+    """
+    Loads the rate plans of the given cabins, a cabin's own plan before the plan of its area.
+    :param cabins: cabins with at least their id, area and price_per_night loaded
+    :return: dict of cabin id -> Rates
+    """
+    cabins = list(cabins)
+    plans = RatePlan.objects.filter(
+        Q(cabin__in=[cabin.pk for cabin in cabins]) | Q(area__in={cabin.area_id for cabin in cabins})
+    ).prefetch_related("seasons")
+    cabin_plans = {plan.cabin_id: plan for plan in plans if plan.cabin_id}
+    area_plans = {plan.area_id: plan for plan in plans if plan.area_id}
+
+    rates = {}
+    for cabin in cabins:
+        plan = cabin_plans.get(cabin.pk) or area_plans.get(cabin.area_id)
+        if plan is None:
+            rates[cabin.pk] = Rates(cabin.pk, to_decimal(cabin.price_per_night))
+            continue
+        rates[cabin.pk] = Rates(
+            cabin.pk,
+            to_decimal(cabin.price_per_night),
+            plan.pk,
+            plan.version,
+            plan.weekend_multiplier,
+            plan.min_nights,
+            tuple(
+                (season.start_date, season.end_date, season.price_per_night, season.min_nights)
+                for season in plan.seasons.all()
+            ),
+        )
+    return rates
+
+
+def weekend_nights(start_date, end_date) -> int:
+    """
+    Counts the Friday and Saturday nights of start_date..end_date (exclusive).
+    """
+    weeks, days = divmod((end_date - start_date).days, 7)
+    first = start_date.weekday()
+    return weeks * len(WEEKEND) + sum((first + day) % 7 in WEEKEND for day in range(days))
+
+
+def runs(rates, start_date, end_date):
+    """
+    Splits a stay into runs of nights with the same price. Where seasons overlap, the earlier one applies.
+    :return: iterator of (start date, end date, price per night) tuples
+    """
+    day = start_date
+    for season_start, season_end, price, _ in rates.seasons:
+        if season_end <= day:
+            continue
+        if season_start >= end_date:
+            break
+        if season_start > day:
+            yield day, season_start, rates.price_per_night
+        yield max(day, season_start), min(season_end, end_date), price
+        day = min(season_end, end_date)
+    if day < end_date:
+        yield day, end_date, rates.price_per_night
+
+
+@lru_cache(maxsize=settings.PRICE_CACHE_SIZE)
+def stay_price(rates, start_date, end_date) -> Decimal:
+    """
+    Returns the price of the nights of a stay in a cabin.
+    """
+    total = Decimal(0)
+    for run_start, run_end, price in runs(rates, start_date, end_date):
+        weekend = weekend_nights(run_start, run_end)
+        weekdays = (run_end - run_start).days - weekend
+        total += price * weekdays + price * rates.weekend_multiplier * weekend
+    return total.quantize(CENT)
+
+
+def services_price(service_prices) -> Decimal:
+    """
+    Returns the price of the services of a stay, every service is charged once.
+    """
+    return sum((to_decimal(price) for price in service_prices), Decimal("0.00")).quantize(CENT)
+
+
+def check_stay(rates, start_date, end_date) -> str:
+    """
+    Checks the length of a stay against the booking rules.
+    :return: error message, or None if the stay can be booked
+    """
+    nights = (end_date - start_date).days
+    if nights < 1:
+        return "Check-out must be after check-in."
+    if nights > settings.RESERVATION_MAX_NIGHTS:
+        return f"Reservation cannot be longer than {settings.RESERVATION_MAX_NIGHTS} nights."
+    if nights < rates.min_stay(start_date):
+        return f"Reservation must be at least {rates.min_stay(start_date)} nights long."
+    return None
+
+
+def quote(items) -> list:
+    """
+    Prices many stays at once without booking them.
+    :param items: dicts with cabin id, check_in and check_out dates and optional list of service ids
+    :return: one dict per item in the same order, with the prices or an error message
+    """
+    rates = load_rates(Cabin.objects.filter(pk__in={item["cabin"] for item in items}).only("area", "price_per_night"))
+    service_prices = dict(
+        Service.objects.filter(pk__in={service for item in items for service in item.get("services", [])}).values_list(
+            "pk", "service_price"
+        )
+    )
+
+    quotes = []
+    for item in items:
+        services = set(item.get("services", []))
+        result = {"cabin": item["cabin"], "check_in": item["check_in"], "check_out": item["check_out"]}
+        if item["cabin"] not in rates:
+            result["error"] = f"Cabin {item['cabin']} does not exist."
+        elif services - service_prices.keys():
+            result["error"] = f"Service {min(services - service_prices.keys())} does not exist."
+        elif error := check_stay(rates[item["cabin"]], item["check_in"], item["check_out"]):
+            result["error"] = error
+        else:
+            result["nights"] = (item["check_out"] - item["check_in"]).days
+            result["cabin_price"] = stay_price(rates[item["cabin"]], item["check_in"], item["check_out"])
+            result["services_price"] = services_price(service_prices[service] for service in services)
+            result["total_price"] = result["cabin_price"] + result["services_price"]
+        quotes.append(result)
+    return quotes
@@ -0,0 +1,145 @@
+"""
+Revenue rollup per area and month.
+
+Every invoice that is not canceled counts the cabin and services price of its reservation as paid or unpaid
+revenue of the cabin's area in the month the stay starts. When an invoice or reservation changes, only the
+difference between what it counted before and after is added to the rollup rows, so reports read a few rows
+instead of adding up every invoice. When a cabin is moved to another area, the revenue of all its invoices is
+moved along with it.
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+
+from cabins.models import Cabin
+from .models import Invoice, Reservation, Revenue
+
+COLUMNS = ["cabin_paid", "services_paid", "cabin_unpaid", "services_unpaid"]
+AMOUNT = DecimalField(max_digits=12, decimal_places=2)
+
+
+def month_of(day) -> date:
+    return date(day.year, day.month, 1)
+
+
+class Changes:
+    """
+    Differences to the rollup rows, collected per area and month.
+    """
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: defaultdict(Decimal))
+
+    def add(self, area_id, start_date, cabin_price, services_price, paid, sign=1):
+        row = self.rows[area_id, month_of(start_date)]
+        row["cabin_paid" if paid else "cabin_unpaid"] += sign * cabin_price
+        row["services_paid" if paid else "services_unpaid"] += sign * services_price
+
+    def apply(self):
+        """
+        Writes the differences with one insert of the missing rows and one update of all the changed rows.
+        """
+        rows = {key: columns for key, columns in self.rows.items() if any(columns.values())}
+        if not rows:
+            return
+        cells = {key: Q(area_id=key[0], month=key[1]) for key in rows}
+        updates = {}
+        for column in COLUMNS:
+            amounts = [
+                When(cells[key], then=Value(columns[column])) for key, columns in rows.items() if columns[column]
+            ]
+            if amounts:
+                updates[column] = F(column) + Case(*amounts, default=Value(Decimal(0)), output_field=AMOUNT)
+        with transaction.atomic():
+            Revenue.objects.bulk_create(
+                [Revenue(area_id=area_id, month=month) for area_id, month in rows], ignore_conflicts=True
+            )
+            Revenue.objects.filter(reduce(or_, cells.values())).update(**updates)
+
+
+def invoice_changed(old, new):
+    """
+    Moves the revenue of an invoice after it was created, paid, canceled or deleted.
+    :param old: revenue_state of the invoice before the change, None if it was not counted
+    :param new: revenue_state of the invoice after the change, None if it is not counted anymore
+    """
+    if old == new:
+        return
+    stays = {
+        pk: stay
+        for pk, *stay in Reservation.objects.active()
+        .filter(pk__in={state[0] for state in (old, new) if state})
+        .values_list("pk", "cabin__area_id", "start_date", "cabin_price", "services_price")
+    }
+    changes = Changes()
+    for sign, state in ((-1, old), (1, new)):
+        if state and state[0] in stays:
+            reservation_id, paid = state
+            changes.add(*stays[reservation_id], paid, sign=sign)
+    changes.apply()
+
+
+def reservation_changed(reservation_id, old, new):
+    """
+    Moves the revenue of the invoices of a reservation after its cabin, dates or prices changed or it was canceled.
+    :param old: revenue_state of the reservation before the change, None if it was not counted
+    :param new: revenue_state of the reservation after the change, None if it is not counted anymore
+    """
+    if old == new:
+        return
+    invoices = list(
+        Invoice.objects.filter(reservation_id=reservation_id, canceled_at__isnull=True).values_list(
+            "paid_at", flat=True
+        )
+    )
+    if not invoices:
+        return
+    areas = dict(Cabin.objects.filter(pk__in={state[0] for state in (old, new) if state}).values_list("pk", "area_id"))
+    changes = Changes()
+    for paid_at in invoices:
+        for sign, state in ((-1, old), (1, new)):
+            if state:
+                cabin_id, start_date, cabin_price, services_price = state
+                changes.add(areas[cabin_id], start_date, cabin_price, services_price, paid_at is not None, sign=sign)
+    changes.apply()
+
+
+def cabin_moved(cabin_id, old_area_id, new_area_id):
+    """
+    Moves the revenue of the invoices of a cabin after the cabin was moved to another area.
+    """
+    if old_area_id == new_area_id:
+        return
+    changes = Changes()
+    for row in aggregate(Invoice.objects.filter(reservation__cabin_id=cabin_id)):
+        for area_id, sign in ((old_area_id, -1), (new_area_id, 1)):
+            cells = changes.rows[area_id, row["month"]]
+            for column in COLUMNS:
+                cells[column] += sign * row[column]
+    changes.apply()
+
+
+def aggregate(invoices) -> list:
+    """
+    Sums the revenue of the given invoices per area and month with one GROUP BY query.
+    :return: list of dicts with area, month and the revenue columns
+    """
+    paid = Q(paid_at__isnull=False)
+    return list(
+        invoices.filter(canceled_at__isnull=True, reservation__canceled_at__isnull=True)
+        .values(area=F("reservation__cabin__area_id"), month=TruncMonth("reservation__start_date"))
+        .annotate(
+            cabin_paid=Sum("reservation__cabin_price", filter=paid, default=0),
+            services_paid=Sum("reservation__services_price", filter=paid, default=0),
+            cabin_unpaid=Sum("reservation__cabin_price", filter=~paid, default=0),
+            services_unpaid=Sum("reservation__services_price", filter=~paid, default=0),
+        )
+        .order_by()
+    )
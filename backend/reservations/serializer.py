@@ -1,8 +1,9 @@
 from datetime import datetime
 
+from django.urls import reverse
 from rest_framework import serializers
 
-from .models import Reservation, Invoice
+from .models import Reservation, Invoice, Revenue
 
 
 class ReservationSerializer(serializers.ModelSerializer):
@@ -10,7 +11,7 @@ class ReservationSerializer(serializers.ModelSerializer):
     Serializer for the Cabin model.
     """
 
-    price = serializers.SerializerMethodField(method_name="get_price")
+    price = serializers.ReadOnlyField(source="total_price")
 
     class Meta:
         model = Reservation
@@ -65,8 +66,35 @@ class ReservationSerializer(serializers.ModelSerializer):
 
             return instance
 
-    def get_price(self, obj):
-        return obj.get_total_price()
+
+class BatchReservationSerializer(serializers.Serializer):
+    """
+    Serializer for one reservation of a batch booking. Related objects are given by id and are loaded
+    for the whole batch at once in reservations.booking.book_many.
+    """
+
+    cabin = serializers.IntegerField()
+    customer = serializers.IntegerField()
+    owner = serializers.IntegerField()
+    services = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+
+class QuoteSerializer(serializers.Serializer):
+    """
+    Serializer for a price quote of a stay, see reservations.pricing.quote.
+    """
+
+    cabin = serializers.IntegerField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    services = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, write_only=True)
+    nights = serializers.IntegerField(read_only=True)
+    cabin_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    services_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    error = serializers.CharField(read_only=True)
 
 
 class InvoiceSerializer(serializers.ModelSerializer):
@@ -77,7 +105,7 @@ class InvoiceSerializer(serializers.ModelSerializer):
     customer = serializers.CharField(source="reservation.customer.username")
     reservation_id = serializers.CharField(source="reservation.id")
     reservation_cabin_area = serializers.CharField(source="reservation.cabin.area.area")
-    pdf = serializers.SerializerMethodField(method_name="get_invoice")
+    pdf = serializers.SerializerMethodField(method_name="get_pdf_url")
 
     class Meta:
         model = Invoice
@@ -130,5 +158,19 @@ class InvoiceSerializer(serializers.ModelSerializer):
 
             return instance
 
-    def get_invoice(self, obj):
-        return obj.get_invoice()
+    def get_pdf_url(self, obj):
+        # The PDF itself is generated in the background and downloaded separately, see get_invoice_pdf
+        return f"{reverse('get_invoice_pdf')}?invoice={obj.pk}"
+
+
+class RevenueSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Revenue model.
+    """
+
+    month = serializers.DateField(format="%Y-%m")
+    total = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Revenue
+        fields = ["area", "month", "cabin_paid", "services_paid", "cabin_unpaid", "services_unpaid", "total"]
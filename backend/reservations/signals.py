@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from cabins.models import Cabin
+from users.models import User
+from . import availability, pdf, revenue
+from .models import Invoice, Reservation
+
+
+@receiver(post_save, sender=Reservation)
+def update_calendar_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Updates the availability calendar when a reservation is created, moved or canceled.
+    """
+    if raw or instance.saved_stay == instance.stay:
+        return
+    for stay in {instance.saved_stay, instance.stay} - {None}:
+        availability.refresh(*stay)
+
+
+@receiver(post_delete, sender=Reservation)
+def update_calendar_on_delete(sender, instance, **kwargs):
+    """
+    Frees the nights of a deleted reservation in the availability calendar.
+    """
+    for stay in {instance.saved_stay, instance.stay} - {None}:
+        availability.refresh(*stay)
+
+
+@receiver(m2m_changed, sender=Reservation.services.through)
+def update_services_price(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recomputes the services price of reservations whose services were added or removed.
+    """
+    if action == "pre_clear" and reverse:
+        # Remember the reservations of a service before its links are cleared
+        instance.cleared_reservations = list(instance.reservation_set.values_list("pk", flat=True))
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        instance.update_services_price()
+        return
+    if action == "post_clear":
+        pk_set = instance.cleared_reservations
+    for reservation in Reservation.objects.filter(pk__in=pk_set):
+        reservation.update_services_price()
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_save, sender=Cabin)
+@receiver(post_save, sender=User)
+def touch_invoices(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    Bumps updated_at of the invoices that show the saved object, so their cached renderings and listing ETags are
+    not used anymore. Changes of the services of a reservation save the reservation and are covered too.
+    Invoices render the names and prices fixed on their reservation, see Reservation.calculate_prices, so of a cabin
+    or user only the area or username shows, in the invoice listing. Saves of their other fields only are skipped.
+    """
+    if raw or created:
+        return
+    lookup, shown = {
+        Reservation: ("reservation", None),
+        Cabin: ("reservation__cabin", {"area", "area_id"}),
+        User: ("reservation__customer", {"username"}),
+    }[sender]
+    if shown and update_fields is not None and not shown.intersection(update_fields):
+        return
+    Invoice.objects.filter(**{lookup: instance}).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Invoice)
+def delete_invoice_pdfs(sender, instance, **kwargs):
+    """
+    Deletes the stored PDFs of a deleted invoice once the deletion commits.
+    """
+    invoice_id = instance.pk
+    transaction.on_commit(lambda: pdf.delete_pdfs(settings.INVOICE_PDF_DIR, invoice_id))
+
+
+@receiver(post_save, sender=Invoice)
+def update_revenue_on_invoice_save(sender, instance, raw=False, **kwargs):
+    """
+    Updates the revenue rollup when an invoice is created, paid or canceled.
+    """
+    if not raw:
+        revenue.invoice_changed(instance.saved_revenue, instance.revenue_state)
+
+
+@receiver(post_delete, sender=Invoice)
+def update_revenue_on_invoice_delete(sender, instance, **kwargs):
+    """
+    Removes the revenue of a deleted invoice from the rollup.
+    """
+    revenue.invoice_changed(instance.saved_revenue, None)
+
+
+@receiver(post_save, sender=Reservation)
+def update_revenue_on_reservation_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Moves the revenue of the invoices of a reservation when its cabin, dates or prices change or it is canceled.
+    A new reservation has no invoices yet.
+    """
+    if not raw and not created:
+        revenue.reservation_changed(instance.pk, instance.saved_revenue, instance.revenue_state)
+
+
+@receiver(pre_save, sender=Cabin)
+def remember_cabin_area(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Reads the stored area of a cabin before a save that may move it to another area.
+    """
+    if raw or instance._state.adding or (update_fields is not None and not {"area", "area_id"} & set(update_fields)):
+        return
+    instance.saved_area_id = Cabin.objects.filter(pk=instance.pk).values_list("area_id", flat=True).first()
+
+
+@receiver(post_save, sender=Cabin)
+def update_revenue_on_cabin_save(sender, instance, raw=False, **kwargs):
+    """
+    Moves the revenue of the invoices of a cabin that was moved to another area.
+    """
+    saved_area_id = instance.__dict__.pop("saved_area_id", None)
+    if not raw and saved_area_id is not None:
+        revenue.cabin_moved(instance.pk, saved_area_id, instance.area_id)
@@ -0,0 +1,19 @@
+"""
+Helpers for the tests of the apps that generate invoice PDFs.
+"""
+
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+
+def use_temporary_pdf_dir(test):
+    """
+    Stores the invoice PDFs generated during a test in a temporary directory, which is deleted after the test.
+    """
+    pdf_dir = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, pdf_dir, ignore_errors=True)
+    pdf_settings = override_settings(INVOICE_PDF_DIR=pdf_dir)
+    pdf_settings.enable()
+    test.addCleanup(pdf_settings.disable)
@@ -1,15 +1,21 @@
-from datetime import date, timedelta
-from io import BytesIO
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
-from reportlab.pdfgen import canvas
 
-from cabins.models import Cabin, Area, PostCode
+from cabins.models import Cabin, Area, PostCode, RatePlan, Season
 from services.models import Service
 from users.models import User
-from .models import Reservation, Invoice
-
+from . import pdf
+from .availability import AvailabilityCalendar
+from .models import Reservation, Invoice, CabinCalendar, Revenue
+from .revenue import aggregate
+from .testing import use_temporary_pdf_dir
 
 # Create your tests here.
 
@@ -79,6 +85,134 @@ class TestReservation(TestCase):
             new_reservation.clean()
         self.assertDictEqual({"__all__": ["Reservation overlaps with an existing booking."]}, cm.exception.message_dict)
 
+    def test_overlap_is_scoped_to_cabin(self):
+        """
+        Tests that bookings of other cabins and canceled bookings do not block a reservation.
+        """
+        other_cabin = Cabin.objects.create(
+            name="Other Cabin",
+            description="Other Cabin",
+            price_per_night=100,
+            area=self.area,
+            zip_code=self.post,
+            num_of_beds=2,
+        )
+        start_date = date.today() + timedelta(days=7)
+        end_date = date.today() + timedelta(days=10)
+        Reservation.objects.create(
+            cabin=other_cabin, customer=self.customer, owner=self.owner, start_date=start_date, end_date=end_date
+        )
+        Reservation.objects.create(
+            cabin=self.cabin,
+            customer=self.customer,
+            owner=self.owner,
+            start_date=start_date,
+            end_date=end_date,
+            canceled_at=datetime.now(tz=timezone.utc),
+        )
+        new_reservation = Reservation(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date=start_date, end_date=end_date
+        )
+        new_reservation.clean()
+        self.assertTrue(Reservation.is_cabin_available(self.cabin, start_date, end_date))
+
+    def test_back_to_back_reservations_do_not_overlap(self):
+        start_date = date.today() + timedelta(days=7)
+        end_date = date.today() + timedelta(days=10)
+        Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date=start_date, end_date=end_date
+        )
+        new_reservation = Reservation(
+            cabin=self.cabin,
+            customer=self.customer,
+            owner=self.owner,
+            start_date=end_date,
+            end_date=end_date + timedelta(days=2),
+        )
+        new_reservation.clean()
+        self.assertFalse(Reservation.is_cabin_available(self.cabin, end_date - timedelta(days=1), end_date))
+
+    def test_overlap_check_with_iso_dates(self):
+        """
+        Tests that reservations with dates given as ISO strings are checked for overlaps.
+        """
+        Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2030-01-01", end_date="2030-01-05"
+        )
+        reservation = Reservation(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2030-01-05", end_date="2030-01-07"
+        )
+        reservation.clean()
+        reservation.save()
+        reservation.start_date = "2030-01-04"
+        with self.assertRaises(ValidationError):
+            reservation.clean()
+
+    def test_reservation_longer_than_max_nights(self):
+        start_date = date.today()
+        reservation = Reservation(
+            cabin=self.cabin,
+            customer=self.customer,
+            owner=self.owner,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=settings.RESERVATION_MAX_NIGHTS + 1),
+        )
+        with self.assertRaises(ValidationError):
+            reservation.clean()
+
+    def test_seasonal_and_weekend_prices(self):
+        """
+        Tests that stays are priced by the seasons and weekend multiplier of the rate plan.
+        """
+        plan = RatePlan.objects.create(area=self.area, weekend_multiplier=Decimal("1.5"))
+        season = Season.objects.create(
+            rate_plan=plan, start_date=date(2024, 7, 1), end_date=date(2024, 8, 1), price_per_night=150, min_nights=3
+        )
+
+        # Thursday to Monday in the season: two weekday and two weekend nights
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-07-04", end_date="2024-07-08"
+        )
+        self.assertEqual(reservation.get_total_cabin_price(), Decimal("750.00"))
+
+        # Saturday to Tuesday across the start of the season
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-06-29", end_date="2024-07-02"
+        )
+        self.assertEqual(reservation.get_total_cabin_price(), Decimal("400.00"))
+
+        reservation = Reservation(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-07-10", end_date="2024-07-12"
+        )
+        with self.assertRaises(ValidationError):
+            reservation.clean()
+
+        # A changed season is priced again, and a cabin's own plan comes before the plan of its area
+        season.price_per_night = 200
+        season.save()
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-07-15", end_date="2024-07-17"
+        )
+        self.assertEqual(reservation.get_total_cabin_price(), Decimal("400.00"))
+        RatePlan.objects.create(cabin=self.cabin)
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-07-22", end_date="2024-07-24"
+        )
+        self.assertEqual(reservation.get_total_cabin_price(), Decimal("200.00"))
+
+    def test_rate_plan_versions_are_not_reused(self):
+        """
+        Tests that concurrent edits of a rate plan store different versions.
+        """
+        plan = RatePlan.objects.create(area=self.area)
+        first, second = RatePlan.objects.get(pk=plan.pk), RatePlan.objects.get(pk=plan.pk)
+        first.weekend_multiplier = Decimal("1.5")
+        first.save()
+        second.min_nights = 2
+        second.save(update_fields=["min_nights"])
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual(RatePlan.objects.get(pk=plan.pk).version, 3)
+
     def test_is_cabin_available(self):
         # Is the cabin available for the date range that doesn't
         # overlap with the existing reservation.
@@ -173,9 +307,80 @@ class TestReservation(TestCase):
         )
         self.assertEqual(self.reservation.get_total_price(), expected_price)
 
+    def test_prices_are_fixed_at_booking(self):
+        """
+        Tests that later price changes of the cabin and services do not change the prices of a reservation.
+        """
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2021-01-01", end_date="2021-01-03"
+        )
+        reservation.services.add(self.services[0])
+
+        self.cabin.price_per_night = 500
+        self.cabin.save()
+        self.services[0].service_price = 50
+        self.services[0].save()
+
+        reservation = Reservation.objects.get(pk=reservation.pk)
+        reservation.accepted_at = datetime.now(tz=timezone.utc)
+        reservation.save()
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.get_total_cabin_price(), 200)
+        self.assertEqual(reservation.get_total_services_price(), 10)
+        self.assertEqual(reservation.get_total_price(), 210)
+
+    def test_prices_are_recomputed_on_change(self):
+        """
+        Tests that the prices are recomputed when the dates, cabin or services of a reservation change.
+        """
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2021-01-01", end_date="2021-01-03"
+        )
+        self.assertEqual(reservation.price_version, 1)
+
+        reservation.services.add(*self.services)
+        self.assertEqual(reservation.get_total_price(), 230)
+        self.assertEqual(reservation.price_version, 2)
+
+        self.services[1].reservation_set.remove(reservation)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.get_total_services_price(), 10)
+
+        reservation.end_date = date(2021, 1, 4)
+        reservation.save()
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.get_total_cabin_price(), 300)
+        self.assertEqual(reservation.get_total_price(), 310)
+
+        reservation.services.clear()
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.get_total_price(), 300)
+        self.assertEqual(reservation.price_version, 5)
+
+    def test_deferred_prices_are_kept(self):
+        """
+        Tests that saving a reservation loaded with only some of its fields does not recompute its prices.
+        """
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2021-01-01", end_date="2021-01-03"
+        )
+        self.cabin.price_per_night = 500
+        self.cabin.save()
+
+        for reservation in [
+            Reservation.objects.only("accepted_at").get(pk=reservation.pk),
+            Reservation.objects.defer("cabin_price", "total_price", "canceled_at").get(pk=reservation.pk),
+        ]:
+            reservation.accepted_at = datetime.now(tz=timezone.utc)
+            reservation.save()
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.get_total_price(), 200)
+        self.assertEqual(reservation.price_version, 1)
+
 
 class TestInvoice(TestCase):
     def setUp(self) -> None:
+        use_temporary_pdf_dir(self)
         self.area = Area.objects.create(area="Helsinki")
         self.post = PostCode.objects.create(p_code="10110", postal_district="Helsinki")
         self.cabin = Cabin.objects.create(
@@ -220,29 +425,274 @@ class TestInvoice(TestCase):
         )
         invoice = Invoice.objects.create(reservation=reservation)
 
-        # generate the invoice PDF
-        response = invoice.get_invoice()
+        # generate the invoice PDF in the background
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        path = pdf.pdf_path(invoice.pk, text)
+        self.assertFalse(path.exists())
+        pdf.generate(invoice.pk, text).result(timeout=60)
+
+        # Validate the PDF content
+        self.assertTrue(path.read_bytes().startswith(b"%PDF"))
+        self.assertIsNone(pdf.generate(invoice.pk, text))
+
+        # A changed invoice replaces its PDF, and a deleted one takes it along
+        reservation.services.add(self.services[0])
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        pdf.generate(invoice.pk, text).result(timeout=60)
+        self.assertEqual(list(path.parent.glob("*.pdf")), [pdf.pdf_path(invoice.pk, text)])
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice.delete()
+        self.assertEqual(list(path.parent.glob("*.pdf")), [])
+
+    def test_rendered_invoice_is_cached(self):
+        """
+        Tests that invoices are only rendered again after something they show has changed.
+        """
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2021-01-01", end_date="2021-01-03"
+        )
+        invoice = Invoice.objects.create(reservation=reservation)
+        invoice = Invoice.objects.select_related("reservation__cabin", "reservation__customer").get(pk=invoice.pk)
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        self.assertIn("Total price: 200.00", text)
 
-        # Check the response status code
-        self.assertEqual(response.status_code, 200)
+        invoice = Invoice.objects.select_related("reservation__cabin", "reservation__customer").get(pk=invoice.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(Invoice.render_invoices([invoice])[invoice.pk], text)
 
-        # Check response content type
-        self.assertEqual(response["Content-Type"], "application/pdf")
+        reservation.services.add(self.services[0])
+        invoice = Invoice.objects.select_related("reservation__cabin", "reservation__customer").get(pk=invoice.pk)
+        self.assertIn("Sauna: 10", Invoice.render_invoices([invoice])[invoice.pk])
 
-        # Check the response file name
-        self.assertEqual(response["Content-Disposition"], 'attachment; filename="invoice.pdf"')
+        text = Invoice.render_invoices([invoice])[invoice.pk]
 
-        # Validate the PDF content
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer)
+        # The names are fixed with the prices, renaming the cabin or customer does not change an issued invoice
+        self.cabin.name = "Renamed Cabin"
+        self.cabin.save()
+        self.customer.first_name = "John"
+        self.customer.save(update_fields=["first_name"])
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(Invoice.render_invoices([invoice])[invoice.pk], text)
+        self.assertIn("Cabin: Test Cabin", text)
+
+        # Until the stay is priced again
+        reservation.end_date = date(2021, 1, 4)
+        reservation.save()
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        self.assertIn("Reservation for John :", text)
+        self.assertIn("Cabin: Renamed Cabin", text)
+
+    def test_issued_invoices_keep_names_and_prices(self):
+        """
+        Tests that renaming the cabin, customer or services of a reservation does not change its issued invoices,
+        they are invoices for what was booked. Only the username of the customer shows live, in the listing.
+        """
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2021-01-01", end_date="2021-01-03"
+        )
+        reservation.services.add(self.services[0])
+        invoice = Invoice.objects.create(reservation=reservation)
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        updated_at = invoice.updated_at
+
+        self.cabin.name = "Renamed Cabin"
+        self.cabin.save(update_fields=["name"])
+        self.customer.first_name = "John"
+        self.customer.last_name = "Doe"
+        self.customer.save(update_fields=["first_name", "last_name"])
+        self.services[0].name = "Smoke Sauna"
+        self.services[0].service_price = 25
+        self.services[0].save()
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        self.assertEqual(invoice.updated_at, updated_at)
+        self.assertEqual(invoice.get_invoice_text(), text)
+        self.assertIn("Cabin: Test Cabin\n", text)
+        self.assertIn("Sauna: 10.00\n", text)
+
+        # A full save may have changed what the listing shows, the rendering stays the same
+        self.cabin.save()
+        invoice = Invoice.objects.select_related("reservation").get(pk=invoice.pk)
+        self.assertEqual(invoice.get_invoice_text(), text)
+
+        self.customer.username = "JohnDoe"
+        self.customer.save(update_fields=["username"])
+        self.assertGreater(Invoice.objects.get(pk=invoice.pk).updated_at, updated_at)
+
+    def test_invoice_lines_add_up_to_total(self):
+        """
+        Tests that the services of an invoice are listed at the prices they were booked at.
+        """
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2021-01-01", end_date="2021-01-03"
+        )
+        reservation.services.add(*self.services)
+        invoice = Invoice.objects.create(reservation=reservation)
+        self.services[0].service_price = 15
+        self.services[0].save()
+        self.services[1].name = "Jacuzzi"
+        self.services[1].save()
+
+        invoice = Invoice.objects.select_related("reservation__cabin", "reservation__customer").get(pk=invoice.pk)
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        self.assertIn("Sauna: 10.00\nHot Tub: 20.00\nTotal price for services: 30.00\n", text)
+        self.assertIn("Total price: 230.00", text)
+        self.assertEqual(sum(price for _, price in invoice.reservation.get_services()), invoice.total_price - 200)
+
+    def assertRevenue(self, expected):
+        """
+        Checks the revenue rollup against the expected rows and against a rebuild from the invoices.
+        """
+        rows = {
+            (row.area_id, row.month): [row.cabin_paid, row.services_paid, row.cabin_unpaid, row.services_unpaid]
+            for row in Revenue.objects.all()
+            if row.total
+        }
+        self.assertEqual(rows, expected)
+        rebuilt = {(row.pop("area"), row.pop("month")): list(row.values()) for row in aggregate(Invoice.objects.all())}
+        self.assertEqual(rows, rebuilt)
+
+    def test_revenue_rollup_follows_changes(self):
+        """
+        Tests that the revenue rollup is updated when invoices and reservations change.
+        """
+        july, august = date(2024, 7, 1), date(2024, 8, 1)
+        reservation = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-07-01", end_date="2024-07-03"
+        )
+        invoice = Invoice.objects.create(reservation=reservation)
+        self.assertRevenue({("Helsinki", july): [0, 0, 200, 0]})
+
+        reservation.services.add(self.services[0])
+        self.assertRevenue({("Helsinki", july): [0, 0, 200, 10]})
+
+        invoice.paid_at = datetime.now(timezone.utc)
+        invoice.save()
+        self.assertRevenue({("Helsinki", july): [200, 10, 0, 0]})
+
+        other_area = Area.objects.create(area="Oulu")
+        other_cabin = Cabin.objects.create(
+            name="Other Cabin", description="", price_per_night=50, area=other_area, zip_code=self.post, num_of_beds=2
+        )
+        reservation.cabin = other_cabin
+        reservation.start_date = date(2024, 8, 1)
+        reservation.end_date = date(2024, 8, 2)
+        reservation.save()
+        self.assertRevenue({("Oulu", august): [50, 10, 0, 0]})
+
+        # Moving the cabin to another area moves its revenue along
+        other_cabin.area = self.area
+        other_cabin.save()
+        self.assertRevenue({("Helsinki", august): [50, 10, 0, 0]})
+
+        reservation.canceled_at = datetime.now(timezone.utc)
+        reservation.save()
+        self.assertRevenue({})
+
+        second = Reservation.objects.create(
+            cabin=self.cabin, customer=self.customer, owner=self.owner, start_date="2024-07-10", end_date="2024-07-11"
+        )
+        Invoice.objects.create(reservation=second)
+        self.assertRevenue({("Helsinki", july): [0, 0, 100, 0]})
+        second.delete()
+        self.assertRevenue({})
+
+        call_command("rebuild_revenue", stdout=StringIO())
+        self.assertFalse(Revenue.objects.exists())
+
+
+class TestAvailabilityCalendar(TestCase):
+    def setUp(self) -> None:
+        self.area = Area.objects.create(area="Helsinki")
+        self.post = PostCode.objects.create(p_code="10110", postal_district="Helsinki")
+        self.cabins = [
+            Cabin.objects.create(
+                name=f"Test Cabin {i}",
+                description="Test Cabin",
+                price_per_night=100,
+                area=self.area,
+                zip_code=self.post,
+                num_of_beds=4,
+            )
+            for i in range(2)
+        ]
+        self.customer = User.objects.create_user(username="JohnD", email="johndoe.example.com", password="password")
+
+    def book(self, cabin, start_date, end_date) -> Reservation:
+        return Reservation.objects.create(
+            cabin=cabin, customer=self.customer, owner=self.customer, start_date=start_date, end_date=end_date
+        )
+
+    def booked_nights(self, cabin, start_date=date(2024, 6, 1), end_date=date(2024, 8, 1)) -> list:
+        calendar = AvailabilityCalendar([cabin.id], start_date, end_date)
+        free = set(calendar.common_free_nights())
+        return [
+            start_date + timedelta(days=n)
+            for n in range((end_date - start_date).days)
+            if start_date + timedelta(days=n) not in free
+        ]
+
+    def test_calendar_follows_reservation_changes(self):
+        """
+        Tests that the calendar is updated when a reservation is created, moved, canceled and deleted.
+        """
+        reservation = self.book(self.cabins[0], "2024-07-01", "2024-07-03")
+        self.assertEqual(self.booked_nights(self.cabins[0]), [date(2024, 7, 1), date(2024, 7, 2)])
+
+        reservation.start_date = date(2024, 7, 10)
+        reservation.end_date = date(2024, 7, 11)
+        reservation.save()
+        self.assertEqual(self.booked_nights(self.cabins[0]), [date(2024, 7, 10)])
+
+        reservation.canceled_at = datetime.now(tz=timezone.utc)
+        reservation.save()
+        self.assertEqual(self.booked_nights(self.cabins[0]), [])
+
+        reservation = self.book(self.cabins[0], date(2024, 7, 20), date(2024, 7, 21))
+        self.assertEqual(self.booked_nights(self.cabins[0]), [date(2024, 7, 20)])
+        Reservation.objects.get(pk=reservation.pk).delete()
+        self.assertEqual(self.booked_nights(self.cabins[0]), [])
+
+    def test_removing_reservation_keeps_overlapping_nights(self):
+        first = self.book(self.cabins[0], date(2024, 7, 1), date(2024, 7, 4))
+        self.book(self.cabins[0], date(2024, 7, 3), date(2024, 7, 5))
+        first.delete()
+        self.assertEqual(self.booked_nights(self.cabins[0]), [date(2024, 7, 3), date(2024, 7, 4)])
+
+    def test_stay_over_new_year(self):
+        self.book(self.cabins[0], date(2024, 12, 30), date(2025, 1, 2))
+        nights = self.booked_nights(self.cabins[0], date(2024, 12, 1), date(2025, 2, 1))
+        self.assertEqual(nights, [date(2024, 12, 30), date(2024, 12, 31), date(2025, 1, 1)])
+        self.assertEqual(CabinCalendar.objects.filter(cabin=self.cabins[0]).count(), 2)
+
+    def test_free_cabins_and_check_in_dates(self):
+        self.book(self.cabins[0], date(2024, 7, 3), date(2024, 7, 6))
+        self.book(self.cabins[1], date(2024, 7, 1), date(2024, 7, 2))
+        calendar = AvailabilityCalendar([cabin.id for cabin in self.cabins], date(2024, 7, 1), date(2024, 7, 10))
+
+        self.assertEqual(calendar.free_cabins(date(2024, 7, 2), date(2024, 7, 3)), [cabin.id for cabin in self.cabins])
+        self.assertEqual(calendar.free_cabins(date(2024, 7, 1), date(2024, 7, 4)), [])
+        self.assertTrue(calendar.is_free(self.cabins[0].id, date(2024, 7, 6), date(2024, 7, 10)))
+        self.assertEqual(
+            calendar.check_in_dates(self.cabins[0].id, 3),
+            [date(2024, 7, 6), date(2024, 7, 7)],
+        )
+        self.assertEqual(calendar.check_in_dates(self.cabins[1].id, 8), [date(2024, 7, 2)])
+        self.assertEqual(calendar.common_free_nights(), [date(2024, 7, 2)] + [date(2024, 7, d) for d in range(6, 10)])
 
-        # Check the PDF content
-        # self.assertEqual(p.getPageNumber(), 1)
+    def test_check_and_rebuild_commands(self):
+        self.book(self.cabins[0], date(2024, 7, 1), date(2024, 7, 4))
+        call_command("check_availability", stdout=StringIO())
 
-        p.showPage()
-        p.save()
-        buffer.seek(0)
+        # Queryset updates bypass the signals and leave the calendar stale
+        Reservation.objects.update(start_date=date(2024, 7, 2))
+        with self.assertRaises(CommandError):
+            call_command("check_availability", stdout=StringIO())
 
-        pdf_content = buffer.getvalue()
-        self.assertGreater(len(pdf_content), 0)
-        buffer.close()
+        call_command("rebuild_availability", stdout=StringIO())
+        call_command("check_availability", stdout=StringIO())
+        self.assertEqual(self.booked_nights(self.cabins[0]), [date(2024, 7, 2), date(2024, 7, 3)])
@@ -1,15 +1,23 @@
 from django.urls import path
 
-from .views import create_invoice, get_invoices, update_invoice, delete_invoice
-from .views import create_reservation, get_reservations, update_reservation, delete_reservation
+from .views import create_invoice, get_invoices, get_invoice_pdf, update_invoice, delete_invoice
+from .views import create_reservation, create_reservations, get_reservations, update_reservation, delete_reservation
+from .views import get_availability, export_reservations, export_invoices, get_revenue, get_quotes
 
 urlpatterns = [
     path("create", create_reservation, name="create_reservation"),
+    path("create/batch", create_reservations, name="create_reservations"),
     path("", get_reservations, name="get_reservations"),
     path("update", update_reservation, name="update_reservation"),
     path("delete", delete_reservation, name="delete_reservation"),
+    path("export", export_reservations, name="export_reservations"),
+    path("quote", get_quotes, name="get_quotes"),
+    path("availability", get_availability, name="get_availability"),
+    path("revenue", get_revenue, name="get_revenue"),
     path("invoice/create", create_invoice, name="create_invoice"),
     path("invoice", get_invoices, name="get_invoices"),
+    path("invoice/export", export_invoices, name="export_invoices"),
+    path("invoice/pdf", get_invoice_pdf, name="get_invoice_pdf"),
     path("invoice/update", update_invoice, name="update_invoice"),
     path("invoice/delete", delete_invoice, name="delete_invoice"),
 ]
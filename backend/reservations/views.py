@@ -1,64 +1,69 @@
-import jwt
-from django.http import Http404
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponseNotModified
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError, AuthenticationFailed
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from conf.settings import JWT_SECRET
-from reservations.models import Reservation, Invoice
-from reservations.serializer import ReservationSerializer, InvoiceSerializer
-from users.models import User
+from api.conditional import Version
+from cabins.models import Cabin
+from reservations import pdf, pricing
+from reservations.availability import AvailabilityCalendar
+from reservations.booking import book, book_many, save_reservation
+from reservations.export import INVOICE_FIELDS, RESERVATION_FIELDS, export
+from reservations.models import Reservation, Invoice, Revenue
+from reservations.pagination import paginate
+from reservations.serializer import ReservationSerializer, InvoiceSerializer, BatchReservationSerializer
+from reservations.serializer import QuoteSerializer, RevenueSerializer
+from users.permissions import IsStaff, IsUser
 
 """
 RESERVATIONS API ENDPOINTS
 """
 
 
-def get_token(request):
-    auth_header = request.headers.get("Authorization")
-    if auth_header:
-        auth_parts = auth_header.split(" ")
-        if len(auth_parts) > 1:
-            return auth_parts[1]
-    return None
-
-
-def auth(token):
-    if not token:
-        raise AuthenticationFailed("Unauthenticated: no token provided!")
-
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-    except jwt.DecodeError:
-        raise AuthenticationFailed("Unauthenticated: token invalid!")
-    except jwt.ExpiredSignatureError:
-        raise AuthenticationFailed("Unauthenticated: token expired!")
-
-    return User.objects.filter(id=payload["id"]).first()
-
-
 @api_view(["POST"])
+@permission_classes([IsUser])
 def create_reservation(request):
     """
     Creates a new reservation.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
-        if not user:
-            raise AuthenticationFailed("Unauthenticated: no token provided!")
         serializer = ReservationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        book(serializer)
+
+        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        invoice = Invoice.objects.create(reservation=serializer.instance)
-        invoice.save()
 
+@api_view(["POST"])
+@permission_classes([IsUser])
+def create_reservations(request):
+    """
+    Creates many reservations and their invoices at once. Either all of them are booked or none.
+    :param request: POST request with a list of reservations
+    :return: JSON response with the booked reservations or the errors of the invalid ones by their index
+    """
+    try:
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError("Expected a non-empty list of reservations.")
+        if len(request.data) > settings.RESERVATION_BATCH_MAX_SIZE:
+            raise ValidationError(f"Cannot book more than {settings.RESERVATION_BATCH_MAX_SIZE} reservations at once.")
+        serializer = BatchReservationSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        reservations = book_many(serializer.validated_data)
+
+        reservations = Reservation.objects.filter(pk__in=[reservation.pk for reservation in reservations])
+        serializer = ReservationSerializer(reservations.prefetch_related("services").order_by("pk"), many=True)
         return Response({"result": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
-    except AuthenticationFailed as e:
-        return Response({"result": "error", "message": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
     except ValidationError as e:
         return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
@@ -66,25 +71,25 @@ def create_reservation(request):
 
 
 @api_view(["GET"])
+@permission_classes([IsUser])
 def get_reservations(request):
     """
-    Returns all reservations.
+    Returns reservations one page at a time, see reservations.pagination.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
+        user = request.user
         reservation_id = request.GET.get("reservation")
-        reservations = Reservation.objects.all()
+        # Prices are stored on the rows, only the services of every row need to be loaded up front
+        reservations = Reservation.objects.prefetch_related("services")
         if not user.is_staff:
             reservations = reservations.filter(customer=user)
         if reservation_id:
             reservations = reservations.filter(pk=reservation_id)
+        reservations, next_cursor = paginate(request, reservations)
         if not reservations:
             raise Http404
         serializer = ReservationSerializer(reservations, many=True)
-        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
-    except AuthenticationFailed as e:
-        return Response({"result": "error", "message": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({"result": "success", "data": serializer.data, "next": next_cursor}, status=status.HTTP_200_OK)
     except Http404:
         return Response({"result": "error", "message": "No reservations found"}, status=status.HTTP_404_NOT_FOUND)
     except ValidationError as e:
@@ -93,14 +98,34 @@ def get_reservations(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["GET"])
+@permission_classes([IsUser])
+def export_reservations(request):
+    """
+    Streams all reservations as NDJSON or CSV. Only staff can export all reservations, users export their own.
+    :param request: GET request with optional output format, ndjson (default) or csv
+    :return: streamed file or error message
+    """
+    try:
+        user = request.user
+        reservations = Reservation.objects.order_by("pk")
+        if not user.is_staff:
+            reservations = reservations.filter(customer=user)
+        return export(reservations, RESERVATION_FIELDS, request.GET.get("output", "ndjson"), "reservations")
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["PATCH"])
+@permission_classes([IsUser])
 def update_reservation(request):
     """
     Updates a reservation.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
+        user = request.user
 
         reservation_id = request.GET.get("reservation")
         reservation = get_object_or_404(Reservation, pk=reservation_id)
@@ -111,7 +136,8 @@ def update_reservation(request):
 
         serializer = ReservationSerializer(reservation, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            save_reservation(serializer)
 
         return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
     except AuthenticationFailed as e:
@@ -125,13 +151,13 @@ def update_reservation(request):
 
 
 @api_view(["DELETE"])
+@permission_classes([IsUser])
 def delete_reservation(request):
     """
     Deletes a reservation.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
+        user = request.user
         reservation_id = request.GET.get("reservation")
         if not reservation_id:
             raise ValidationError("Reservation ID is required")
@@ -153,32 +179,117 @@ def delete_reservation(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["POST"])
+def get_quotes(request):
+    """
+    Returns the prices of many stays without booking them. Stays that cannot be priced get an error message instead.
+    :param request: POST request with a list of stays with cabin, check_in, check_out and optional services
+    :return: JSON response with one quote per stay in the same order or error message
+    """
+    try:
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError("Expected a non-empty list of stays.")
+        if len(request.data) > settings.QUOTE_MAX_SIZE:
+            raise ValidationError(f"Cannot quote more than {settings.QUOTE_MAX_SIZE} stays at once.")
+        serializer = QuoteSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        quotes = pricing.quote(serializer.validated_data)
+        return Response(
+            {"result": "success", "data": QuoteSerializer(quotes, many=True).data}, status=status.HTTP_200_OK
+        )
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+def get_availability(request):
+    """
+    Returns the dates cabins can be checked in on for a stay of consecutive free nights within a period.
+    The answer is computed from the availability calendars in memory.
+    :param request: GET request with start and end of the period, optional nights (default 1), area and cabin ids
+    :return: JSON response with check-in dates per cabin or error message
+    """
+    try:
+        try:
+            start_date = date.fromisoformat(request.GET.get("start", ""))
+            end_date = date.fromisoformat(request.GET.get("end", ""))
+            nights = int(request.GET.get("nights", 1))
+        except ValueError:
+            raise ValidationError("start and end must be dates in YYYY-MM-DD format and nights a number.")
+        if not 0 < (end_date - start_date).days <= 366:
+            raise ValidationError("The period must be between one night and one year long.")
+
+        cabins = Cabin.objects.all()
+        if request.GET.get("area"):
+            cabins = cabins.filter(area=request.GET.get("area"))
+        if request.GET.getlist("cabin"):
+            cabins = cabins.filter(pk__in=request.GET.getlist("cabin"))
+
+        calendar = AvailabilityCalendar(cabins.values_list("id", flat=True), start_date, end_date)
+        data = []
+        for cabin_id in calendar.cabin_ids:
+            check_in_dates = calendar.check_in_dates(cabin_id, nights)
+            if check_in_dates:
+                data.append({"cabin": cabin_id, "check_in": check_in_dates})
+        if not data:
+            raise Http404
+        return Response({"result": "success", "data": data}, status=status.HTTP_200_OK)
+    except Http404:
+        return Response({"result": "error", "message": "No available cabins found"}, status=status.HTTP_404_NOT_FOUND)
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 """
 INVOICES API ENDPOINTS
 """
 
 
+@api_view(["GET"])
+@permission_classes([IsStaff])
+def get_revenue(request):
+    """
+    Returns the revenue per area and month, split into cabin and services and into paid and unpaid.
+    Read from the revenue rollup, see reservations.revenue. Only staff can view the revenue.
+    :param request: GET request with optional area and first and last month (YYYY-MM)
+    :return: JSON response with the revenue rows or error message
+    """
+    try:
+        rows = Revenue.objects.order_by("month", "area")
+        if request.GET.get("area"):
+            rows = rows.filter(area=request.GET.get("area"))
+        try:
+            if request.GET.get("start"):
+                rows = rows.filter(month__gte=date.fromisoformat(f"{request.GET.get('start')}-01"))
+            if request.GET.get("end"):
+                rows = rows.filter(month__lte=date.fromisoformat(f"{request.GET.get('end')}-01"))
+        except ValueError:
+            raise ValidationError("start and end must be months in YYYY-MM format.")
+        serializer = RevenueSerializer(rows, many=True)
+        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["POST"])
+@permission_classes([IsStaff])
 def create_invoice(request):
     """
     Creates a new invoice.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
-
-        # Only staff can manually create invoices
-        if not user.is_staff:
-            raise AuthenticationFailed(f"Unauthenticated!")
-
         serializer = InvoiceSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.create(serializer.validated_data)
         serializer.save()
         return Response({"result": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
 
-    except AuthenticationFailed as e:
-        return Response({"result": "error", "message": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
     except Http404:
         return Response({"result": "error", "message": "No invoices found"}, status=status.HTTP_404_NOT_FOUND)
     except ValidationError as e:
@@ -188,26 +299,33 @@ def create_invoice(request):
 
 
 @api_view(["GET"])
+@permission_classes([IsUser])
 def get_invoices(request):
     """
     Returns all invoices or a specific invoice. Only staff can view all invoices. Users can view their own invoices.
+    Invoices are returned one page at a time, see reservations.pagination. The response has an ETag of all the
+    invoices the pages are cut from and is 304 if the client has the current page.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
+        user = request.user
 
         reservation_id = request.GET.get("invoice")
-        invoices = Invoice.objects.all()
+        invoices = Invoice.objects.select_related("reservation__cabin__area", "reservation__customer")
         if not user.is_staff:
             invoices = invoices.filter(reservation_id__customer=user)
         if reservation_id:
             invoices = invoices.filter(pk=reservation_id)
+        version = Version.of(invoices)
+        not_modified = version.not_modified(request)
+        if not_modified:
+            return not_modified
+        invoices, next_cursor = paginate(request, invoices)
         if not invoices:
             raise Http404
         serializer = InvoiceSerializer(invoices, many=True)
-        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
-    except AuthenticationFailed as e:
-        return Response({"result": "error", "message": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+        return version.tag(
+            Response({"result": "success", "data": serializer.data, "next": next_cursor}, status=status.HTTP_200_OK)
+        )
     except Http404:
         return Response({"result": "error", "message": "No invoices found"}, status=status.HTTP_404_NOT_FOUND)
     except ValidationError as e:
@@ -216,14 +334,78 @@ def get_invoices(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["GET"])
+@permission_classes([IsUser])
+def export_invoices(request):
+    """
+    Streams all invoices as NDJSON or CSV. Only staff can export all invoices, users export their own.
+    :param request: GET request with optional output format, ndjson (default) or csv
+    :return: streamed file or error message
+    """
+    try:
+        user = request.user
+        invoices = Invoice.objects.order_by("pk")
+        if not user.is_staff:
+            invoices = invoices.filter(reservation__customer=user)
+        return export(invoices, INVOICE_FIELDS, request.GET.get("output", "ndjson"), "invoices")
+    except ValidationError as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([IsUser])
+def get_invoice_pdf(request):
+    """
+    Downloads the PDF of an invoice. The PDF is generated in the background on the first request,
+    which is answered with 202 until it is ready. The ETag is the hash of the invoice content.
+    :param request: GET request with invoice id
+    :return: PDF file, 304 if the client has the current PDF, 202 while it is being generated or error message
+    """
+    try:
+        user = request.user
+
+        invoice = get_object_or_404(Invoice.objects.select_related("reservation"), pk=request.GET.get("invoice"))
+        if invoice.reservation.customer_id != user.id and not user.is_staff:
+            raise AuthenticationFailed("Unauthenticated!")
+
+        text = Invoice.render_invoices([invoice])[invoice.pk]
+        etag = f'"{pdf.content_hash(text)}"'
+        if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+        path = pdf.pdf_path(invoice.pk, text)
+        if not path.exists():
+            pdf.generate(invoice.pk, text)
+            response = Response(
+                {"result": "success", "message": "PDF is being generated"}, status=status.HTTP_202_ACCEPTED
+            )
+            response["Retry-After"] = "1"
+            return response
+
+        response = FileResponse(
+            path.open("rb"), as_attachment=True, filename="invoice.pdf", content_type="application/pdf"
+        )
+        response["ETag"] = etag
+        return response
+    except AuthenticationFailed as e:
+        return Response({"result": "error", "message": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    except Http404:
+        return Response({"result": "error", "message": "Invoice not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["PATCH"])
+@permission_classes([IsUser])
 def update_invoice(request):
     """
     Updates an invoice. Users can only update their own invoices while staff can update all invoices.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
+        user = request.user
 
         reservation_id = request.GET.get("invoice")
 
@@ -250,13 +432,13 @@ def update_invoice(request):
 
 
 @api_view(["DELETE"])
+@permission_classes([IsUser])
 def delete_invoice(request):
     """
     Deletes an invoice. Only staff can delete invoices.
     """
     try:
-        token = get_token(request)
-        user = auth(token)
+        user = request.user
 
         reservation_id = request.GET.get("invoice")
 
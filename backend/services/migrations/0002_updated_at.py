@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("services", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="service",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -9,3 +9,4 @@ class Service(models.Model):
     description = models.CharField(max_length=255)
     service_price = models.DecimalField(max_digits=5, decimal_places=2)
     vat_price = models.DecimalField(max_digits=5, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)  # When the service was last saved, see api.conditional
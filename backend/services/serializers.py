@@ -1,11 +1,15 @@
 from rest_framework import serializers
 
+from api.catalog import CatalogRelatedField
+from cabins.models import Area
 from .models import Service
 
 
 class ServiceSerializer(serializers.ModelSerializer):
     """Serializer for the Service model"""
 
+    area = CatalogRelatedField("areas", queryset=Area.objects.all())
+
     class Meta:
         model = Service
         fields = ["id", "area", "name", "description", "service_price", "vat_price"]
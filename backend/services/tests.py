@@ -44,3 +44,16 @@ class ServiceTests(APITestCase):
 
     def test_service_vat_price(self):
         self.assertEqual(self.service.vat_price, Decimal("30.00"))
+
+    def test_get_service_by_price(self):
+        """
+        Tests that services are filtered by their price, not by their VAT.
+        """
+        response = self.client.get("/api/area/services/get", {"service_price": "25"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([service["name"] for service in response.data["data"]], ["Sauna 66"])
+
+        response = self.client.get("/api/area/services/get", {"service_price": "30.00"})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get("/api/area/services/get", {"service_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
@@ -1,3 +1,5 @@
+from decimal import Decimal, InvalidOperation
+
 from django.http import Http404
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -5,6 +7,8 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from api import catalog
+from api.conditional import Version
 from services.models import Service
 from .serializers import ServiceSerializer
 
@@ -36,33 +40,41 @@ def create_service(request):
 @api_view(["GET"])
 def get_service(request):
     """
-    Gets a service.
+    Gets a service, 304 if the client has the current list (ETag). The services are read from api.catalog.
     """
     try:
         area = request.GET.get("area")
         name = request.GET.get("name")
         request.GET.get("description")  # how to tie to service name?
         service_price = request.GET.get("service_price")
-        vat_price = request.GET.get("vat_price")
 
-        # Do we need to fetch all services ?
-        services = Service.objects.all()
+        # The services of an area are kept apart in the catalog
+        if area:
+            services = catalog.get().area_services.get(area, [])
+        else:
+            services = list(catalog.get().services.values())
 
         # Should description be tied to the service name?
-        # how do we filter the services? by description first? or the set primary_key that is area?
-        if area:
-            services = services.filter(area=area)
         if name:
-            services = services.filter(name=name)
+            services = [service for service in services if service.name == name]
         if service_price:
-            services = services.filter(service_price=vat_price)
+            try:
+                price = Decimal(service_price)
+            except InvalidOperation:
+                raise ValidationError("service_price must be a number.")
+            services = [service for service in services if service.service_price == price]
+
+        version = Version.of_rows(services)
+        not_modified = version.not_modified(request)
+        if not_modified:
+            return not_modified
 
         if not services:
             raise Http404
 
         # Serialize and return data
         serializer = ServiceSerializer(services, many=True)
-        return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        return version.tag(Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK))
 
     except Http404:
         return Response({"result": "error", "message": "No services found"}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,101 @@
+"""
+Views served by the ASGI application only, see conf.asgi.
+
+Checking a password hashes it with many PBKDF2 rounds. The sync login view does that on the thread serving the
+request, so a burst of logins takes the threads every other request needs. The async login view hashes in a pool
+of LOGIN_HASH_WORKERS threads instead and admits at most LOGIN_MAX_CONCURRENCY logins at a time; the ones beyond
+are answered with 503 right away rather than queueing up.
+"""
+
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import tokens
+from .models import User
+
+_executor = None
+_active = 0  # Logins being served
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.LOGIN_HASH_WORKERS, thread_name_prefix="login")
+        return _executor
+
+
+def admit() -> bool:
+    global _active
+    with _lock:
+        if _active >= settings.LOGIN_MAX_CONCURRENCY:
+            return False
+        _active += 1
+        return True
+
+
+def leave():
+    global _active
+    with _lock:
+        _active -= 1
+
+
+def read_data(request) -> dict:
+    if request.content_type == "application/json":
+        data = json.loads(request.body or b"{}")
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    """
+    API endpoint that logs in an existing user and returns an access token (jwt) and a refresh token in JSON format.
+    Same as users.views.login, without blocking the event loop.
+
+    :param request: POST request with email and password in JSON format
+    :return: JSON response with the tokens or error message
+    """
+    if not admit():
+        response = JsonResponse({"result": "error", "message": "Too many logins, try again later."}, status=503)
+        response["Retry-After"] = "1"
+        return response
+    try:
+        try:
+            data = read_data(request)
+            email = data["email"]
+            password = data["password"]
+        except (KeyError, ValueError) as e:
+            return JsonResponse({"result": "error", "message": str(e)}, status=400)
+
+        user = await User.objects.filter(email=email).only("id", "is_staff", "password").afirst()
+
+        if user is None:
+            return JsonResponse({"result": "error", "message": "User not found!"}, status=401)
+
+        # Only hashes, an outdated hash is upgraded at the next login through the sync view
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(get_executor(), check_password, password, user.password):
+            return JsonResponse({"result": "error", "message": "Incorrect password!"}, status=401)
+
+        token, refresh_token = tokens.issue(user)
+
+        response = JsonResponse({"result": "success", "jwt": token, "refresh": refresh_token})
+        response.set_cookie(key="jwt", value=token, httponly=True)
+        return response
+
+    except Exception as e:
+        return JsonResponse({"result": "error", "message": str(e)}, status=500)
+
+    finally:
+        leave()
@@ -0,0 +1,50 @@
+"""
+Authentication of API requests.
+
+Requests carry the access token issued by users.views.login in the Authorization header ("Bearer <token>").
+TokenAuthentication is the only authentication class of the API (REST_FRAMEWORK in conf.settings), so the views
+of every app resolve their user the same way, once per request and through the token cache of users.tokens.
+Which views need a user is decided by the permission classes in users.permissions.
+"""
+
+import jwt
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import tokens
+
+
+def get_token(request):
+    auth_header = request.headers.get("Authorization")
+    if auth_header:
+        auth_parts = auth_header.split(" ")
+        if len(auth_parts) > 1:
+            return auth_parts[1]
+    return None
+
+
+class TokenAuthentication(BaseAuthentication):
+    """
+    Authenticates requests by their access token. The user only has its id and is_staff loaded, other fields
+    are read from the database when they are first accessed.
+    """
+
+    def authenticate(self, request):
+        token = get_token(request)
+        if not token:
+            return None
+        try:
+            user = tokens.get_user(token)
+        except jwt.ExpiredSignatureError:
+            raise AuthenticationFailed("Unauthenticated: token expired!")
+        except tokens.RevokedTokenError:
+            raise AuthenticationFailed("Unauthenticated: token revoked!")
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed("Unauthenticated: token invalid!")
+        if user is None:
+            raise AuthenticationFailed("Unauthenticated: user not found!")
+        return user, token
+
+    def authenticate_header(self, request):
+        # Makes failed authentication answer 401 instead of 403
+        return "Bearer"
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users import revocation
+from users.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Deletes the revoked tokens that have expired and need not be remembered anymore."
+
+    def handle(self, *args, **options):
+        # Rows are kept for the clock skew the filters allow for, see users.revocation
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now() - revocation.CLOCK_SKEW).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired revoked tokens."))
@@ -11,3 +11,38 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, null=True)
     address = models.CharField(max_length=150, null=True)
     zip = models.CharField(max_length=5, null=True)
+
+    saved_claims = None  # The claims as they were last stored
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "is_staff" in field_names:
+            instance.saved_claims = instance.claims
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.saved_claims = self.claims
+
+    @property
+    def claims(self) -> dict:
+        """
+        Returns what access tokens tell about the user, so that authorization needs no query, see users.tokens.
+        """
+        return {"is_staff": self.is_staff}
+
+
+class RevokedToken(models.Model):
+    """
+    Token revoked before it expires, e.g. at logout. A row without jti stands for the claims in all access tokens
+    of a user, which changed or whose user was deleted. Rows are of no use once expired. See users.revocation.
+    """
+
+    jti = models.CharField(max_length=32, null=True, unique=True)
+    user_id = models.BigIntegerField(null=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti or f"Claims of user {self.user_id}"
@@ -0,0 +1,25 @@
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+
+class IsUser(BasePermission):
+    """
+    Lets through requests authenticated as any user.
+    """
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated
+
+
+class IsStaff(BasePermission):
+    """
+    Lets through requests authenticated as a staff member. Like the views checking it themselves, a request of
+    another user is answered with 401.
+    """
+
+    def has_permission(self, request, view):
+        if not request.user.is_authenticated:
+            return False
+        if not request.user.is_staff:
+            raise AuthenticationFailed("Unauthenticated!")
+        return True
@@ -0,0 +1,176 @@
+"""
+Revoked tokens.
+
+Tokens are revoked by storing them in RevokedToken. Looking that table up on every request would cost the query
+that access tokens with embedded claims save, so every process keeps a Bloom filter of the rows that have not
+expired. A token that is not in the filter is certainly not revoked. A token in the filter is looked up in the
+database, since the filter tells false positives at a rate of about REVOCATION_FILTER_ERROR_RATE.
+
+The filter reads the rows revoked by other processes every REVOCATION_REFRESH_INTERVAL seconds, and is rebuilt
+from the database without the expired rows once it holds more than REVOCATION_FILTER_CAPACITY of them.
+
+Revoked claims of a user are not put into the filter, where they would stay until the next rebuild and send every
+later request of the user to the database. Every process keeps the time of the last revocation of each user
+instead, read along with the filter. It only applies to the tokens issued before it, and is dropped once those have
+all expired.
+
+The revocation and expiry times are set from the clock of the process that stores the row, not by the database,
+and compared with the clock of the process that reads it. Every comparison allows for CLOCK_SKEW between them.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from .models import RevokedToken
+
+# Rows are read again for this long in case their transaction committed after the filter last read them
+OVERLAP = timedelta(minutes=1)
+# Largest difference expected between the clocks of the processes that store and read the rows
+CLOCK_SKEW = timedelta(seconds=30)
+
+_filter = None
+_users = {}  # user id -> (revoked at, expires at) of the latest revocation of the user's claims
+_read_at = None  # Time of this process's clock up to which the filter holds the revoked rows
+_checked_at = 0.0  # time.monotonic() of the last read
+_lock = threading.Lock()
+
+
+class BloomFilter:
+    """
+    Set of strings that answers membership with no false negatives and few false positives, in a fixed size.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing derives all the positions from one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, step = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        if key in self:
+            return
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key) -> bool:
+        return all(self.bits[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+
+def _read():
+    """
+    Adds the rows revoked since the last read, or rebuilds the filter and the users. Called with the lock held.
+    """
+    global _filter, _users, _read_at, _checked_at
+    now = datetime.now(timezone.utc)
+    fields = ["jti", "user_id", "revoked_at", "expires_at"]
+    if _filter is None or _filter.count > settings.REVOCATION_FILTER_CAPACITY:
+        rows = list(RevokedToken.objects.filter(expires_at__gt=now - CLOCK_SKEW).values_list(*fields))
+        _filter = BloomFilter(
+            max(settings.REVOCATION_FILTER_CAPACITY, 2 * len(rows)), settings.REVOCATION_FILTER_ERROR_RATE
+        )
+        _users = {}
+    else:
+        rows = RevokedToken.objects.filter(revoked_at__gte=_read_at - OVERLAP - CLOCK_SKEW).values_list(*fields)
+        _users = {user_id: entry for user_id, entry in _users.items() if entry[1] + CLOCK_SKEW > now}
+    for jti, user_id, revoked_at, expires_at in rows:
+        if jti:
+            _filter.add(jti)
+        else:
+            _add_user(user_id, revoked_at, expires_at)
+    _read_at = now
+    _checked_at = time.monotonic()
+
+
+def _refresh():
+    # Called with the lock held
+    if _filter is None or time.monotonic() - _checked_at >= settings.REVOCATION_REFRESH_INTERVAL:
+        _read()
+
+
+def might_be_revoked(jti) -> bool:
+    """
+    Checks the filter for a token id. True can be a false positive, False is certain.
+    """
+    with _lock:
+        _refresh()
+        return jti in _filter
+
+
+def is_revoked(jti) -> bool:
+    return might_be_revoked(jti) and RevokedToken.objects.filter(jti=jti).exists()
+
+
+def claims_revoked(user_id, issued_at) -> bool:
+    """
+    Checks if the claims in an access token of a user were revoked after the token was issued.
+    :param issued_at: iat of the token as a timestamp
+    """
+    with _lock:
+        _refresh()
+        entry = _users.get(user_id)
+    if entry is None or entry[1] + CLOCK_SKEW <= datetime.now(timezone.utc):
+        return False
+    # A token issued just after the revocation may still carry claims read before it
+    return datetime.fromtimestamp(issued_at, timezone.utc) <= entry[0] + OVERLAP + CLOCK_SKEW
+
+
+def revoke(jti, expires_at) -> bool:
+    """
+    Revokes a token.
+    :param expires_at: expiry of the token as a timestamp, the row can be deleted after it
+    :return: False if the token was revoked already
+    """
+    _, created = RevokedToken.objects.get_or_create(
+        jti=jti, defaults={"expires_at": datetime.fromtimestamp(expires_at, timezone.utc)}
+    )
+    _add(jti)
+    return created
+
+
+def revoke_claims(user_id):
+    """
+    Revokes the claims of the access tokens issued to a user so far. Until they have all expired, requests with
+    them read the claims from the database instead.
+    """
+    row = RevokedToken.objects.create(
+        user_id=user_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.ACCESS_TOKEN_LIFETIME),
+    )
+    with _lock:
+        if _filter is not None:
+            _add_user(user_id, row.revoked_at, row.expires_at)
+
+
+def _add(jti):
+    # Revocations of this process take effect at once, other processes see them at their next read
+    with _lock:
+        if _filter is not None:
+            _filter.add(jti)
+
+
+def _add_user(user_id, revoked_at, expires_at):
+    # Called with the lock held, the latest revocation of a user covers the earlier ones
+    if user_id not in _users or _users[user_id][0] < revoked_at:
+        _users[user_id] = (revoked_at, expires_at)
+
+
+def clear():
+    """
+    Drops the filter, it is rebuilt from the database when it is next needed.
+    """
+    global _filter, _users
+    with _lock:
+        _filter = None
+        _users = {}
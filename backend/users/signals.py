@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import revocation
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_claims(sender, instance, created, raw=False, **kwargs):
+    """
+    Revokes the claims in the access tokens of a user whose claims changed, e.g. who became staff.
+    """
+    if raw or created or instance.saved_claims == instance.claims:
+        return
+    revocation.revoke_claims(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_claims(sender, instance, **kwargs):
+    """
+    Revokes the claims in the access tokens of a deleted user, so they stop authenticating.
+    """
+    revocation.revoke_claims(instance.pk)
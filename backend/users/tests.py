@@ -2,11 +2,14 @@ import datetime
 import time
 
 import jwt
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, override_settings
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
 from conf.settings import JWT_SECRET
-from users.models import User
+from users import revocation, tokens
+from users.models import RevokedToken, User
 
 
 class TestUser(APITestCase):
@@ -325,3 +328,115 @@ class TestUser(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
         response = self.client.delete(f"/api/user/delete?user={self._data['username']}")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # -------------
+    # Token cache
+    # -------------
+
+    def test_token_cache(self):
+        """
+        Test verified tokens are cached until their user changes.
+        """
+        token = self.login_user()
+        tokens.clear()
+
+        user = tokens.get_user(token)
+        self.assertEqual(user.username, self._data["username"])
+        with self.assertNumQueries(0):
+            self.assertFalse(tokens.get_user(token).is_staff)
+
+        user.is_staff = True
+        user.save()
+        self.assertTrue(tokens.get_user(token).is_staff)
+
+        user.delete()
+        self.assertIsNone(tokens.get_user(token))
+
+    def test_claims_revocation_applies_to_earlier_tokens(self):
+        """
+        Test revoked claims are read from the database only for the tokens issued before, until those expire.
+        """
+        token = self.login_user()
+        tokens.clear()
+        user = tokens.get_user(token)
+        user.is_staff = True
+        user.save()
+        self.assertTrue(tokens.get_user(token).is_staff)
+
+        # A token issued after the revocation is trusted, even with claims that do not match the database
+        now = datetime.datetime.now(datetime.timezone.utc)
+        revoked_at = now - revocation.OVERLAP - revocation.CLOCK_SKEW - datetime.timedelta(seconds=1)
+        RevokedToken.objects.update(revoked_at=revoked_at)
+        tokens.clear()
+        later_token = tokens.encode(
+            {
+                "id": user.pk,
+                "is_staff": False,
+                "type": "access",
+                "jti": "later",
+                "iat": now,
+                "exp": now + datetime.timedelta(minutes=5),
+            }
+        )
+        self.assertFalse(tokens.get_user(later_token).is_staff)
+        self.assertTrue(revocation.claims_revoked(user.pk, 0))
+
+        # Expired revocations are kept for the clock skew allowed between processes
+        RevokedToken.objects.update(expires_at=datetime.datetime.now(datetime.timezone.utc))
+        tokens.clear()
+        self.assertTrue(revocation.claims_revoked(user.pk, 0))
+        RevokedToken.objects.update(expires_at=datetime.datetime.now(datetime.timezone.utc) - revocation.CLOCK_SKEW)
+        tokens.clear()
+        self.assertFalse(revocation.claims_revoked(user.pk, 0))
+
+    def test_token_refresh_and_revocation(self):
+        """
+        Test refresh tokens are used once and logout revokes the tokens.
+        """
+        login_data = self.create_user()
+        response = self.client.post("/api/user/login", login_data)
+        token, refresh_token = response.data["jwt"], response.data["refresh"]
+
+        response = self.client.post("/api/user/refresh", {"refresh": token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post("/api/user/refresh", {"refresh": refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_token, new_refresh_token = response.data["jwt"], response.data["refresh"]
+        self.assertTrue(tokens.get_user(new_token))
+
+        response = self.client.post("/api/user/refresh", {"refresh": refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, {"result": "error", "message": "Refresh token revoked!"})
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {new_token}")
+        response = self.client.post("/api/user/logout", {"refresh": new_refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get("/api/user/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, {"result": "error", "message": "Unauthenticated: token revoked!"})
+        response = self.client.post("/api/user/refresh", {"refresh": new_refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ROOT_URLCONF="conf.asgi_urls")
+    async def test_async_login(self):
+        """
+        Test login through the async view of the ASGI application.
+        """
+        await sync_to_async(self.create_user)()
+        client = AsyncClient()
+        login_data = {"email": self._data["email"], "password": self._data["password"]}
+
+        response = await client.post("/api/user/login", login_data, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(await sync_to_async(tokens.get_user)(response.json()["jwt"]))
+
+        response = await client.post(
+            "/api/user/login", {**login_data, "password": "wrong"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json(), {"result": "error", "message": "Incorrect password!"})
+
+        with self.settings(LOGIN_MAX_CONCURRENCY=0):
+            response = await client.post("/api/user/login", login_data, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,152 @@
+"""
+Access and refresh tokens.
+
+Login issues a pair of tokens. The short-lived access token authenticates requests and carries the claims of its
+user (User.claims), so a request is authorized without a query. The long-lived refresh token is exchanged for a new
+pair when the access token has expired, and can be used only once.
+
+Tokens are revoked at logout, see users.revocation. When the claims of a user change or the user is deleted, the
+claims in the user's access tokens are revoked and requests with those tokens read them from the database until
+they have expired. Verified access tokens are cached in this process until they expire, so a repeated request
+does not even decode its token again.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from django.conf import settings
+
+from . import revocation
+from .models import User
+
+# Fields a user is restored with, those of the permission checks. Reading others loads them from the database.
+FIELDS = ["id", "is_staff"]
+
+_tokens = OrderedDict()  # access token -> (expires at, issued at, user id, jti, values of FIELDS), least recent first
+_lock = threading.Lock()
+
+
+class RevokedTokenError(jwt.InvalidTokenError):
+    pass
+
+
+def encode(payload) -> str:
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm="HS256")
+
+
+def decode(token, token_type) -> dict:
+    """
+    Verifies a token.
+    :param token_type: "access" or "refresh". Tokens issued before there were refresh tokens have no type
+        and are access tokens.
+    :raises jwt.InvalidTokenError: if the token is invalid, of another type or expired
+    """
+    payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    if payload.get("type", "access") != token_type:
+        raise jwt.InvalidTokenError(f"Not an {token_type} token.")
+    return payload
+
+
+def issue(user) -> tuple:
+    """
+    Issues a new pair of tokens.
+    :param user: user with at least the fields of its claims loaded
+    :return: tuple of access and refresh token
+    """
+    now = datetime.now(timezone.utc)
+    access = {
+        "id": user.pk,
+        **user.claims,
+        "type": "access",
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + timedelta(seconds=settings.ACCESS_TOKEN_LIFETIME),
+    }
+    refresh = {
+        "id": user.pk,
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME),
+    }
+    return encode(access), encode(refresh)
+
+
+def refresh(token) -> tuple:
+    """
+    Exchanges a refresh token for a new pair of tokens with the current claims of its user.
+    :return: tuple of access and refresh token, or None if the user does not exist anymore
+    :raises jwt.InvalidTokenError: if the token is invalid or expired
+    :raises RevokedTokenError: if the token was revoked or used already
+    """
+    payload = decode(token, "refresh")
+    user = User.objects.filter(pk=payload["id"]).only(*FIELDS).first()
+    if user is None:
+        return None
+    if not revocation.revoke(payload["jti"], payload["exp"]):
+        raise RevokedTokenError("Token has been revoked.")
+    return issue(user)
+
+
+def revoke(token):
+    """
+    Revokes an access or refresh token. Tokens that are invalid or expired already are ignored.
+    """
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return
+    if "jti" in payload:
+        revocation.revoke(payload["jti"], payload["exp"])
+
+
+def _lookup(token):
+    with _lock:
+        entry = _tokens.get(token)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _tokens[token]
+            return None
+        _tokens.move_to_end(token)
+        return entry
+
+
+def get_user(token):
+    """
+    Returns the user of an access token, verifying the token only if it is not cached.
+    :return: user with only FIELDS loaded, or None if the user does not exist anymore
+    :raises jwt.InvalidTokenError: if the token is invalid
+    :raises jwt.ExpiredSignatureError: if the token has expired
+    :raises RevokedTokenError: if the token was revoked
+    """
+    entry = _lookup(token)
+    if entry is None:
+        payload = decode(token, "access")
+        claims = [payload[field] for field in FIELDS[1:] if field in payload]
+        values = (payload["id"], *claims) if len(claims) == len(FIELDS) - 1 else None
+        entry = (payload.get("exp", float("inf")), payload.get("iat", 0), payload["id"], payload.get("jti"), values)
+        with _lock:
+            _tokens[token] = entry
+            while len(_tokens) > settings.AUTH_TOKEN_CACHE_SIZE:
+                _tokens.popitem(last=False)
+
+    _, issued_at, user_id, jti, values = entry
+    if jti and revocation.is_revoked(jti):
+        raise RevokedTokenError("Token has been revoked.")
+    if values is None or revocation.claims_revoked(user_id, issued_at):
+        values = User.objects.filter(id=user_id).values_list(*FIELDS).first()
+        if values is None:
+            return None
+    # A new instance every time, callers may change it
+    return User.from_db(User.objects.db, FIELDS, values)
+
+
+def clear():
+    with _lock:
+        _tokens.clear()
+    revocation.clear()
@@ -1,11 +1,12 @@
 from django.urls import path
 
-from .views import register, login, logout, get_data, update_data, delete_data
+from .views import register, login, logout, refresh, get_data, update_data, delete_data
 
 urlpatterns = [
     path("register", register),
     path("login", login),
     path("logout", logout),
+    path("refresh", refresh),
     path("", get_data),
     path("update", update_data),
     path("delete", delete_data),
@@ -1,42 +1,20 @@
-import datetime
-
 import jwt
 from django.http import Http404
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from conf.settings import JWT_SECRET
+from . import tokens
+from .authentication import get_token
 from .models import User
+from .permissions import IsUser
 from .serializers import UserSerializer
 
 
-def get_token(request):
-    auth_header = request.headers.get("Authorization")
-    if auth_header:
-        auth_parts = auth_header.split(" ")
-        if len(auth_parts) > 1:
-            return auth_parts[1]
-    return None
-
-
-def get_user_from_token(token):
-    if not token:
-        raise AuthenticationFailed("Unauthenticated!")
-
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-    except jwt.ExpiredSignatureError:
-        raise AuthenticationFailed("Unauthenticated!")
-
-    user = User.objects.filter(id=payload["id"]).first()
-
-    return user
-
-
 @api_view(["POST"])
+@authentication_classes([])
 def register(request):
     """
     API endpoint that creates a new user and returns the created user in JSON format.
@@ -63,12 +41,13 @@ def register(request):
 
 
 @api_view(["POST"])
+@authentication_classes([])
 def login(request):
     """
-    API endpoint that logs in an existing user and returns jwt token in JSON format.
+    API endpoint that logs in an existing user and returns an access token (jwt) and a refresh token in JSON format.
 
     :param request: POST request with email and password in JSON format
-    :return: JSON response with jwt token or error message
+    :return: JSON response with the tokens or error message
     """
     try:
         email = request.data["email"]
@@ -82,18 +61,12 @@ def login(request):
         if not user.check_password(password):
             raise AuthenticationFailed("Incorrect password!")
 
-        payload = {
-            "id": user.id,
-            "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=60),
-            "iat": datetime.datetime.utcnow(),
-        }
-
-        token = jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+        token, refresh_token = tokens.issue(user)
 
         response = Response()
 
         response.set_cookie(key="jwt", value=token, httponly=True)
-        response.data = {"result": "success", "jwt": token}
+        response.data = {"result": "success", "jwt": token, "refresh": refresh_token}
         response.status = status.HTTP_200_OK
 
         return response
@@ -109,19 +82,22 @@ def login(request):
 
 
 @api_view(["POST"])
+@authentication_classes([])
 def logout(request):
     """
-    API endpoint that logs out an existing user
+    API endpoint that logs out an existing user by revoking its tokens
 
-    :param request: POST request
+    :param request: POST request with the access token and optionally the refresh token in JSON format
     :return: JSON response with success message or error message
     """
 
-    # try to delete the jwt cookie
+    # try to revoke the tokens and delete the jwt cookie
     try:
+        for token in (get_token(request), request.data.get("refresh")):
+            if token:
+                tokens.revoke(token)
         response = Response()
         response.delete_cookie("jwt")
-        get_token(request)
         response.headers["Authorization"] = ""
         response.data = {"result": "success", "message": "Successfully logged out!"}
         response.status = status.HTTP_200_OK
@@ -132,7 +108,50 @@ def logout(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["POST"])
+@authentication_classes([])
+def refresh(request):
+    """
+    API endpoint that exchanges a refresh token for a new access token (jwt) and refresh token in JSON format.
+    A refresh token can be used only once.
+
+    :param request: POST request with the refresh token in JSON format
+    :return: JSON response with the new tokens or error message
+    """
+    try:
+        issued = tokens.refresh(request.data["refresh"])
+
+        if issued is None:
+            raise AuthenticationFailed("User not found!")
+
+        token, refresh_token = issued
+        response = Response()
+        response.set_cookie(key="jwt", value=token, httponly=True)
+        response.data = {"result": "success", "jwt": token, "refresh": refresh_token}
+        response.status = status.HTTP_200_OK
+        return response
+
+    except jwt.ExpiredSignatureError:
+        return Response({"result": "error", "message": "Refresh token expired!"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    except tokens.RevokedTokenError:
+        return Response({"result": "error", "message": "Refresh token revoked!"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    except jwt.InvalidTokenError:
+        return Response({"result": "error", "message": "Refresh token invalid!"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    except AuthenticationFailed as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    except KeyError as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    except Exception as e:
+        return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["GET"])
+@permission_classes([IsUser])
 def get_data(request):
     """
     API endpoint that returns a list of all users in JSON format.
@@ -143,7 +162,7 @@ def get_data(request):
 
     # Try to get all users
     try:
-        user = get_user_from_token(get_token(request))
+        user = request.user
 
         if user.is_staff:
             users = User.objects.all()
@@ -151,7 +170,8 @@ def get_data(request):
             serializer = UserSerializer(users, many=True)
             return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
 
-        serializer = UserSerializer(user)
+        # The authenticated user only has the fields needed for permission checks loaded
+        serializer = UserSerializer(User.objects.get(pk=user.pk))
         return Response({"result": "success", "data": serializer.data}, status=status.HTTP_200_OK)
 
     # Catch authentication errors and return a 401 response
@@ -164,6 +184,7 @@ def get_data(request):
 
 
 @api_view(["PUT"])
+@permission_classes([IsUser])
 def update_data(request):
     """
     API endpoint that updates a user and returns the updated user in JSON format.
@@ -174,22 +195,13 @@ def update_data(request):
 
     # Try to get all users
     try:
-        token = get_token(request)
-
-        if not token:
-            raise AuthenticationFailed("Unauthenticated!")
-
-        try:
-            payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed("Unauthenticated!")
+        user = request.user
 
         user_username = request.GET.get("user")
 
         if user_username is None:
             raise ValidationError("User id not provided!")
 
-        user = User.objects.filter(id=payload["id"]).first()
         user_to_update = get_object_or_404(User, username=user_username)
 
         if user.is_staff is False:
@@ -211,6 +223,7 @@ def update_data(request):
 
 
 @api_view(["DELETE"])
+@permission_classes([IsUser])
 def delete_data(request):
     """
     API endpoint that deletes a user and returns the deleted user in JSON format.
@@ -221,7 +234,7 @@ def delete_data(request):
 
     # Try to get all users
     try:
-        user = get_user_from_token(get_token(request))
+        user = request.user
 
         user_username = request.GET.get("user")
 